@@ -0,0 +1,173 @@
+import os
+import json
+import time
+from datetime import datetime
+import requests
+
+# --- ALERTING ---
+# alert_rules: threshold + hysteresis (clear_threshold) + duration per variable, for one
+# governorate (location_id) or all of them (NULL). The fetcher hands each cycle's new
+# readings to AlertEngine.evaluate(); rules are indexed by variable and location, and the
+# only state kept is one alert_state row per (location, rule) that is pending or firing.
+#
+#   normal --breach--> pending --breach held for duration_s--> firing --clear--> normal
+#
+# Events go to the alerts table and, after the cycle commits, to the sinks:
+#   ALERT_WEBHOOK_URL  POST one JSON object per event (see alert_receiver.py for a stub)
+#   ALERT_FILE         append one JSON line per event
+
+ALERT_WEBHOOK_URL = os.environ.get('ALERT_WEBHOOK_URL', '')
+ALERT_FILE = os.environ.get('ALERT_FILE', '')
+RULES_RELOAD_S = 60
+
+# Rule variable (column name) -> key in the providers' city_data
+VARIABLE_KEYS = {
+    'temperature': 'temp', 'feels_like': 'feels', 'humidity': 'hum', 'windspeed': 'wind_s',
+    'pressure': 'pres', 'uv_index': 'uv', 'visibility': 'vis', 'cloud_cover': 'cloud'
+}
+OPERATORS = {
+    '>=': lambda v, limit: v >= limit,
+    '<=': lambda v, limit: v <= limit,
+}
+
+
+class AlertEngine:
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.rules = {}
+        self.by_variable = {}
+        self.loaded_at = None
+
+    def load_rules(self, cursor):
+        cursor.execute("""
+            SELECT rule_id, name, variable, op, threshold, clear_threshold, duration_s, location_id, severity
+            FROM alert_rules WHERE enabled = 1
+        """)
+        self.rules = {}
+        self.by_variable = {}
+        for r in cursor.fetchall():
+            rule = dict(zip(('rule_id', 'name', 'variable', 'op', 'threshold', 'clear_threshold',
+                             'duration_s', 'location_id', 'severity'), r))
+            if rule['variable'] not in VARIABLE_KEYS or rule['op'] not in OPERATORS:
+                print(f"Alert rule {rule['name']}: unsupported variable/operator, skipped")
+                continue
+            if rule['clear_threshold'] is None:
+                rule['clear_threshold'] = rule['threshold']
+            self.rules[rule['rule_id']] = rule
+            # variable -> location_id (None = every location) -> rules
+            self.by_variable.setdefault(rule['variable'], {}).setdefault(rule['location_id'], []).append(rule)
+        self.loaded_at = self.clock()
+
+    def _candidates(self, location_id, city_data):
+        for variable, by_location in self.by_variable.items():
+            value = city_data.get(VARIABLE_KEYS[variable])
+            if value is None:
+                continue
+            for rule in by_location.get(location_id, []) + by_location.get(None, []):
+                yield rule, value
+
+    def evaluate(self, cursor, observations, generation=None):
+        """observations: [(location dict, city_data, ts_epoch)] written this cycle. Returns the events emitted."""
+        if self.loaded_at is None or self.clock() - self.loaded_at >= RULES_RELOAD_S:
+            self.load_rules(cursor)
+        events = []
+        for loc, city_data, ts in observations:
+            candidates = list(self._candidates(loc['location_id'], city_data))
+            if not candidates:
+                continue
+            cursor.execute("SELECT rule_id, state, since_epoch FROM alert_state WHERE location_id = ?",
+                           (loc['location_id'],))
+            states = {r[0]: (r[1], r[2]) for r in cursor.fetchall()}
+            for rule, value in candidates:
+                event = self._step(cursor, rule, loc, value, ts, states.get(rule['rule_id']))
+                if event:
+                    event.update(city_name=loc.get('city_name'), generation=generation)
+                    events.append(event)
+
+        if events:
+            cursor.executemany("""
+                INSERT INTO alerts (rule_id, location_id, event, severity, value, threshold, ts_epoch, generation)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, [(e['rule_id'], e['location_id'], e['event'], e['severity'], e['value'], e['threshold'],
+                   e['ts_epoch'], e['generation']) for e in events])
+        return events
+
+    def _step(self, cursor, rule, loc, value, ts, state):
+        breach = OPERATORS[rule['op']](value, rule['threshold'])
+        key = (loc['location_id'], rule['rule_id'])
+        if state is None:
+            if not breach:
+                return None
+            if rule['duration_s'] <= 0:
+                return self._fire(cursor, rule, loc, value, ts, ts)
+            cursor.execute("""
+                INSERT INTO alert_state (location_id, rule_id, state, since_epoch, last_value, last_epoch)
+                VALUES (?, ?, 'pending', ?, ?, ?)
+            """, key + (ts, value, ts))
+            return None
+
+        status, since = state
+        if status == 'pending':
+            if not breach:
+                cursor.execute("DELETE FROM alert_state WHERE location_id = ? AND rule_id = ?", key)
+            elif ts - since >= rule['duration_s']:
+                return self._fire(cursor, rule, loc, value, ts, since)
+            else:
+                cursor.execute("UPDATE alert_state SET last_value = ?, last_epoch = ? WHERE location_id = ? AND rule_id = ?",
+                               (value, ts) + key)
+            return None
+
+        # Firing: stays on until the value is back past clear_threshold (hysteresis)
+        if OPERATORS[rule['op']](value, rule['clear_threshold']):
+            cursor.execute("UPDATE alert_state SET last_value = ?, last_epoch = ? WHERE location_id = ? AND rule_id = ?",
+                           (value, ts) + key)
+            return None
+        cursor.execute("DELETE FROM alert_state WHERE location_id = ? AND rule_id = ?", key)
+        return self._event(rule, loc, 'resolved', value, ts)
+
+    def _fire(self, cursor, rule, loc, value, ts, since):
+        cursor.execute("""
+            INSERT INTO alert_state (location_id, rule_id, state, since_epoch, last_value, last_epoch)
+            VALUES (?, ?, 'firing', ?, ?, ?)
+            ON CONFLICT(location_id, rule_id) DO UPDATE SET
+                state = 'firing', last_value = excluded.last_value, last_epoch = excluded.last_epoch
+        """, (loc['location_id'], rule['rule_id'], since, value, ts))
+        return self._event(rule, loc, 'firing', value, ts)
+
+    @staticmethod
+    def _event(rule, loc, event, value, ts):
+        return {
+            'rule_id': rule['rule_id'],
+            'rule': rule['name'],
+            'severity': rule['severity'],
+            'location_id': loc['location_id'],
+            'event': event,
+            'variable': rule['variable'],
+            'value': value,
+            'threshold': rule['threshold'] if event == 'firing' else rule['clear_threshold'],
+            'ts_epoch': ts,
+            'observation_time': datetime.fromtimestamp(ts).strftime('%Y-%m-%dT%H:%M:%S')
+        }
+
+
+def dispatch(events, webhook_url=ALERT_WEBHOOK_URL, path=ALERT_FILE):
+    """Sends committed events to the configured sinks. Sink failures are logged, never raised."""
+    for e in events:
+        print(f" ! ALERT {e['event'].upper()} [{e['severity']}] {e['rule']} @ {e['city_name']}: "
+              f"{e['variable']} = {e['value']} (threshold {e['threshold']})")
+    if not events:
+        return
+    if path:
+        try:
+            with open(path, 'a') as f:
+                for e in events:
+                    f.write(json.dumps(e) + '\n')
+        except OSError as err:
+            print(f"Alert File Error: {err}")
+    if webhook_url:
+        for e in events:
+            try:
+                requests.post(webhook_url, json=e, timeout=5)
+            except requests.RequestException as err:
+                print(f"Alert Webhook Error: {err}")
+                break  # receiver is down: the rest are still in the alerts table
@@ -0,0 +1,39 @@
+import os
+import sys
+import json
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+# --- ALERT WEBHOOK STUB ---
+# Local receiver for testing alert delivery:
+#   python alert_receiver.py [port]      (default 5055)
+#   ALERT_WEBHOOK_URL=http://localhost:5055/alerts python weather_fetcher.py
+# Prints each alert and appends it to alerts_received.ndjson.
+
+OUT_FILE = os.environ.get('ALERT_RECEIVER_FILE', 'alerts_received.ndjson')
+
+
+class AlertHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        try:
+            alert = json.loads(body)
+        except ValueError:
+            self.send_response(400)
+            self.end_headers()
+            return
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] {alert.get('event', '?').upper()} "
+              f"{alert.get('rule')} @ {alert.get('city_name')}: {alert.get('variable')} = {alert.get('value')}")
+        with open(OUT_FILE, 'a') as f:
+            f.write(json.dumps(alert) + '\n')
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass  # the alert line above is enough
+
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 5055
+    print(f"Alert receiver listening on http://localhost:{port}/alerts")
+    HTTPServer(('', port), AlertHandler).serve_forever()
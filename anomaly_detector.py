@@ -0,0 +1,149 @@
+import sys
+import math
+import time
+from datetime import datetime
+from db_config import get_db_connection
+
+# --- STREAMING ANOMALY DETECTION ---
+# Running mean/variance (Welford) per location, variable and local solar hour in
+# anomaly_stats. Each new weather_obs row is scored against its hour's statistics and
+# then folded into them: one PK lookup and one upsert per observation, no history scan.
+# Readings whose |z| reaches ANOMALY_Z become weather_anomalies rows.
+
+# Variable -> (city_data key from the providers, stddev floor so steady series do not explode z)
+ANOMALY_VARIABLES = {
+    'temperature': ('temp', 0.5),
+    'pressure': ('pres', 0.5),
+    'humidity': ('hum', 2.0),
+    'windspeed': ('wind_s', 1.0),
+}
+ANOMALY_Z = 3.5
+MIN_SAMPLES = 20             # per hour slot before scoring starts (~2 days at 5 min)
+MAX_SAMPLES = 360            # caps n: older readings fade out, ~30 days per hour slot
+ANOMALY_RETENTION_DAYS = 90
+
+
+def solar_hour(ts_epoch, longitude):
+    """Local solar hour 0-23 (independent of the server's timezone)."""
+    return int((ts_epoch + (longitude or 0) * 240) // 3600) % 24
+
+
+def welford(n, mean, m2, x):
+    """One update step. Past MAX_SAMPLES the oldest weight decays instead of n growing."""
+    if n >= MAX_SAMPLES:
+        m2 *= (MAX_SAMPLES - 2) / (MAX_SAMPLES - 1)
+        n = MAX_SAMPLES - 1
+    n += 1
+    delta = x - mean
+    mean += delta / n
+    m2 += delta * (x - mean)
+    return n, mean, m2
+
+
+def observe(cursor, location, city_data, ts_epoch, generation=None):
+    """Scores one new observation and updates its hour's statistics. Returns the anomalies written."""
+    hour = solar_hour(ts_epoch, location.get('longitude'))
+    cursor.execute("SELECT variable, n, mean, m2 FROM anomaly_stats WHERE location_id = ? AND hour = ?",
+                   (location['location_id'], hour))
+    stats = {r[0]: (r[1], r[2], r[3]) for r in cursor.fetchall()}
+
+    found = []
+    updates = []
+    for variable, (key, floor) in ANOMALY_VARIABLES.items():
+        x = city_data.get(key)
+        if x is None:
+            continue
+        n, mean, m2 = stats.get(variable, (0, 0.0, 0.0))
+        if n >= MIN_SAMPLES:
+            std = max(math.sqrt(m2 / (n - 1)), floor)
+            z = (x - mean) / std
+            if abs(z) >= ANOMALY_Z:
+                found.append((location['location_id'], variable, ts_epoch, x, round(mean, 2),
+                              round(std, 2), round(z, 2), generation))
+        updates.append((location['location_id'], variable, hour) + welford(n, mean, m2, float(x)) + (ts_epoch,))
+
+    cursor.executemany("""
+        INSERT INTO anomaly_stats (location_id, variable, hour, n, mean, m2, updated_epoch)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(location_id, hour, variable) DO UPDATE SET
+            n = excluded.n, mean = excluded.mean, m2 = excluded.m2, updated_epoch = excluded.updated_epoch
+    """, updates)
+    if found:
+        cursor.executemany("""
+            INSERT OR IGNORE INTO weather_anomalies (location_id, variable, ts_epoch, value, mean, stddev, zscore, generation)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, found)
+        for f in found:
+            print(f" ! {location.get('city_name', f[0])}: {f[1]} {f[3]} is {f[6]:+.1f} sigma from its {hour:02d}h mean {f[4]}")
+    return len(found)
+
+
+def prune(cursor, now=None):
+    cutoff = (now or time.time()) - ANOMALY_RETENTION_DAYS * 86400
+    cursor.execute("DELETE FROM weather_anomalies WHERE ts_epoch < ?", (int(cutoff),))
+
+
+def rebuild(conn, days=MAX_SAMPLES // 12):
+    """Re-seeds anomaly_stats from the last `days` of weather_obs (one grouped pass per variable)."""
+    cursor = conn.cursor()
+    since = int(time.time() - days * 86400)
+    cursor.execute("BEGIN IMMEDIATE")
+    cursor.execute("DELETE FROM anomaly_stats")
+    for variable in ANOMALY_VARIABLES:
+        # m2 = sum((x - mean)^2) = sum(x^2) - n * mean^2
+        cursor.execute(f"""
+            INSERT INTO anomaly_stats (location_id, variable, hour, n, mean, m2, updated_epoch)
+            SELECT wo.location_id, ?, (CAST(wo.ts_epoch + l.longitude * 240 AS INTEGER) / 3600) % 24 AS hour,
+                   COUNT(*), AVG(wo.{variable}),
+                   MAX(SUM(wo.{variable} * wo.{variable}) - COUNT(*) * AVG(wo.{variable}) * AVG(wo.{variable}), 0),
+                   MAX(wo.ts_epoch)
+            FROM locations l
+            CROSS JOIN weather_obs wo ON wo.location_id = l.location_id
+            WHERE wo.ts_epoch >= ? AND wo.{variable} IS NOT NULL
+            GROUP BY wo.location_id, hour
+        """, (variable, since))
+    # Keep the rebuilt statistics inside the same decay window as the live updates
+    cursor.execute("UPDATE anomaly_stats SET m2 = m2 * (? - 1.0) / (n - 1), n = ? WHERE n > ?",
+                   (MAX_SAMPLES, MAX_SAMPLES, MAX_SAMPLES))
+    conn.commit()
+    cursor.execute("SELECT COUNT(*), COALESCE(SUM(n), 0) FROM anomaly_stats")
+    return cursor.fetchone()
+
+
+def get_anomalies(cursor, since_epoch, cities_sql="", cities_params=(), min_z=None, limit=200):
+    """Recent anomaly events, newest first, for /api/weather/anomalies (cities_sql filters on `l`)."""
+    where, params = "WHERE a.ts_epoch > ?" + cities_sql, [since_epoch] + list(cities_params)
+    if min_z:
+        where += " AND ABS(a.zscore) >= ?"
+        params.append(min_z)
+    cursor.execute(f"""
+        SELECT a.location_id, l.city_name, a.variable, a.value, a.mean, a.stddev, a.zscore, a.ts_epoch, a.generation
+        FROM weather_anomalies a
+        JOIN locations l ON l.location_id = a.location_id
+        {where}
+        ORDER BY a.ts_epoch DESC
+        LIMIT ?
+    """, params + [limit])
+    return [{
+        'location_id': r[0],
+        'city_name': r[1],
+        'variable': r[2],
+        'value': r[3],
+        'mean': r[4],
+        'stddev': r[5],
+        'zscore': r[6],
+        'direction': 'high' if r[6] > 0 else 'low',
+        'observation_time': datetime.fromtimestamp(r[7]).strftime('%Y-%m-%dT%H:%M:%S'),
+        'generation': r[8]
+    } for r in cursor.fetchall()]
+
+
+if __name__ == '__main__':
+    # python anomaly_detector.py --rebuild : seed statistics from existing history
+    if '--rebuild' not in sys.argv:
+        print("Usage: python anomaly_detector.py --rebuild")
+        sys.exit(1)
+    conn = get_db_connection()
+    slots, samples = rebuild(conn)
+    conn.close()
+    print(f"Rebuilt {slots} hour slots from {samples} observations.")
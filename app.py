@@ -1,6 +1,6 @@
-from flask import Flask, jsonify, send_from_directory
+from flask import Flask, Response, jsonify, request, send_from_directory
 from flask_cors import CORS
-from db_config import get_db_connection
+from db_config import get_read_connection
 from datetime import datetime, timedelta
 import json
 import decimal
@@ -8,10 +8,27 @@ import os
 import requests
 import random
 import math
+import re
+import html
 from init_db import init_db
+import db_profiler
+import fetch_telemetry
+import fetcher_lease
+import snapshot
+import state_file
+import history_cache
+import anomaly_detector
+import spatial
+import weather_field
+import section_cache
+import bulk_export
+import build_boundaries
 
 # Initialize database on startup
 init_db()
+# A snapshot taken before a schema upgrade would lack the new tables: republish it
+if snapshot.schema_changed():
+    snapshot.publish(force=True)
 
 app = Flask(__name__)
 CORS(app)
@@ -44,162 +61,377 @@ def health():
 def education():
     return send_from_directory('.', 'education.html')
 
-@app.route('/api/weather')
-def get_weather():
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+# Selectable /api/weather columns (location_id and city_name are always returned)
+WEATHER_FIELDS = {
+    'country': 'l.country', 'latitude': 'l.latitude', 'longitude': 'l.longitude',
+    'temperature': 'cw.temperature', 'humidity': 'cw.humidity', 'windspeed': 'cw.windspeed',
+    'winddirection': 'cw.winddirection', 'pressure': 'cw.pressure', 'uv_index': 'cw.uv_index',
+    'dew_point': 'cw.dew_point', 'visibility': 'cw.visibility', 'cloud_cover': 'cw.cloud_cover',
+    'solar_rad': 'cw.solar_rad', 'feels_like': 'cw.feels_like', 'observation_time': 'cw.observation_time'
+}
+MAX_HISTORY_WINDOW = timedelta(hours=48)
+# Per-worker mapping of the fetcher's current-state file (see state_file.py)
+STATE_READER = state_file.StateReader()
+# Per-worker ring buffers of recent history (see history_cache.py)
+HISTORY_CACHE = history_cache.HistoryCache()
+# Per-worker interpolated grids, one computation per generation (see weather_field.py)
+FIELD_CACHE = weather_field.FieldCache()
+# Per-worker sector payloads shared by the single endpoints and /api/bundle (see section_cache.py)
+SECTION_CACHE = section_cache.SectionCache()
+
+def parse_window(value, default=timedelta(hours=6)):
+    """'90m' / '3h' / '1d' -> timedelta, capped at MAX_HISTORY_WINDOW."""
+    if not value:
+        return default
+    unit = value[-1].lower()
+    amount = value[:-1] if unit in 'mhd' else value
+    if not amount.isdigit():
+        raise ValueError(f"Invalid window '{value}' (use e.g. 90m, 3h)")
+    scale = {'m': 'minutes', 'h': 'hours', 'd': 'days'}.get(unit, 'hours')
+    return min(timedelta(**{scale: int(amount)}), MAX_HISTORY_WINDOW)
+
+def parse_cities(value):
+    """?cities=1,2 (location ids) or ?cities=Aden|Taiz (names) -> ('location_id' | 'city_name', values)."""
+    parts = [p.strip() for p in value.split('|' if '|' in value else ',') if p.strip()]
+    if all(p.isdigit() for p in parts):
+        return 'location_id', [int(p) for p in parts]
+    return 'city_name', parts
 
-        # FETCH FROM DATABASE
-        query_current = """
-            SELECT l.location_id, l.city_name, l.country, l.latitude, l.longitude,
-                   cw.temperature, cw.humidity, cw.windspeed, cw.winddirection, cw.pressure, 
-                   cw.uv_index, cw.dew_point, cw.visibility, cw.cloud_cover, 
-                   cw.solar_rad, cw.observation_time
+def city_filter(value, alias='l'):
+    """?cities= -> (sql, params)."""
+    if not value:
+        return "", []
+    column, values = parse_cities(value)
+    return f" AND {alias}.{column} IN ({','.join('?' * len(values))})", values
+
+def current_from_state(rows, fields, cities, since):
+    """The current block from the shared state file, same shape and order as the SQL path."""
+    if cities:
+        column, values = parse_cities(cities)
+        wanted = set(values)
+        rows = [r for r in rows if r[column] in wanted]
+    if since is not None:
+        rows = [r for r in rows if r['generation'] > since]
+    return [dict({'location_id': r['location_id'], 'city_name': r['city_name']}, **{f: r[f] for f in fields})
+            for r in rows]
+
+def weather_payload(cursor, fields, window, cities=None, history_cities=None, since=None):
+    """The /api/weather body (generation, delta, current, history) inside the caller's read transaction."""
+    cities_sql, cities_params = city_filter(cities)
+    hist_sql, hist_params = city_filter(history_cities)
+
+    cursor.execute("SELECT value FROM sync_state WHERE key = 'generation'")
+    gen_row = cursor.fetchone()
+    generation = db_generation = gen_row[0] if gen_row else 0
+    if since is not None and since > generation:
+        since = None  # Client is ahead (database reset): send everything
+
+    # Current block: from the fetcher's shared state file when present, else from SQL
+    state = STATE_READER.rows()
+    if state is not None:
+        state_generation, state_rows = state
+        current = current_from_state(state_rows, fields, cities, since)
+        # History below comes from the database; never report past what it has
+        generation = min(generation, state_generation)
+    else:
+        where, params = "WHERE 1=1" + cities_sql, list(cities_params)
+        if since is not None:
+            where += " AND cw.generation > ?"
+            params.append(since)
+        query_current = f"""
+            SELECT l.location_id, l.city_name, {', '.join(f"{WEATHER_FIELDS[f]} AS {f}" for f in fields)}
             FROM locations l
             LEFT JOIN current_weather cw ON l.location_id = cw.location_id
+            {where}
             ORDER BY l.city_name ASC
         """
-        cursor.execute(query_current)
-        cities = [dict(row) for row in cursor.fetchall()]
-
-        # History Fetch (Last 6 hours)
-        limit = (datetime.now() - timedelta(hours=6)).strftime('%Y-%m-%d %H:%M:%S')
-        query_history = """
-            SELECT l.city_name, wh.temperature, wh.observation_time 
-            FROM weather_history wh 
-            JOIN locations l ON wh.location_id = l.location_id 
-            WHERE wh.observation_time > ? 
-            ORDER BY wh.observation_time ASC
+        cursor.execute(query_current, params)
+        current = [dict(row) for row in cursor.fetchall()]
+
+    # History Fetch (default last 6 hours): from memory when the window fits the cache
+    limit = int((datetime.now() - window).timestamp())
+    history = None
+    if HISTORY_CACHE.enabled:
+        filters = [parse_cities(v) for v in (cities, history_cities) if v]
+        history = HISTORY_CACHE.history(cursor, db_generation, limit, [(col, set(vals)) for col, vals in filters],
+                                        since_generation=since)
+    if history is None:
+        where, params = "WHERE wo.ts_epoch > ?" + cities_sql + hist_sql, [limit] + cities_params + hist_params
+        if since is not None:
+            where += " AND wo.generation > ?"
+            params.append(since)
+        query_history = f"""
+            SELECT l.city_name, wo.temperature,
+                   strftime('%Y-%m-%dT%H:%M:%S', wo.ts_epoch, 'unixepoch', 'localtime') AS observation_time
+            FROM locations l
+            -- CROSS JOIN keeps locations as the outer loop, so each city is one
+            -- primary-key range seek instead of a scan of all of weather_obs
+            CROSS JOIN weather_obs wo ON wo.location_id = l.location_id
+            {where}
+            ORDER BY wo.ts_epoch ASC
         """
-        cursor.execute(query_history, (limit,))
+        cursor.execute(query_history, params)
         history = [dict(row) for row in cursor.fetchall()]
-        
+
+    # Fix Date Format for SQLite (Ensure ISO 8601 with 'T' separator)
+    # SQLite stores as "YYYY-MM-DD HH:MM:SS", Frontend needs "YYYY-MM-DDTHH:MM:SS"
+    for row in current:
+        if row.get('observation_time') and isinstance(row['observation_time'], str):
+            row['observation_time'] = row['observation_time'].replace(' ', 'T')
+
+    for row in history:
+        if row.get('observation_time') and isinstance(row['observation_time'], str):
+            row['observation_time'] = row['observation_time'].replace(' ', 'T')
+
+    return {
+        'generation': generation,
+        'delta': since is not None,
+        'current': current,
+        'history': history
+    }
+
+@app.route('/api/weather')
+def get_weather():
+    try:
+        # ?since=<generation> returns only rows written after that generation
+        since = request.args.get('since', type=int)
+        # ?fields=a,b projects current columns, ?cities= filters both blocks,
+        # ?history_cities= narrows history further, ?window=3h bounds history
+        requested = [f for f in request.args.get('fields', '').split(',') if f]
+        unknown = [f for f in requested if f not in WEATHER_FIELDS]
+        if unknown:
+            return jsonify({'status': 'error', 'message': f"Unknown fields: {', '.join(unknown)}"}), 400
+        fields = requested or list(WEATHER_FIELDS)
+        window = parse_window(request.args.get('window'))
+
+        conn = get_read_connection()
+        cursor = conn.cursor()
+        # One read transaction so the generation matches the rows returned
+        cursor.execute("BEGIN")
+        payload = weather_payload(cursor, fields, window, request.args.get('cities'),
+                                  request.args.get('history_cities'), since)
+        conn.commit()
         conn.close()
 
-        # Fix Date Format for SQLite (Ensure ISO 8601 with 'T' separator)
-        # SQLite stores as "YYYY-MM-DD HH:MM:SS", Frontend needs "YYYY-MM-DDTHH:MM:SS"
-        for row in cities:
-            if row.get('observation_time') and isinstance(row['observation_time'], str):
-                row['observation_time'] = row['observation_time'].replace(' ', 'T')
-        
-        for row in history:
-            if row.get('observation_time') and isinstance(row['observation_time'], str):
-                row['observation_time'] = row['observation_time'].replace(' ', 'T')
-
-        response_data = {
-            'status': 'success',
-            'current': cities,
-            'history': history,
-            'server_time': datetime.now().strftime('%H:%M:%S')
-        }
+        response_data = dict({'status': 'success'}, **payload, server_time=datetime.now().strftime('%H:%M:%S'))
         return json.dumps(response_data, cls=EnhancedEncoder), 200, {'Content-Type': 'application/json'}
 
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
-@app.route('/api/health')
-def get_health_data():
+@app.route('/api/weather/field')
+def get_weather_field():
+    # ?res= grid spacing in degrees (default 0.25), ?bbox=minLon,minLat,maxLon,maxLat (default: Yemen).
+    # Binary int16 grid; the shape and the decoding come in X-Field-* headers.
+    conn = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Read from Cache
-        cursor.execute("SELECT * FROM health_indicators")
-        rows = cursor.fetchall()
-        
-        data = {}
-        for row in rows:
-            data[row['indicator_key']] = {
-                'current': row['current_value'],
-                'year': row['year_updated'],
-                'history': json.loads(row['history_json'])
-            }
-            
-            
-            # Connection kept open for subsequent queries
-
-        
-        # --- READ FROM ETL TABLES ---
-        cursor.execute("SELECT * FROM situation_reports WHERE sector = 'health' ORDER BY date_published DESC LIMIT 6")
-        report_rows = cursor.fetchall()
-        reports = []
-        for r in report_rows:
-            reports.append({
-                'title': r['title'],
-                'source': r['source'],
-                'date': r['date_published'],
-                'url': r['url']
-            })
-            
-        if not reports:
-            reports = [{'title': 'Monitoring active field reports...', 'source': 'System', 'date': 'Tactical', 'url': '#'}]
-
-        # Get Live Population from DB (Updated by ETL)
-        cursor.execute("SELECT current_value, year_updated FROM health_indicators WHERE indicator_key = 'population_live'")
-        pop_live_row = cursor.fetchone()
-        if pop_live_row:
-            pop_official = {
-                'total': pop_live_row['current_value'],
-                'date': pop_live_row['year_updated'],
-                'source': "Population.io / UN DESA (via ETL)"
-            }
+        res = round(max(request.args.get('res', weather_field.FIELD_RES, type=float), weather_field.MIN_FIELD_RES), 3)
+        bbox = spatial.parse_bbox(request.args['bbox']) if request.args.get('bbox') else weather_field.FIELD_BBOX
+        weather_field.grid_shape(bbox, res)
+
+        # Same sources as the /api/weather current block: the state file, else SQL
+        state = STATE_READER.rows()
+        if state is not None:
+            generation, rows = state
+            load_rows = lambda: rows
         else:
-            pop_official = {
-                'total': data.get('population', {}).get('current', 40000000),
-                'date': data.get('population', {}).get('year', '2023'),
-                'source': "World Bank Open Data (Fallback)"
-            }
-
-        # 3. Facility Status (Fixed 2024 HeRAMS Data)
-        facilities_real = [
-            {'governorate': "Sana'a", 'total': 180, 'active': 100, 'partial': 60, 'closed': 20},
-            {'governorate': "Aden", 'total': 110, 'active': 65, 'partial': 35, 'closed': 10},
-            {'governorate': "Taiz", 'total': 150, 'active': 75, 'partial': 50, 'closed': 25},
-            {'governorate': "Al Hudaydah", 'total': 140, 'active': 70, 'partial': 50, 'closed': 20},
-            {'governorate': "Ibb", 'total': 130, 'active': 72, 'partial': 48, 'closed': 10},
-            {'governorate': "Marib", 'total': 90, 'active': 50, 'partial': 30, 'closed': 10}
-        ]
-
-        # 4. Key Disease Stats (Bridged with ETL)
-        # Check extraction
-        cholera = data.get('live_cholera_cases', {}).get('current') or 249900 # Fallback
-        malnutrition = data.get('live_malnutrition_cases', {}).get('current') or 2200000
-        measles = data.get('live_measles_cases', {}).get('current') or 42000
-        
-        disease_stats = {
-            'cholera_cases': cholera,
-            'cholera_deaths': int(cholera * 0.004), # Est fatality rate 0.4% if not live
-            'malnutrition_cases': malnutrition,
-            'funding_gap': "20M USD",
-            'last_updated': datetime.now().strftime('%b %Y')
-        }
-        
-        # 5. Humanitarian Response Overview (OCHA 2024 HRP)
-        humanitarian_response = {
-            'people_in_need': 18200000,
-            'targeted': 11200000,
-            'reached': 4500000
-        }
+            conn = get_read_connection()
+            cursor = conn.cursor()
+            cursor.execute("BEGIN")
+            cursor.execute("SELECT value FROM sync_state WHERE key = 'generation'")
+            gen_row = cursor.fetchone()
+            generation = gen_row[0] if gen_row else 0
+
+            def load_rows():
+                cursor.execute("""
+                    SELECT l.latitude, l.longitude, cw.temperature, cw.windspeed, cw.winddirection
+                    FROM locations l
+                    JOIN current_weather cw ON cw.location_id = l.location_id
+                """)
+                return [dict(row) for row in cursor.fetchall()]
 
+        # Unchanged generation: the browser's copy is still current
+        etag = f"field-{generation}-{res}-{','.join(f'{v:g}' for v in bbox)}"
+        if request.if_none_match.contains(etag):
+            return '', 304, {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'}
 
-        extended_data = {
-            'facilities': facilities_real,
-            'disease_stats': disease_stats,
-            'hno_response': humanitarian_response,
-            'reports': reports
+        payload = FIELD_CACHE.get(generation, bbox, res, load_rows)
+        gzipped = 'gzip' in request.headers.get('Accept-Encoding', '')
+        response = Response(payload['gzip'] if gzipped else payload['body'], mimetype='application/octet-stream')
+        if gzipped:
+            response.headers['Content-Encoding'] = 'gzip'
+        response.headers['Vary'] = 'Accept-Encoding'
+        headers = {
+            'X-Field-Generation': payload['generation'],
+            'X-Field-Width': payload['width'],
+            'X-Field-Height': payload['height'],
+            'X-Field-Bbox': ','.join(f'{v:g}' for v in payload['bbox']),
+            'X-Field-Res': f"{payload['res']:g}",
+            'X-Field-Layers': ','.join(payload['layers']),
+            'X-Field-Scale': f"{payload['scale']:g}",
+            'X-Field-Nodata': payload['nodata'],
+            'X-Field-Stations': payload['stations'],
+            'X-Field-Range': json.dumps(payload['range'], separators=(',', ':'))
         }
+        for name, value in headers.items():
+            response.headers[name] = str(value)
+        # Cross-origin clients may only read the headers they are told about
+        response.headers['Access-Control-Expose-Headers'] = ', '.join(headers)
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        return response
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+    finally:
+        if conn is not None:
+            conn.close()
+
+FORECAST_FIELDS = ['temperature', 'feels_like', 'humidity', 'windspeed', 'winddirection', 'weathercode',
+                   'pressure', 'uv_index', 'visibility', 'cloud_cover', 'dew_point', 'precip_prob', 'precip_mm']
+
+@app.route('/api/weather/forecast')
+def get_weather_forecast():
+    try:
+        # Optional ?cities=1,2,3 (location ids) and ?hours=N (from now)
+        ids = [int(x) for x in request.args.get('cities', '').split(',') if x.strip().isdigit()]
+        hours = request.args.get('hours', type=int)
 
+        where = ["f.valid_time >= ?"]
+        params = [(datetime.now() - timedelta(hours=1)).strftime('%Y-%m-%d %H:%M:%S')]
+        if hours:
+            where.append("f.valid_time <= ?")
+            params.append((datetime.now() + timedelta(hours=hours)).strftime('%Y-%m-%d %H:%M:%S'))
+        if ids:
+            where.append(f"f.location_id IN ({','.join('?' * len(ids))})")
+            params.extend(ids)
+
+        conn = get_read_connection()
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT f.location_id, l.city_name, f.issued_time, f.valid_time, {', '.join('f.' + c for c in FORECAST_FIELDS)}
+            FROM forecast f
+            JOIN locations l ON l.location_id = f.location_id
+            WHERE {' AND '.join(where)}
+            ORDER BY f.location_id, f.valid_time
+        """, params)
+        rows = cursor.fetchall()
         conn.close()
 
-        return jsonify({
-            'status': 'success', 
-            'data': data, 
-            'population': pop_official,
-            'extended': extended_data,
-            'meta': {'mode': 'STRATEGIC_AGGREGATE', 'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M')}
+        # Column-oriented: one array per variable per location
+        locations = {}
+        for r in rows:
+            loc = locations.get(r['location_id'])
+            if loc is None:
+                loc = locations[r['location_id']] = {
+                    'location_id': r['location_id'],
+                    'city_name': r['city_name'],
+                    'issued_time': r['issued_time'].replace(' ', 'T'),
+                    'valid_time': []
+                }
+                for c in FORECAST_FIELDS:
+                    loc[c] = []
+            loc['valid_time'].append(r['valid_time'].replace(' ', 'T'))
+            for c in FORECAST_FIELDS:
+                loc[c].append(r[c])
+
+        return jsonify({'status': 'success', 'forecast': list(locations.values())})
+
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+def build_health(cursor):
+    """/api/health body: indicators, population, facilities, disease stats and reports."""
+    # Read from Cache
+    cursor.execute("SELECT * FROM health_indicators")
+    rows = cursor.fetchall()
+
+    data = {}
+    for row in rows:
+        data[row['indicator_key']] = {
+            'current': row['current_value'],
+            'year': row['year_updated'],
+            'history': json.loads(row['history_json'])
+        }
+
+    # --- READ FROM ETL TABLES ---
+    cursor.execute("SELECT * FROM situation_reports WHERE sector = 'health' ORDER BY date_published DESC LIMIT 6")
+    report_rows = cursor.fetchall()
+    reports = []
+    for r in report_rows:
+        reports.append({
+            'title': r['title'],
+            'source': r['source'],
+            'date': r['date_published'],
+            'url': r['url']
         })
 
+    if not reports:
+        reports = [{'title': 'Monitoring active field reports...', 'source': 'System', 'date': 'Tactical', 'url': '#'}]
+
+    # Get Live Population from DB (Updated by ETL)
+    cursor.execute("SELECT current_value, year_updated FROM health_indicators WHERE indicator_key = 'population_live'")
+    pop_live_row = cursor.fetchone()
+    if pop_live_row:
+        pop_official = {
+            'total': pop_live_row['current_value'],
+            'date': pop_live_row['year_updated'],
+            'source': "Population.io / UN DESA (via ETL)"
+        }
+    else:
+        pop_official = {
+            'total': data.get('population', {}).get('current', 40000000),
+            'date': data.get('population', {}).get('year', '2023'),
+            'source': "World Bank Open Data (Fallback)"
+        }
+
+    # 3. Facility Status (2024 HeRAMS counts per governorate, stored in the points table)
+    cursor.execute("SELECT props_json FROM points WHERE type = 'health_facilities' ORDER BY point_id")
+    facilities_real = [json.loads(r['props_json']) for r in cursor.fetchall() if r['props_json']]
+
+    # 4. Key Disease Stats (Bridged with ETL)
+    # Check extraction
+    cholera = data.get('live_cholera_cases', {}).get('current') or 249900 # Fallback
+    malnutrition = data.get('live_malnutrition_cases', {}).get('current') or 2200000
+    measles = data.get('live_measles_cases', {}).get('current') or 42000
+
+    disease_stats = {
+        'cholera_cases': cholera,
+        'cholera_deaths': int(cholera * 0.004), # Est fatality rate 0.4% if not live
+        'malnutrition_cases': malnutrition,
+        'funding_gap': "20M USD",
+        'last_updated': datetime.now().strftime('%b %Y')
+    }
+
+    # 5. Humanitarian Response Overview (OCHA 2024 HRP)
+    humanitarian_response = {
+        'people_in_need': 18200000,
+        'targeted': 11200000,
+        'reached': 4500000
+    }
+
+
+    extended_data = {
+        'facilities': facilities_real,
+        'disease_stats': disease_stats,
+        'hno_response': humanitarian_response,
+        'reports': reports
+    }
+
+    return {
+        'data': data,
+        'population': pop_official,
+        'extended': extended_data,
+        'meta': {'mode': 'STRATEGIC_AGGREGATE', 'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M')}
+    }
+
+@app.route('/api/health')
+def get_health_data():
+    try:
+        return section_response('health')
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
@@ -207,280 +439,657 @@ def get_health_data():
 def economy():
     return send_from_directory('.', 'economy.html')
 
+def build_economy(cursor):
+    """/api/economy body: market tickers (simulated around the ETL baselines) and chart series."""
+    # 1. Fetch Indicators
+    cursor.execute("SELECT * FROM economic_indicators")
+    rows = cursor.fetchall()
+    indicators = {}
+    for row in rows:
+        val = row['current_value']
+        hist = json.loads(row['history_json']) if row['history_json'] else []
+        indicators[row['indicator_key']] = {'value': val, 'year': row['year_updated'], 'history': hist}
+
+    # 2. Real-Time Volatility Simulation
+    now = datetime.now()
+    base_seed = int(now.timestamp() / 60)
+    random.seed(base_seed)
+
+    # Pull Baselines
+    aden_base = indicators.get('live_yer_aden', {}).get('value', 1845)
+    sanaa_base = indicators.get('live_yer_sanaa', {}).get('value', 535)
+    gold_base = 2640.0 # Standard Base
+
+    # Add Jitter
+    aden_curr = aden_base + random.uniform(-15, 25)
+    sanaa_curr = sanaa_base + random.uniform(-1, 2)
+    gold_curr = gold_base + random.uniform(-5, 12)
+
+    market_data = {
+        'yer_aden': {'current': round(aden_curr), 'change': round(((aden_curr - 1600)/1600)*100, 2)},
+        'yer_sanaa': {'current': round(sanaa_curr), 'change': 0.05},
+        'gold': {'current': round(gold_curr, 1), 'change': round(((gold_curr - gold_base)/gold_base)*100, 2)},
+        'gdp': {'value': indicators.get('gdp_nominal', {}).get('value', 21.0), 'year': '2025 Est'},
+        'inflation': {'value': indicators.get('inflation_rate', {}).get('value', 19.3), 'year': '2025 CPI'}
+    }
+
+    # 3. Chart Data Construction
+
+    # Chart A: Exchange Rate Divergence (Line)
+    hist_aden = indicators.get('live_yer_aden', {}).get('history', [])
+    hist_sanaa = indicators.get('live_yer_sanaa', {}).get('history', [])
+    chart_divergence = {
+        'labels': [x['year'] for x in hist_aden],
+        'aden': [x['value'] for x in hist_aden],
+        'sanaa': [x['value'] for x in hist_sanaa]
+    }
+
+    # Chart B: Purchasing Power History (Bar) - REPLACES WIDGET
+    hist_pp = indicators.get('purchasing_power_hist', {}).get('history', [])
+    chart_pp = {
+        'labels': [x['year'] for x in hist_pp],
+        'values': [x['value'] for x in hist_pp]
+    }
+
+    # Chart C: Trade Balance (Stacked/Double Bar)
+    hist_trade = indicators.get('trade_balance', {}).get('history', [])
+    chart_trade = {
+        'labels': [x['year'] for x in hist_trade],
+        'exports': [x['exports'] for x in hist_trade],
+        'imports': [x['imports'] for x in hist_trade]
+    }
+
+    # Chart D: Food Basket Trend (Line)
+    hist_food = indicators.get('live_food_basket', {}).get('history', [])
+    chart_food = {
+        'labels': [x['year'] for x in hist_food],
+        'values': [x['value'] for x in hist_food] 
+    }
+
+    # Chart E: Foreign Reserves (Trend) - NEW CRITICAL
+    hist_fx = indicators.get('fx_reserves', {}).get('history', [])
+    chart_fx = {
+        'labels': [x['year'] for x in hist_fx],
+        'values': [x['value'] for x in hist_fx]
+    }
+
+    # Chart F: Public Debt % GDP (Trend)
+    hist_debt = indicators.get('public_debt', {}).get('history', [])
+    chart_debt = {
+        'labels': [x['year'] for x in hist_debt],
+        'values': [x['value'] for x in hist_debt]
+    }
+
+    # Chart G: Unemployment Rate (5 Year Trend) - NEW REQUEST
+    hist_unemp = indicators.get('unemployment_rate_hist', {}).get('history', [])
+    chart_unemp = {
+        'labels': [x['year'] for x in hist_unemp],
+        'values': [x['value'] for x in hist_unemp]
+    }
+
+    return {
+        'market': market_data,
+        'charts': {
+            'divergence': chart_divergence,
+            'pp_history': chart_pp,
+            'trade': chart_trade,
+            'food': chart_food,
+            'fx': chart_fx,
+            'debt': chart_debt,
+            'unemp': chart_unemp
+        },
+        'timestamp': now.strftime('%Y-%m-%d %H:%M:%S')
+    }
+
 @app.route('/api/economy')
 def get_economy_data():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # 1. Fetch Indicators
-        cursor.execute("SELECT * FROM economic_indicators")
-        rows = cursor.fetchall()
-        indicators = {}
-        for row in rows:
-            val = row['current_value']
-            hist = json.loads(row['history_json']) if row['history_json'] else []
-            indicators[row['indicator_key']] = {'value': val, 'year': row['year_updated'], 'history': hist}
-        
-        conn.close()
-        
-        # 2. Real-Time Volatility Simulation
-        now = datetime.now()
-        base_seed = int(now.timestamp() / 60)
-        random.seed(base_seed)
-        
-        # Pull Baselines
-        aden_base = indicators.get('live_yer_aden', {}).get('value', 1845)
-        sanaa_base = indicators.get('live_yer_sanaa', {}).get('value', 535)
-        gold_base = 2640.0 # Standard Base
-        
-        # Add Jitter
-        aden_curr = aden_base + random.uniform(-15, 25)
-        sanaa_curr = sanaa_base + random.uniform(-1, 2)
-        gold_curr = gold_base + random.uniform(-5, 12)
-        
-        market_data = {
-            'yer_aden': {'current': round(aden_curr), 'change': round(((aden_curr - 1600)/1600)*100, 2)},
-            'yer_sanaa': {'current': round(sanaa_curr), 'change': 0.05},
-            'gold': {'current': round(gold_curr, 1), 'change': round(((gold_curr - gold_base)/gold_base)*100, 2)},
-            'gdp': {'value': indicators.get('gdp_nominal', {}).get('value', 21.0), 'year': '2025 Est'},
-            'inflation': {'value': indicators.get('inflation_rate', {}).get('value', 19.3), 'year': '2025 CPI'}
-        }
-        
-        # 3. Chart Data Construction
-        
-        # Chart A: Exchange Rate Divergence (Line)
-        hist_aden = indicators.get('live_yer_aden', {}).get('history', [])
-        hist_sanaa = indicators.get('live_yer_sanaa', {}).get('history', [])
-        chart_divergence = {
-            'labels': [x['year'] for x in hist_aden],
-            'aden': [x['value'] for x in hist_aden],
-            'sanaa': [x['value'] for x in hist_sanaa]
-        }
-        
-        # Chart B: Purchasing Power History (Bar) - REPLACES WIDGET
-        hist_pp = indicators.get('purchasing_power_hist', {}).get('history', [])
-        chart_pp = {
-            'labels': [x['year'] for x in hist_pp],
-            'values': [x['value'] for x in hist_pp]
-        }
+        return section_response('economy')
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
 
-        # Chart C: Trade Balance (Stacked/Double Bar)
-        hist_trade = indicators.get('trade_balance', {}).get('history', [])
-        chart_trade = {
-            'labels': [x['year'] for x in hist_trade],
-            'exports': [x['exports'] for x in hist_trade],
-            'imports': [x['imports'] for x in hist_trade]
-        }
-        
-        # Chart D: Food Basket Trend (Line)
-        hist_food = indicators.get('live_food_basket', {}).get('history', [])
-        chart_food = {
-            'labels': [x['year'] for x in hist_food],
-            'values': [x['value'] for x in hist_food] 
-        }
+def build_education(cursor):
+    """/api/education body: ETL indicators, near-real-time operational series and reports."""
+    # --- READ FROM ETL TABLES ---
+    cursor.execute("SELECT * FROM education_indicators")
+    edu_rows = cursor.fetchall()
 
-        # Chart E: Foreign Reserves (Trend) - NEW CRITICAL
-        hist_fx = indicators.get('fx_reserves', {}).get('history', [])
-        chart_fx = {
-            'labels': [x['year'] for x in hist_fx],
-            'values': [x['value'] for x in hist_fx]
+    indicators = {}
+    for row in edu_rows:
+        indicators[row['indicator_key']] = {
+            'value': row['current_value'],
+            'year': row['year_updated'],
+            'history': json.loads(row['history_json']) if row['history_json'] else []
         }
 
-        # Chart F: Public Debt % GDP (Trend)
-        hist_debt = indicators.get('public_debt', {}).get('history', [])
-        chart_debt = {
-            'labels': [x['year'] for x in hist_debt],
-            'values': [x['value'] for x in hist_debt]
-        }
+    # Literacy fallback if ETL failed/empty
+    if 'literacy_rate' not in indicators or indicators['literacy_rate']['value'] == 0:
+         indicators['literacy_total'] = {'value': 54.1, 'source': "World Bank / 2025 Proj"}
+    else:
+         indicators['literacy_total'] = indicators['literacy_rate']
 
-        # Chart G: Unemployment Rate (5 Year Trend) - NEW REQUEST
-        hist_unemp = indicators.get('unemployment_rate_hist', {}).get('history', [])
-        chart_unemp = {
-            'labels': [x['year'] for x in hist_unemp],
-            'values': [x['value'] for x in hist_unemp]
-        }
+    # School status map: the points table (the map itself pages through /api/points by viewport)
+    cursor.execute("""
+        SELECT name, status, latitude, longitude FROM points
+        WHERE type = 'school' ORDER BY point_id LIMIT ?
+    """, (MAX_EMBEDDED_POINTS,))
+    map_points = [{'lat': r['latitude'], 'lon': r['longitude'], 'name': r['name'], 'status': r['status']}
+                  for r in cursor.fetchall()]
 
-        response_data = {
-            'status': 'success',
-            'market': market_data,
-            'charts': {
-                'divergence': chart_divergence,
-                'pp_history': chart_pp,
-                'trade': chart_trade,
-                'food': chart_food,
-                'fx': chart_fx,
-                'debt': chart_debt,
-                'unemp': chart_unemp
-            },
-            'timestamp': now.strftime('%Y-%m-%d %H:%M:%S')
-        }
-        
-        return json.dumps(response_data, cls=EnhancedEncoder), 200, {'Content-Type': 'application/json'}
+    # Get reports
+    cursor.execute("SELECT * FROM situation_reports WHERE sector = 'education' ORDER BY date_published DESC LIMIT 4")
+    report_rows = cursor.fetchall()
+    edu_reports = []
+    for r in report_rows:
+        edu_reports.append({
+            'title': r['title'],
+            'date': r['date_published']
+        })
 
-    except Exception as e:
-        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+    # --- NEAR-REAL-TIME (NRT) OPERATIONAL DATA (Bridged with ETL) ---
+
+    # Date Logic
+    today = datetime.now()
+    dates_30 = [(today - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(29, -1, -1)]
+    weeks_8 = [(today - timedelta(weeks=i)).strftime('W%V') for i in range(7, -1, -1)]
+
+    # 1. Active Schools (KPI)
+    # Baseline Total: 17,000 (Approx national schools)
+    # Subtract real damaged schools if found
+    total_schools_est = 17000
+    damaged = indicators.get('live_schools_damaged', {}).get('value') or indicators.get('projected_schools_damaged', {}).get('value', 2500)
+
+    current_active = total_schools_est - damaged
+
+    # Simulating history based on the current real value
+    active_hist = [current_active + int(math.sin(i)*50 - i*2) for i in range(7)]
+    active_schools = {'current': current_active, 'history_7d': active_hist}
+
+    # 2. Daily Attendance Rate 
+    att_rate_vals = [68 + math.sin(i/3)*5 + (random.random()*2) for i in range(30)]
+    attendance_rate = {'dates': dates_30, 'values': [round(x, 1) for x in att_rate_vals]}
+
+    # 3. Attendance vs Absence
+    absent_vals = [32 + math.cos(i/3)*4 for i in range(30)]
+    att_vs_abs = {
+        'dates': dates_30,
+        'present': [int(100-x) for x in absent_vals],
+        'absent': [int(x) for x in absent_vals]
+    }
+
+    # 4. Schools Closed (Derived from Damaged + Flood/Conflict)
+    closed_base = damaged / 20 # Scaling for daily variation view or just using raw
+    closed_rolling = [int(closed_base) + int(i*1.5 + random.random()*10) for i in range(30)] 
+    schools_closed = {'dates': dates_30, 'count': closed_rolling}
+
+    # 5. Reasons for Closure (Real Data Bridge)
+    # Extract live drivers if available
+    c_flood = indicators.get('live_closure_flood', {}).get('value', 0)
+    c_conflict = indicators.get('live_closure_conflict', {}).get('value', 0)
+    c_salary = indicators.get('live_teachers_unpaid', {}).get('value', 0) # Proxy: unpaid teachers leads to closure
+
+    # Normalize to % for chart if we have data, otherwise fallback
+    total_drivers = c_flood + c_conflict + c_salary
+    if total_drivers > 0:
+        p_salary = round((c_salary / total_drivers) * 100, 1)
+        p_conflict = round((c_conflict / total_drivers) * 100, 1)
+        p_flood = round((c_flood / total_drivers) * 100, 1)
+        p_other = max(0, 100 - (p_salary + p_conflict + p_flood))
+
+        closure_labels = ['Unpaid Salaries/Strikes', 'Conflict/Safety', 'Flooding/Weather', 'Displacement Use', 'Fuel Shortage']
+        closure_values = [p_salary, p_conflict, p_flood, p_other/2, p_other/2]
+    else:
+        # Fallback Distribution if no specific driver counts found in text
+        closure_labels = ['Unpaid Salaries/Strikes', 'Conflict/Safety', 'Fuel Shortage', 'Flooding/Weather', 'Displacement Use']
+        closure_values = [45, 25, 15, 10, 5]
+
+    closure_reasons = {
+        'labels': closure_labels,
+        'values': closure_values
+    }
+
+    # 6. Teachers Stat (Real Data Bridge)
+    # Total Est Teachers: 250,000
+    total_teachers = 250000
+    unpaid_teachers = indicators.get('live_teachers_unpaid', {}).get('value') or indicators.get('projected_teachers_unpaid', {}).get('value', 190000)
+
+    # Assumption: Unpaid teachers = Absent/Strike risk
+    present_est = total_teachers - (unpaid_teachers * 0.8) # 80% of unpaid are absent? Just a model.
+
+    teachers_stat = {'present': int(present_est), 'expected': total_teachers}
+
+    # 7. Salary Payment Status (Derived from Real Unpaid Count)
+    p_unpaid = round((unpaid_teachers / total_teachers) * 100, 1)
+    p_delayed = round((100 - p_unpaid) * 0.6, 1)
+    p_paid = round(100 - p_unpaid - p_delayed, 1)
+
+    salary_status = {
+        'paid': p_paid, 
+        'delayed': p_delayed,
+        'unpaid': p_unpaid,
+        'last_update': today.strftime('%Y-%m-%d')
+    }
+
+    # 8. Dropout Risk Index (Dynamic)
+    out_of_school = indicators.get('live_out_of_school', {}).get('value') or indicators.get('projected_out_of_school', {}).get('value', 4500000)
+    # Est School Age Pop: 12M
+    risk_score = round((out_of_school / 12000000) * 100, 1)
+    risk_level = "CRITICAL" if risk_score > 40 else ("HIGH" if risk_score > 20 else "MODERATE")
+
+    dropout_risk = {'value': risk_score, 'level': risk_level}
+
+    # 9. School Status Map: map_points, read from the points table above
+
+    nrt_data = {
+        'active_schools': active_schools,
+        'attendance_rate': attendance_rate,
+        'attendance_vs_absence': att_vs_abs,
+        'schools_closed': schools_closed,
+        'closure_reasons': closure_reasons,
+        'teachers_stat': teachers_stat,
+        'salary_status': salary_status,
+        'dropout_risk': dropout_risk,
+        'school_map': map_points
+    }
+
+    return {
+        'kpi': indicators,
+        'nrt': nrt_data,
+        'reports': edu_reports,
+        'meta': {'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M'), 'source': 'DB_ETL_LIVE'}
+    }
 
 @app.route('/api/education')
 def get_education_data():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # --- READ FROM ETL TABLES ---
-        cursor.execute("SELECT * FROM education_indicators")
-        edu_rows = cursor.fetchall()
-        
-        indicators = {}
-        for row in edu_rows:
-            indicators[row['indicator_key']] = {
-                'value': row['current_value'],
-                'year': row['year_updated'],
-                'history': json.loads(row['history_json']) if row['history_json'] else []
-            }
-
-        # Literacy fallback if ETL failed/empty
-        if 'literacy_rate' not in indicators or indicators['literacy_rate']['value'] == 0:
-             indicators['literacy_total'] = {'value': 54.1, 'source': "World Bank / 2025 Proj"}
+        return section_response('education')
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+# --- SECTION PAYLOADS / BUNDLE ---
+
+def build_weather_section(cursor):
+    """The full /api/weather payload (all fields, default window) for /api/bundle."""
+    return weather_payload(cursor, list(WEATHER_FIELDS), parse_window(None))
+
+SECTION_BUILDERS = {
+    'weather': build_weather_section,
+    'health': build_health,
+    'economy': build_economy,
+    'education': build_education,
+}
+
+def section_version(name, snapshot_path):
+    # A published snapshot never changes, so its path identifies the data; the weather
+    # current block may also come from the state file, which has its own generation
+    if name == 'weather':
+        state = STATE_READER.rows()
+        return snapshot_path, state[0] if state else None
+    return snapshot_path
+
+def cached_section(name, snapshot_path, read_cursor):
+    """A section's payload from SECTION_CACHE, built with read_cursor() when stale."""
+    return SECTION_CACHE.get(name, section_version(name, snapshot_path),
+                             lambda: SECTION_BUILDERS[name](read_cursor()))
+
+def section_response(name):
+    """A single sector endpoint: the cached payload, or one built on a fresh read connection."""
+    snapshot_path = snapshot.current_snapshot()
+    state = {}
+    def read_cursor():
+        state['conn'] = get_read_connection(snapshot_path)
+        return state['conn'].cursor()
+    try:
+        payload = cached_section(name, snapshot_path, read_cursor)
+    finally:
+        if 'conn' in state:
+            state['conn'].close()
+    return json.dumps(dict({'status': 'success'}, **payload), cls=EnhancedEncoder), 200, {'Content-Type': 'application/json'}
+
+@app.route('/api/bundle')
+def get_bundle():
+    # ?sections=weather,health,economy,education (default: all of them, in that order)
+    names = [s for s in request.args.get('sections', ','.join(SECTION_BUILDERS)).split(',') if s]
+    unknown = [s for s in names if s not in SECTION_BUILDERS]
+    if unknown or not names:
+        return jsonify({'status': 'error', 'message': f"Unknown sections: {', '.join(unknown) or '(none)'}"}), 400
+    names = list(dict.fromkeys(names))
+
+    # Every section comes from the same snapshot: cached payloads are only reused when they
+    # were built from it, the rest are read in one transaction on one connection
+    snapshot_path = snapshot.current_snapshot()
+    state = {}
+    def read_cursor():
+        if 'cursor' not in state:
+            state['conn'] = get_read_connection(snapshot_path)
+            state['cursor'] = state['conn'].cursor()
+            state['cursor'].execute("BEGIN")
+        return state['cursor']
+
+    def generate():
+        # Streamed section by section; a failing section reports its own error
+        try:
+            yield '{"status": "success", "sections": {'
+            for i, name in enumerate(names):
+                try:
+                    body = dict({'status': 'success'}, **cached_section(name, snapshot_path, read_cursor))
+                except Exception as e:
+                    body = {'status': 'error', 'message': str(e)}
+                yield ('' if i == 0 else ', ') + json.dumps(name) + ': ' + json.dumps(body, cls=EnhancedEncoder)
+            yield '}, "server_time": ' + json.dumps(datetime.now().strftime('%H:%M:%S')) + '}'
+        finally:
+            if 'conn' in state:
+                state['conn'].commit()
+                state['conn'].close()
+
+    return Response(generate(), mimetype='application/json')
+
+MAX_REPORTS_PAGE = 100
+MAX_EMBEDDED_POINTS = 500      # points inlined in dashboard payloads; maps use /api/points
+MAX_BBOX_POINTS = 5000
+
+def fts_query(text):
+    """Free text -> FTS5 query: every word must match, a trailing * keeps prefix search."""
+    terms = re.findall(r'\w+\*?', text)
+    if not terms:
+        raise ValueError("Search text has no words")
+    return ' '.join(f'"{t.rstrip("*")}"' + ('*' if t.endswith('*') else '') for t in terms)
+
+# Feed text is stored as received (HDX notes may carry markup): FTS5 marks matches with
+# control characters, the snippet is escaped, and only then do the marks become <mark>
+SNIPPET_OPEN, SNIPPET_CLOSE = '\x02', '\x03'
+
+def snippet_html(snippet):
+    return html.escape(snippet).replace(SNIPPET_OPEN, '<mark>').replace(SNIPPET_CLOSE, '</mark>')
+
+@app.route('/api/reports')
+def get_reports():
+    # ?sector=health, ?q=cholera aden (full text), ?before=<cursor from the previous page>, ?limit=20
+    try:
+        sector = request.args.get('sector')
+        q = request.args.get('q', '').strip()
+        limit = max(1, min(request.args.get('limit', 20, type=int), MAX_REPORTS_PAGE))
+        where, params = ["r.date_published IS NOT NULL"], []
+        if sector:
+            where.append("r.sector = ?")
+            params.append(sector)
+        before = request.args.get('before')
+        if before:
+            # Keyset cursor "date|report_id": seeks straight to the next page, no OFFSET scan
+            date, _, report_id = before.rpartition('|')
+            if not date or not report_id.isdigit():
+                raise ValueError(f"Invalid cursor '{before}'")
+            where.append("(r.date_published, r.report_id) < (?, ?)")
+            params += [date, int(report_id)]
+
+        if q:
+            query = f"""
+                SELECT r.report_id, r.sector, r.title, r.source, r.date_published, r.url,
+                       snippet(reports_fts, -1, ?, ?, '…', 16) AS snippet
+                FROM reports_fts
+                JOIN situation_reports r ON r.report_id = reports_fts.rowid
+                WHERE reports_fts MATCH ? AND {' AND '.join(where)}
+                ORDER BY r.date_published DESC, r.report_id DESC
+                LIMIT ?
+            """
+            params = [SNIPPET_OPEN, SNIPPET_CLOSE, fts_query(q)] + params
         else:
-             indicators['literacy_total'] = indicators['literacy_rate']
-
-        # Get reports
-        cursor.execute("SELECT * FROM situation_reports WHERE sector = 'education' ORDER BY date_published DESC LIMIT 4")
-        report_rows = cursor.fetchall()
-        edu_reports = []
-        for r in report_rows:
-            edu_reports.append({
-                'title': r['title'],
-                'date': r['date_published']
-            })
+            query = f"""
+                SELECT r.report_id, r.sector, r.title, r.source, r.date_published, r.url, NULL AS snippet
+                FROM situation_reports r
+                WHERE {' AND '.join(where)}
+                ORDER BY r.date_published DESC, r.report_id DESC
+                LIMIT ?
+            """
 
+        conn = get_read_connection()
+        cursor = conn.cursor()
+        cursor.execute(query, params + [limit])
+        reports = [dict(row) for row in cursor.fetchall()]
         conn.close()
+        for report in reports:
+            if report['snippet']:
+                report['snippet'] = snippet_html(report['snippet'])
 
-        # --- NEAR-REAL-TIME (NRT) OPERATIONAL DATA (Bridged with ETL) ---
-        
-        # Date Logic
-        today = datetime.now()
-        dates_30 = [(today - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(29, -1, -1)]
-        weeks_8 = [(today - timedelta(weeks=i)).strftime('W%V') for i in range(7, -1, -1)]
-        
-        # 1. Active Schools (KPI)
-        # Baseline Total: 17,000 (Approx national schools)
-        # Subtract real damaged schools if found
-        total_schools_est = 17000
-        damaged = indicators.get('live_schools_damaged', {}).get('value') or indicators.get('projected_schools_damaged', {}).get('value', 2500)
-        
-        current_active = total_schools_est - damaged
-        
-        # Simulating history based on the current real value
-        active_hist = [current_active + int(math.sin(i)*50 - i*2) for i in range(7)]
-        active_schools = {'current': current_active, 'history_7d': active_hist}
-
-        # 2. Daily Attendance Rate 
-        att_rate_vals = [68 + math.sin(i/3)*5 + (random.random()*2) for i in range(30)]
-        attendance_rate = {'dates': dates_30, 'values': [round(x, 1) for x in att_rate_vals]}
-
-        # 3. Attendance vs Absence
-        absent_vals = [32 + math.cos(i/3)*4 for i in range(30)]
-        att_vs_abs = {
-            'dates': dates_30,
-            'present': [int(100-x) for x in absent_vals],
-            'absent': [int(x) for x in absent_vals]
-        }
+        last = reports[-1] if len(reports) == limit else None
+        return jsonify({
+            'status': 'success',
+            'reports': reports,
+            'next': f"{last['date_published']}|{last['report_id']}" if last else None
+        })
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
 
-        # 4. Schools Closed (Derived from Damaged + Flood/Conflict)
-        closed_base = damaged / 20 # Scaling for daily variation view or just using raw
-        closed_rolling = [int(closed_base) + int(i*1.5 + random.random()*10) for i in range(30)] 
-        schools_closed = {'dates': dates_30, 'count': closed_rolling}
-
-        # 5. Reasons for Closure (Real Data Bridge)
-        # Extract live drivers if available
-        c_flood = indicators.get('live_closure_flood', {}).get('value', 0)
-        c_conflict = indicators.get('live_closure_conflict', {}).get('value', 0)
-        c_salary = indicators.get('live_teachers_unpaid', {}).get('value', 0) # Proxy: unpaid teachers leads to closure
-        
-        # Normalize to % for chart if we have data, otherwise fallback
-        total_drivers = c_flood + c_conflict + c_salary
-        if total_drivers > 0:
-            p_salary = round((c_salary / total_drivers) * 100, 1)
-            p_conflict = round((c_conflict / total_drivers) * 100, 1)
-            p_flood = round((c_flood / total_drivers) * 100, 1)
-            p_other = max(0, 100 - (p_salary + p_conflict + p_flood))
-            
-            closure_labels = ['Unpaid Salaries/Strikes', 'Conflict/Safety', 'Flooding/Weather', 'Displacement Use', 'Fuel Shortage']
-            closure_values = [p_salary, p_conflict, p_flood, p_other/2, p_other/2]
-        else:
-            # Fallback Distribution if no specific driver counts found in text
-            closure_labels = ['Unpaid Salaries/Strikes', 'Conflict/Safety', 'Fuel Shortage', 'Flooding/Weather', 'Displacement Use']
-            closure_values = [45, 25, 15, 10, 5]
+@app.route('/api/points')
+def get_points():
+    # ?bbox=minLon,minLat,maxLon,maxLat (Leaflet toBBoxString), ?type=school[,health_facilities], ?limit=
+    try:
+        bbox = spatial.parse_bbox(request.args.get('bbox', '-180,-90,180,90'))
+        limit = max(1, min(request.args.get('limit', MAX_BBOX_POINTS, type=int), MAX_BBOX_POINTS))
+        conn = get_read_connection()
+        rows = spatial.points_in_bbox(conn.cursor(), bbox, request.args.get('type'), limit + 1)
+        conn.close()
+        return jsonify({
+            'status': 'success',
+            'type': 'FeatureCollection',
+            'features': [spatial.point_feature(r) for r in rows[:limit]],
+            # More points than the limit in view: the client should zoom in
+            'truncated': len(rows) > limit
+        })
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
 
-        closure_reasons = {
-            'labels': closure_labels,
-            'values': closure_values
-        }
+@app.route('/api/points/nearest')
+def get_nearest_points():
+    # ?lat=&lon=&k=5, ?type=location (weather locations, default) or a points type such as school
+    try:
+        lat = request.args.get('lat', type=float)
+        lon = request.args.get('lon', type=float)
+        if lat is None or lon is None or not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError("lat and lon are required")
+        k = max(1, min(request.args.get('k', 5, type=int), 100))
+        point_type = request.args.get('type', 'location')
+        source = 'location' if point_type == 'location' else 'point'
 
-        # 6. Teachers Stat (Real Data Bridge)
-        # Total Est Teachers: 250,000
-        total_teachers = 250000
-        unpaid_teachers = indicators.get('live_teachers_unpaid', {}).get('value') or indicators.get('projected_teachers_unpaid', {}).get('value', 190000)
-        
-        # Assumption: Unpaid teachers = Absent/Strike risk
-        present_est = total_teachers - (unpaid_teachers * 0.8) # 80% of unpaid are absent? Just a model.
-        
-        teachers_stat = {'present': int(present_est), 'expected': total_teachers}
-
-        # 7. Salary Payment Status (Derived from Real Unpaid Count)
-        p_unpaid = round((unpaid_teachers / total_teachers) * 100, 1)
-        p_delayed = round((100 - p_unpaid) * 0.6, 1)
-        p_paid = round(100 - p_unpaid - p_delayed, 1)
-        
-        salary_status = {
-            'paid': p_paid, 
-            'delayed': p_delayed,
-            'unpaid': p_unpaid,
-            'last_update': today.strftime('%Y-%m-%d')
-        }
+        conn = get_read_connection()
+        found = spatial.nearest(conn.cursor(), lat, lon, k, source, None if source == 'location' else point_type)
+        conn.close()
 
-        # 8. Dropout Risk Index (Dynamic)
-        out_of_school = indicators.get('live_out_of_school', {}).get('value') or indicators.get('projected_out_of_school', {}).get('value', 4500000)
-        # Est School Age Pop: 12M
-        risk_score = round((out_of_school / 12000000) * 100, 1)
-        risk_level = "CRITICAL" if risk_score > 40 else ("HIGH" if risk_score > 20 else "MODERATE")
-        
-        dropout_risk = {'value': risk_score, 'level': risk_level}
-
-        # 9. School Status Map (GeoJSON Points)
-        map_points = [
-            {'lat': 15.3694, 'lon': 44.1910, 'name': "Sana'a School A", 'status': "Unstable"},
-            {'lat': 12.7855, 'lon': 45.0188, 'name': "Aden Central", 'status': "Open"},
-            {'lat': 14.5485, 'lon': 44.4038, 'name': "Dhamar High", 'status': "Closed"},
-            {'lat': 13.5780, 'lon': 44.0040, 'name': "Taiz Pri-Ed", 'status': "Active-Shelling"},
-            {'lat': 14.7978, 'lon': 42.9550, 'name': "Hudaydah Port Sch", 'status': "Flooded"},
-            {'lat': 15.4290, 'lon': 45.3330, 'name': "Marib Camp Sch", 'status': "Overcrowded"}
-        ]
-        
-        nrt_data = {
-            'active_schools': active_schools,
-            'attendance_rate': attendance_rate,
-            'attendance_vs_absence': att_vs_abs,
-            'schools_closed': schools_closed,
-            'closure_reasons': closure_reasons,
-            'teachers_stat': teachers_stat,
-            'salary_status': salary_status,
-            'dropout_risk': dropout_risk,
-            'school_map': map_points
-        }
+        results = []
+        for distance, row in found:
+            item = ({'location_id': row['location_id'], 'city_name': row['city_name'], 'country': row['country'],
+                     'latitude': row['latitude'], 'longitude': row['longitude']}
+                    if source == 'location' else spatial.point_feature(row))
+            item['distance_km'] = round(distance, 2)
+            results.append(item)
+        return jsonify({'status': 'success', 'results': results})
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+# Built boundary files change only when build_boundaries.py is re-run: cache for a week
+# and revalidate with the file's ETag after that
+BOUNDARY_MAX_AGE = 7 * 86400
+BOUNDARY_LEVEL_RE = re.compile(r'^adm1-z(\d+)\.(topo|mask)\.json$')
+
+def send_boundary_file(kind):
+    """?zoom= map zoom: the finest built level not above it (the coarsest one below all levels)."""
+    zoom = request.args.get('zoom', 6, type=int)
+    names = os.listdir(build_boundaries.BOUNDARY_DIR) if os.path.isdir(build_boundaries.BOUNDARY_DIR) else []
+    levels = sorted(int(m.group(1)) for m in map(BOUNDARY_LEVEL_RE.match, names) if m and m.group(2) == kind)
+    if not levels:
+        return jsonify({'status': 'error', 'message': 'Boundaries not built (run build_boundaries.py)'}), 404
+    level = max([z for z in levels if z <= zoom] or levels[:1])
+    name = build_boundaries.boundary_file(level, kind)
+
+    gzipped = 'gzip' in request.headers.get('Accept-Encoding', '') and name + '.gz' in names
+    response = send_from_directory(build_boundaries.BOUNDARY_DIR, name + '.gz' if gzipped else name,
+                                   mimetype='application/json', max_age=BOUNDARY_MAX_AGE)
+    if gzipped:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['X-Boundary-Zoom'] = str(level)
+    response.cache_control.public = True
+    return response
+
+@app.route('/api/boundaries')
+def get_boundaries():
+    # Simplified, quantized ADM1 TopoJSON for the map
+    try:
+        return send_boundary_file('topo')
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/boundaries/mask')
+def get_boundary_mask():
+    # Run-length-encoded raster of governorate ids for the wind particles' boundary test
+    try:
+        return send_boundary_file('mask')
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+# --- BULK EXPORT ---
+
+def export_options():
+    fmt = request.args.get('format', 'ndjson').lower()
+    if fmt not in bulk_export.FORMATS:
+        raise ValueError(f"Unknown format '{fmt}' (use {' or '.join(bulk_export.FORMATS)})")
+    return fmt, request.args.get('gzip', '0').lower() in ('1', 'true', 'yes')
+
+def export_response(name, conn, chunks, columns, fmt, compress):
+    """Streams the export; the read connection closes with the response (stream finished, client
+    gone, or a body that was never read, e.g. HEAD), not in the generator, which may never start."""
+    filename = f"{name}.{fmt}" + ('.gz' if compress else '')
+    response = Response(bulk_export.stream(chunks, columns, fmt, compress,
+                                           on_error=lambda e: print(f"Export Error ({name}): {e}")),
+                        mimetype='application/gzip' if compress else bulk_export.FORMATS[fmt],
+                        headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+    response.call_on_close(conn.close)
+    return response
+
+@app.route('/api/export/weather_history')
+def export_weather_history():
+    # ?from=&to= epoch seconds or local YYYY-MM-DD[THH:MM[:SS]], ?cities= ids or names,
+    # ?format=ndjson|csv, ?gzip=1
+    conn = None
+    try:
+        fmt, compress = export_options()
+        since = bulk_export.parse_time(request.args.get('from'), 'from')
+        until = bulk_export.parse_time(request.args.get('to'), 'to')
+        cities_sql, cities_params = city_filter(request.args.get('cities'))
+
+        conn = get_read_connection()
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT l.location_id, l.city_name FROM locations l WHERE 1=1{cities_sql} ORDER BY l.location_id",
+                       cities_params)
+        locations = [(r[0], r[1]) for r in cursor.fetchall()]
+    except ValueError as e:
+        if conn is not None:
+            conn.close()
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        if conn is not None:
+            conn.close()
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+    return export_response('weather_history', conn,
+                           bulk_export.weather_history_chunks(cursor, locations, since, until),
+                           bulk_export.WEATHER_EXPORT_COLUMNS, fmt, compress)
+
+@app.route('/api/export/indicators')
+def export_indicators():
+    # ?sector=health,economy,education (default: all), ?keys= indicator keys, ?format=ndjson|csv, ?gzip=1
+    conn = None
+    try:
+        fmt, compress = export_options()
+        sectors = [s for s in request.args.get('sector', ','.join(bulk_export.INDICATOR_TABLES)).split(',') if s]
+        unknown = [s for s in sectors if s not in bulk_export.INDICATOR_TABLES]
+        if unknown:
+            raise ValueError(f"Unknown sectors: {', '.join(unknown)}")
+        keys = [k for k in request.args.get('keys', '').split(',') if k]
+
+        conn = get_read_connection()
+        cursor = conn.cursor()
+    except ValueError as e:
+        if conn is not None:
+            conn.close()
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        if conn is not None:
+            conn.close()
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+    return export_response('indicators', conn, bulk_export.indicator_chunks(cursor, sectors, keys),
+                           bulk_export.INDICATOR_EXPORT_COLUMNS, fmt, compress)
+
+@app.route('/api/metrics')
+def get_metrics():
+    # Per-process SQL profile (each gunicorn worker reports its own numbers)
+    try:
+        conn = get_read_connection()
+        fetcher = fetch_telemetry.get_fetch_metrics(conn.cursor())
+        fetcher['leases'] = fetcher_lease.get_leases(conn.cursor())
+        conn.close()
+    except Exception as e:
+        fetcher = {'error': str(e)}
+
+    return jsonify({
+        'status': 'success',
+        'pid': os.getpid(),
+        'slow_query_ms': db_profiler.SLOW_QUERY_MS,
+        'sql': db_profiler.get_stats(limit=50),
+        'sections': SECTION_CACHE.stats(),
+        'fetcher': fetcher
+    })
 
-        response_data = {
+@app.route('/api/weather/freshness')
+def get_weather_freshness():
+    try:
+        conn = get_read_connection()
+        rows = fetch_telemetry.get_freshness(conn.cursor())
+        conn.close()
+
+        for row in rows:
+            for key in ('observation_time', 'fetched_at'):
+                if row.get(key) and isinstance(row[key], str):
+                    row[key] = row[key].replace(' ', 'T')
+
+        ages = [r['staleness_s'] for r in rows if r['staleness_s'] is not None]
+        return jsonify({
             'status': 'success',
-            'kpi': indicators,
-            'nrt': nrt_data,
-            'reports': edu_reports,
-            'meta': {'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M'), 'source': 'DB_ETL_LIVE'}
-        }
-        
-        return json.dumps(response_data, cls=EnhancedEncoder), 200, {'Content-Type': 'application/json'}
+            'locations': rows,
+            'max_staleness_s': max(ages) if ages else None,
+            'server_time': datetime.now().strftime('%H:%M:%S')
+        })
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/weather/anomalies')
+def get_weather_anomalies():
+    # ?hours=24 look-back, ?cities= ids or names, ?min_z= stricter threshold, ?limit=
+    try:
+        hours = max(1, min(request.args.get('hours', 24, type=int), anomaly_detector.ANOMALY_RETENTION_DAYS * 24))
+        limit = max(1, min(request.args.get('limit', 200, type=int), 1000))
+        cities_sql, cities_params = city_filter(request.args.get('cities'))
+        since = int((datetime.now() - timedelta(hours=hours)).timestamp())
 
+        conn = get_read_connection()
+        anomalies = anomaly_detector.get_anomalies(conn.cursor(), since, cities_sql, cities_params,
+                                                   request.args.get('min_z', type=float), limit)
+        conn.close()
+
+        return jsonify({
+            'status': 'success',
+            'threshold_z': anomaly_detector.ANOMALY_Z,
+            'anomalies': anomalies,
+            'server_time': datetime.now().strftime('%H:%M:%S')
+        })
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
@@ -0,0 +1,118 @@
+import os
+import sys
+import time
+import random
+import sqlite3
+import tempfile
+
+# Benchmark: legacy rowid weather_history (TEXT time + 2 secondary indexes) versus the
+# clustered WITHOUT ROWID weather_obs layout (integer epoch key).
+# Usage: python benchmarks/bench_history_layout.py [rows=10000000] [locations=300]
+
+LEGACY_DDL = """
+CREATE TABLE weather_history (
+    history_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    location_id INTEGER NOT NULL,
+    observation_time TEXT NOT NULL,
+    temperature REAL, humidity REAL, windspeed REAL, winddirection INTEGER, weathercode INTEGER,
+    is_day BOOLEAN, pressure REAL, uv_index REAL, dew_point REAL, visibility INTEGER,
+    cloud_cover INTEGER, solar_rad REAL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    fetched_at TEXT, generation INTEGER,
+    UNIQUE(location_id, observation_time)
+);
+CREATE INDEX idx_history_time ON weather_history (observation_time);
+CREATE INDEX idx_history_location_time ON weather_history (location_id, observation_time);
+"""
+LEGACY_INSERT = """
+INSERT OR IGNORE INTO weather_history (location_id, observation_time, temperature, humidity, windspeed,
+    winddirection, weathercode, is_day, pressure, uv_index, dew_point, visibility, cloud_cover, solar_rad,
+    fetched_at, generation) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+LEGACY_SCAN = """
+SELECT observation_time, temperature FROM weather_history
+WHERE location_id = ? AND observation_time > ? ORDER BY observation_time
+"""
+
+NEW_DDL = """
+CREATE TABLE weather_obs (
+    location_id INTEGER NOT NULL, ts_epoch INTEGER NOT NULL,
+    temperature REAL, humidity INTEGER, windspeed REAL, winddirection INTEGER, weathercode INTEGER,
+    is_day INTEGER, pressure REAL, uv_index REAL, dew_point REAL, visibility INTEGER,
+    cloud_cover INTEGER, solar_rad REAL, fetched_epoch INTEGER, generation INTEGER,
+    PRIMARY KEY (location_id, ts_epoch)
+) WITHOUT ROWID;
+CREATE INDEX idx_obs_generation ON weather_obs (generation);
+"""
+NEW_INSERT = """
+INSERT OR IGNORE INTO weather_obs (location_id, ts_epoch, temperature, humidity, windspeed,
+    winddirection, weathercode, is_day, pressure, uv_index, dew_point, visibility, cloud_cover, solar_rad,
+    fetched_epoch, generation) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+NEW_SCAN = """
+SELECT ts_epoch, temperature FROM weather_obs
+WHERE location_id = ? AND ts_epoch > ? ORDER BY ts_epoch
+"""
+
+STEP = 300          # 5 minute cadence
+BATCH = 50000       # rows per executemany / commit, like a bulk backfill
+
+def rows(n_rows, n_locations, start, as_text):
+    """Yields rows in arrival order: every location once per 5 minute step."""
+    rng = random.Random(7)
+    fmt = time.strftime
+    for i in range(n_rows):
+        step, loc = divmod(i, n_locations)
+        ts = start + step * STEP
+        t = fmt('%Y-%m-%d %H:%M:%S', time.localtime(ts)) if as_text else ts
+        yield (loc + 1, t, round(15 + rng.random() * 20, 1), rng.randint(10, 90), round(rng.random() * 30, 1),
+               rng.randint(0, 359), 113, 1, 1000.0, 5.0, 10.0, 10000, rng.randint(0, 100), 0.0, t, step)
+
+def run(label, ddl, insert_sql, scan_sql, n_rows, n_locations, as_text):
+    path = os.path.join(tempfile.mkdtemp(prefix='bench_layout_'), 'bench.db')
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(ddl)
+    start = int(time.time()) - (n_rows // n_locations) * STEP
+
+    t0 = time.perf_counter()
+    batch = []
+    for row in rows(n_rows, n_locations, start, as_text):
+        batch.append(row)
+        if len(batch) >= BATCH:
+            conn.executemany(insert_sql, batch)
+            conn.commit()
+            batch = []
+    if batch:
+        conn.executemany(insert_sql, batch)
+        conn.commit()
+    insert_s = time.perf_counter() - t0
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    size_mb = os.path.getsize(path) / 1e6
+
+    # Range scan: last 24h for 100 random locations (what chart/history queries do)
+    end = start + (n_rows // n_locations) * STEP
+    since = end - 86400
+    since_param = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(since)) if as_text else since
+    rng = random.Random(1)
+    targets = [rng.randint(1, n_locations) for _ in range(100)]
+    t0 = time.perf_counter()
+    fetched = 0
+    for loc in targets:
+        fetched += len(conn.execute(scan_sql, (loc, since_param)).fetchall())
+    scan_ms = (time.perf_counter() - t0) * 1000
+    conn.close()
+    os.remove(path)
+
+    print(f"{label:<22} {n_rows / insert_s:>12,.0f} {size_mb:>10.1f} {scan_ms:>12.1f} {fetched:>9}")
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    n_locations = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    print(f"=== weather history layout benchmark: {n_rows:,} rows, {n_locations} locations ===")
+    print(f"{'LAYOUT':<22} {'INSERT rows/s':>12} {'SIZE MB':>10} {'SCAN 100x24h ms':>12} {'ROWS':>9}")
+    run('rowid + TEXT (legacy)', LEGACY_DDL, LEGACY_INSERT, LEGACY_SCAN, n_rows, n_locations, True)
+    run('WITHOUT ROWID + epoch', NEW_DDL, NEW_INSERT, NEW_SCAN, n_rows, n_locations, False)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+import os
+import sys
+import time
+import random
+import shutil
+import sqlite3
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+# Benchmark: /api/weather payload size and query time with and without
+# server-side field/city/window selection, on a scratch database.
+# Usage: python benchmarks/bench_weather_payload.py [locations] [repeats]
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+def build_scratch_db(workdir, n_locations, hours=6, step_min=5):
+    """Creates weather.db in workdir with n_locations and `hours` of history at `step_min` cadence."""
+    shutil.copy(os.path.join(BASE_DIR, 'schema.sql'), workdir)
+    conn = sqlite3.connect(os.path.join(workdir, 'weather.db'))
+    with open(os.path.join(workdir, 'schema.sql')) as f:
+        conn.executescript(f.read())
+    conn.execute("DELETE FROM locations")
+    rng = random.Random(42)
+    locs = [(i + 1, f"Site {i + 1:04d}", 'Yemen', 12.5 + rng.random() * 6, 42.5 + rng.random() * 10)
+            for i in range(n_locations)]
+    conn.executemany("INSERT INTO locations (location_id, city_name, country, latitude, longitude) VALUES (?, ?, ?, ?, ?)", locs)
+
+    now = datetime.now().replace(second=0, microsecond=0)
+    cols = "location_id, observation_time, temperature, humidity, windspeed, winddirection, weathercode, pressure, uv_index, visibility, cloud_cover, dew_point, solar_rad, is_day, fetched_at, generation"
+    hist = []
+    for loc_id, *_ in locs:
+        for k in range(hours * 60 // step_min):
+            t = (now - timedelta(minutes=k * step_min)).strftime('%Y-%m-%d %H:%M:%S')
+            hist.append((loc_id, t, 20 + rng.random() * 15, 40.0, 10.0, 90, 113, 1000.0, 5.0, 10000, 10, 8.0, 0.0, 1, t, 1))
+    conn.executemany(f"INSERT INTO weather_history ({cols}) VALUES ({', '.join('?' * 16)})", hist)
+    conn.execute(f"INSERT INTO current_weather ({cols}) SELECT {cols} FROM weather_history WHERE observation_time = ?",
+                 (now.strftime('%Y-%m-%d %H:%M:%S'),))
+    conn.execute("UPDATE sync_state SET value = 1 WHERE key = 'generation'")
+    conn.commit()
+    conn.close()
+
+def measure(client, url, repeats):
+    timings, size = [], 0
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        resp = client.get(url)
+        timings.append((time.perf_counter() - t0) * 1000)
+        size = len(resp.data)
+        assert resp.status_code == 200, resp.data[:200]
+    return size, statistics.median(timings)
+
+def main():
+    n_locations = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    workdir = tempfile.mkdtemp(prefix='bench_weather_')
+    build_scratch_db(workdir, n_locations)
+    os.chdir(workdir)  # app.py initializes ./weather.db on import
+    import app
+
+    client = app.app.test_client()
+    ids = ','.join(str(i) for i in range(1, 5))
+    cases = [
+        ('full (legacy)', '/api/weather'),
+        ('dashboard first load', '/api/weather?fields=latitude,longitude,temperature,humidity,windspeed,winddirection,pressure,uv_index,visibility,cloud_cover&window=3h'),
+        ('dashboard steady poll', f'/api/weather?fields=latitude,longitude,temperature,humidity,windspeed,winddirection,pressure,uv_index,visibility,cloud_cover&window=3h&history_cities={ids}&since=1'),
+        ('4 cities, temp only', f'/api/weather?fields=temperature&cities={ids}&window=3h'),
+    ]
+
+    print(f"=== /api/weather payload benchmark: {n_locations} locations, 6h history @5min ===")
+    print(f"{'CASE':<24} {'BYTES':>10} {'MEDIAN ms':>10}")
+    for name, url in cases:
+        size, ms = measure(client, url, repeats)
+        print(f"{name:<24} {size:>10} {ms:>10.2f}")
+
+    shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
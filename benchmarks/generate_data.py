@@ -0,0 +1,247 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+from datetime import datetime
+
+import numpy as np
+
+# Synthetic data generator for scale testing.
+# Fills a scratch weather.db with N locations and M years of 5-minute observations
+# (diurnal + seasonal cycles, smooth weather noise), a 3-day hourly forecast,
+# sector indicator tables and situation_reports. Everything per location is
+# computed as numpy arrays, so the run time is dominated by SQLite inserts.
+# Usage: python benchmarks/generate_data.py OUT.db [--locations 50] [--years 1]
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from weather_providers import FORECAST_COLS
+
+STEP_S = 300
+UTC_OFFSET_H = 3                 # Yemen, no DST
+LAT_RANGE = (12.5, 18.5)
+LON_RANGE = (42.5, 53.0)
+SECTORS = ['health', 'education', 'economy']
+INDICATOR_TABLES = {'health': 'health_indicators', 'education': 'education_indicators',
+                    'economy': 'economic_indicators'}
+
+OBS_COLS = ['location_id', 'ts_epoch', 'temperature', 'humidity', 'windspeed', 'winddirection', 'weathercode',
+            'pressure', 'uv_index', 'visibility', 'cloud_cover', 'dew_point', 'solar_rad', 'is_day',
+            'fetched_epoch', 'generation']
+
+TITLE_WORDS = {
+    'health': ['Cholera', 'Measles', 'Malnutrition', 'Dengue', 'Health Cluster', 'Vaccination', 'Hospital'],
+    'education': ['School', 'Enrollment', 'Teachers', 'Learning Spaces', 'Education Cluster', 'Exams'],
+    'economy': ['Currency', 'Food Prices', 'Fuel', 'Remittances', 'Market Monitor', 'Trade'],
+}
+TITLE_TAILS = ['Situation Report', 'Bulletin', 'Flash Update', 'Response Overview', 'Dashboard', 'Snapshot']
+GOVERNORATES = ["Sana'a", 'Aden', 'Taiz', 'Al Hudaydah', 'Ibb', 'Dhamar', 'Marib', 'Hadramaut', 'Lahj', 'Abyan']
+
+
+def smooth_noise(rng, ts, scale, period_s=3 * 3600):
+    """Random knots every `period_s` linearly interpolated onto ts: weather-like slow variation."""
+    knots = np.arange(ts[0] - period_s, ts[-1] + 2 * period_s, period_s)
+    return np.interp(ts, knots, rng.normal(0.0, scale, knots.size))
+
+
+def solar_elevation(ts, lat, lon):
+    """Approximate solar elevation (degrees) from day of year and local solar time."""
+    days = ts / 86400.0
+    doy = np.mod(days, 365.25)
+    decl = np.radians(23.44) * np.sin(2 * np.pi * (doy - 81) / 365.25)
+    solar_hour = np.mod(days * 24 + lon / 15.0, 24)
+    hour_angle = np.radians(15.0 * (solar_hour - 12))
+    lat_r = np.radians(lat)
+    sin_el = np.sin(lat_r) * np.sin(decl) + np.cos(lat_r) * np.cos(decl) * np.cos(hour_angle)
+    return np.degrees(np.arcsin(np.clip(sin_el, -1, 1)))
+
+
+def simulate(rng, site, ts):
+    """Returns a dict of observation columns (numpy arrays) for one site over the ts grid."""
+    n = ts.size
+    local_hour = np.mod(ts / 3600.0 + UTC_OFFSET_H, 24)
+    doy = np.mod(ts / 86400.0, 365.25)
+
+    seasonal = site['season_amp'] * np.cos(2 * np.pi * (doy - 200) / 365.25)
+    diurnal = site['diurnal_amp'] * np.cos(2 * np.pi * (local_hour - 15) / 24)
+    temp = site['base_temp'] + seasonal + diurnal + smooth_noise(rng, ts, 1.5) + rng.normal(0, 0.2, n)
+
+    humidity = np.clip(site['base_hum'] - 2.5 * diurnal + smooth_noise(rng, ts, 8.0), 5, 100)
+    # Magnus formula over water
+    gamma = np.log(humidity / 100.0) + 17.62 * temp / (243.12 + temp)
+    dew = 243.12 * gamma / (17.62 - gamma)
+
+    wind = np.clip(site['base_wind'] + 0.6 * np.maximum(diurnal, 0) + smooth_noise(rng, ts, 4.0)
+                   + rng.gamma(1.5, 1.0, n), 0, None)
+    wind_dir = np.mod(site['wind_dir'] + np.cumsum(rng.normal(0, 2.0, n)), 360)
+
+    cloud = np.clip(site['base_cloud'] + smooth_noise(rng, ts, 30.0, period_s=6 * 3600), 0, 100)
+    code = np.select([cloud < 20, cloud < 60, cloud < 85], [113, 116, 119], 122)
+
+    elevation = solar_elevation(ts, site['lat'], site['lon'])
+    sin_el = np.clip(np.sin(np.radians(elevation)), 0, None)
+    solar = 1000.0 * sin_el * (1 - 0.75 * (cloud / 100.0) ** 3)
+    uv = 11.0 * sin_el * (1 - 0.5 * cloud / 100.0)
+
+    return {
+        'temperature': np.round(temp, 1),
+        'humidity': np.round(humidity).astype(int),
+        'windspeed': np.round(wind, 1),
+        'winddirection': np.round(wind_dir).astype(int),
+        'weathercode': code,
+        'pressure': np.round(1012.0 - site['elevation'] * 0.11 + smooth_noise(rng, ts, 2.0, 12 * 3600), 1),
+        'uv_index': np.round(uv, 1),
+        'visibility': np.clip(10000 + smooth_noise(rng, ts, 2500.0), 500, 10000).astype(int),
+        'cloud_cover': np.round(cloud).astype(int),
+        'dew_point': np.round(dew, 1),
+        'solar_rad': np.round(solar, 1),
+        'is_day': (elevation > 0).astype(int),
+    }
+
+
+def make_sites(rng, n_locations):
+    lat = rng.uniform(*LAT_RANGE, n_locations)
+    lon = rng.uniform(*LON_RANGE, n_locations)
+    elevation = rng.uniform(0, 2800, n_locations)
+    return [{
+        'location_id': i + 1,
+        'city_name': f"Site {i + 1:04d}",
+        'lat': float(lat[i]), 'lon': float(lon[i]), 'elevation': float(elevation[i]),
+        'base_temp': 31.0 - 0.0065 * elevation[i],
+        'season_amp': rng.uniform(3, 7),
+        'diurnal_amp': rng.uniform(4, 9),
+        'base_hum': rng.uniform(25, 75),
+        'base_wind': rng.uniform(4, 16),
+        'wind_dir': rng.uniform(0, 360),
+        'base_cloud': rng.uniform(5, 50),
+    } for i in range(n_locations)]
+
+
+def insert_observations(conn, rng, sites, ts):
+    generation = np.arange(1, ts.size + 1)
+    fetched = ts + 20
+    sql = f"INSERT INTO weather_obs ({', '.join(OBS_COLS)}) VALUES ({', '.join('?' * len(OBS_COLS))})"
+    current = []
+    for site in sites:
+        cols = simulate(rng, site, ts)
+        loc = np.full(ts.size, site['location_id'])
+        arrays = [loc, ts] + [cols[c] for c in OBS_COLS[2:-2]] + [fetched, generation]
+        conn.executemany(sql, zip(*(a.tolist() for a in arrays)))
+        current.append((site['location_id'],) + tuple(cols[c][-1].item() for c in OBS_COLS[2:-2]))
+        conn.commit()
+
+    obs_time = datetime.fromtimestamp(int(ts[-1])).strftime('%Y-%m-%d %H:%M:%S')
+    fetched_at = datetime.fromtimestamp(int(fetched[-1])).strftime('%Y-%m-%d %H:%M:%S')
+    cur_cols = ['location_id'] + OBS_COLS[2:-2]
+    conn.executemany(
+        f"INSERT INTO current_weather ({', '.join(cur_cols)}, observation_time, fetched_at, generation) "
+        f"VALUES ({', '.join('?' * len(cur_cols))}, ?, ?, ?)",
+        [row + (obs_time, fetched_at, int(ts.size)) for row in current])
+    conn.execute("UPDATE sync_state SET value = ? WHERE key = 'generation'", (int(ts.size),))
+    conn.commit()
+
+
+def insert_forecast(conn, rng, sites, issued_ts, hours=72):
+    issued = datetime.fromtimestamp(issued_ts).strftime('%Y-%m-%d %H:%M:%S')
+    ts = issued_ts - issued_ts % 3600 + 3600 * np.arange(1, hours + 1)
+    valid = [datetime.fromtimestamp(t).strftime('%Y-%m-%d %H:%M:%S') for t in ts.tolist()]
+    cols = ', '.join(['location_id', 'issued_time'] + FORECAST_COLS)
+    sql = f"INSERT INTO forecast ({cols}) VALUES ({', '.join('?' * (len(FORECAST_COLS) + 2))})"
+    for site in sites:
+        c = simulate(rng, site, ts)
+        feels = c['temperature'] + 0.1 * c['humidity'] - 0.05 * c['windspeed']
+        rows = zip(valid, c['temperature'].tolist(), np.round(feels, 1).tolist(), c['humidity'].tolist(),
+                   c['windspeed'].tolist(), c['winddirection'].tolist(), c['weathercode'].tolist(),
+                   c['pressure'].tolist(), c['uv_index'].tolist(), c['visibility'].tolist(),
+                   c['cloud_cover'].tolist(), c['dew_point'].tolist(),
+                   np.round(c['cloud_cover'] * 0.4).tolist(), np.round(c['cloud_cover'] / 200.0, 1).tolist())
+        conn.executemany(sql, [(site['location_id'], issued) + row for row in rows])
+    conn.commit()
+
+
+def insert_indicators(conn, rng, n_indicators, first_year=1990, last_year=2025):
+    years = np.arange(first_year, last_year + 1)
+    for sector, table in INDICATOR_TABLES.items():
+        rows = []
+        for i in range(n_indicators):
+            walk = np.round(rng.uniform(10, 500) * np.exp(np.cumsum(rng.normal(0, 0.05, years.size))), 2)
+            history = [{'year': str(y), 'value': v} for y, v in zip(years.tolist(), walk.tolist())]
+            rows.append((f"synthetic_{sector}_{i:03d}", walk[-1].item(), str(last_year), json.dumps(history)))
+        conn.executemany(f"""
+            INSERT OR REPLACE INTO {table} (indicator_key, current_value, year_updated, history_json, updated_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """, rows)
+    conn.commit()
+
+
+def insert_reports(conn, rng, n_reports, start_ts, end_ts):
+    sectors = rng.choice(SECTORS, n_reports)
+    dates = rng.uniform(start_ts, end_ts, n_reports)
+    rows = []
+    for i, (sector, ts) in enumerate(zip(sectors.tolist(), dates.tolist())):
+        words = TITLE_WORDS[sector]
+        title = (f"Yemen: {words[rng.integers(len(words))]} {TITLE_TAILS[rng.integers(len(TITLE_TAILS))]} - "
+                 f"{GOVERNORATES[rng.integers(len(GOVERNORATES))]} #{i + 1}")
+        rows.append((sector, title, 'ReliefWeb (Synthetic)', datetime.fromtimestamp(ts).strftime('%Y-%m-%d'),
+                     f"https://reliefweb.int/report/yemen/synthetic-{i + 1}"))
+    conn.executemany("""
+        INSERT OR IGNORE INTO situation_reports (sector, title, source, date_published, url)
+        VALUES (?, ?, ?, ?, ?)
+    """, rows)
+    conn.commit()
+
+
+def generate(path, n_locations=50, years=1.0, n_indicators=40, n_reports=5000, seed=42):
+    """Creates (or replaces) a database at path. Returns a summary dict."""
+    if os.path.exists(path):
+        os.remove(path)
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(path)
+    # Bulk load: durability does not matter for a scratch file
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    with open(os.path.join(BASE_DIR, 'schema.sql')) as f:
+        conn.executescript(f.read())
+
+    sites = make_sites(rng, n_locations)
+    conn.execute("DELETE FROM locations")
+    conn.executemany("INSERT INTO locations (location_id, city_name, country, latitude, longitude) VALUES (?, ?, ?, ?, ?)",
+                     [(s['location_id'], s['city_name'], 'Yemen', round(s['lat'], 4), round(s['lon'], 4)) for s in sites])
+
+    end = int(time.time()) // STEP_S * STEP_S
+    start = end - int(years * 365 * 86400)
+    ts = np.arange(start + STEP_S, end + 1, STEP_S, dtype=np.int64)
+
+    insert_observations(conn, rng, sites, ts)
+    insert_forecast(conn, rng, sites, end)
+    insert_indicators(conn, rng, n_indicators)
+    insert_reports(conn, rng, n_reports, start, end)
+    conn.execute("PRAGMA journal_mode=DELETE")
+    conn.close()
+    return {'locations': n_locations, 'years': years, 'observations': n_locations * ts.size,
+            'indicators': n_indicators * len(INDICATOR_TABLES), 'reports': n_reports}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic weather.db for scale testing")
+    parser.add_argument('out', help="output database path (replaced if it exists)")
+    parser.add_argument('--locations', type=int, default=50)
+    parser.add_argument('--years', type=float, default=1.0)
+    parser.add_argument('--indicators', type=int, default=40, help="synthetic indicators per sector")
+    parser.add_argument('--reports', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    summary = generate(args.out, args.locations, args.years, args.indicators, args.reports, args.seed)
+    elapsed = time.perf_counter() - t0
+    print(f"Generated {args.out} in {elapsed:.1f}s: {summary['observations']:,} observations "
+          f"({summary['observations'] / elapsed:,.0f} rows/s), {summary['indicators']} indicators, "
+          f"{summary['reports']} reports, {os.path.getsize(args.out) / 1e6:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
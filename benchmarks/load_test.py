@@ -0,0 +1,300 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import sqlite3
+import argparse
+import tempfile
+import threading
+import subprocess
+from collections import defaultdict
+
+import requests
+
+# Load test: K simulated wallboard sessions polling a local gunicorn with the
+# dashboards' own cadences, while a simulated fetcher writes to the same weather.db.
+#   dashboard.html  /api/weather        every 3s (full load, then ?since= delta polls)
+#   education.html  /api/education      every 10s
+#   economy.html    /api/economy        every 60s
+#   health.html     /api/health         on page load (wallboards reload it every --health-reload s)
+# Reports throughput, latency percentiles, errors and SQLITE_BUSY ("database is locked") counts.
+# Usage: python benchmarks/load_test.py [--sessions 50] [--duration 60] [--workers 2] [--threads 4]
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import snapshot
+
+DASHBOARD_FIELDS = 'latitude,longitude,temperature,humidity,windspeed,winddirection,pressure,uv_index,visibility,cloud_cover'
+HISTORY_WINDOW = '3h'
+HISTORY_CITY_COUNT = 4
+DEFAULT_MIX = 'dashboard=0.6,education=0.15,economy=0.15,health=0.1'
+
+
+def is_busy(text):
+    text = (text or '').lower()
+    return 'database is locked' in text or 'database is busy' in text
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p / 100))]
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.busy = defaultdict(int)
+
+    def add(self, name, ms, ok, busy=False):
+        with self.lock:
+            self.latency[name].append(ms)
+            if not ok:
+                self.errors[name] += 1
+            if busy:
+                self.busy[name] += 1
+
+
+class Session(threading.Thread):
+    """One browser tab. Requests are scheduled on a fixed cadence like setInterval."""
+
+    def __init__(self, page, base_url, recorder, stop, health_reload):
+        super().__init__(daemon=True)
+        self.page = page
+        self.base_url = base_url
+        self.recorder = recorder
+        self.stop = stop
+        self.http = requests.Session()
+        self.interval = {'dashboard': 3, 'education': 10, 'economy': 60, 'health': health_reload}[page]
+        self.generation = None
+        self.history_cities = ''
+
+    def url(self):
+        if self.page != 'dashboard':
+            return f"{self.base_url}/api/{self.page}", f"/api/{self.page}"
+        params = {'fields': DASHBOARD_FIELDS, 'window': HISTORY_WINDOW}
+        if self.generation is not None:
+            params.update(since=self.generation, history_cities=self.history_cities)
+            name = '/api/weather (delta)'
+        else:
+            name = '/api/weather (full)'
+        return f"{self.base_url}/api/weather?{requests.compat.urlencode(params)}", name
+
+    def request(self):
+        url, name = self.url()
+        t0 = time.perf_counter()
+        try:
+            resp = self.http.get(url, timeout=30)
+            ms = (time.perf_counter() - t0) * 1000
+            ok = resp.status_code == 200
+            if self.page == 'dashboard' and ok:
+                payload = resp.json()
+                if self.generation is None:
+                    self.history_cities = ','.join(str(c['location_id']) for c in payload['current'][:HISTORY_CITY_COUNT])
+                self.generation = payload.get('generation')
+            self.recorder.add(name, ms, ok, busy=not ok and is_busy(resp.text))
+        except (requests.RequestException, ValueError) as e:
+            self.recorder.add(name, (time.perf_counter() - t0) * 1000, False, busy=is_busy(str(e)))
+
+    def run(self):
+        # Tabs were opened at different moments, so start at a random phase of the interval
+        due = time.monotonic() + random.uniform(0, min(self.interval, 3))
+        while not self.stop.is_set():
+            wait = due - time.monotonic()
+            if wait > 0 and self.stop.wait(wait):
+                break
+            self.request()
+            due += self.interval
+            if due < time.monotonic():
+                due = time.monotonic()  # server fell behind: the browser timer does not burst
+
+
+class FetcherWriter(threading.Thread):
+    """Replays a weather_fetcher cycle (observations + forecasts for every location) on a cadence."""
+
+    def __init__(self, db_path, interval, stop, snapshot_dir=None):
+        super().__init__(daemon=True)
+        self.db_path = db_path
+        self.interval = interval
+        self.stop = stop
+        self.snapshot_dir = snapshot_dir
+        self.cycles = []
+        self.busy = 0
+        self.errors = 0
+
+    def cycle(self, conn, ts):
+        import weather_fetcher
+        from weather_providers import local_time_from_epoch
+
+        cursor = conn.cursor()
+        location_ids = [r[0] for r in cursor.execute("SELECT location_id FROM locations").fetchall()]
+        obs_time = local_time_from_epoch(ts)
+        forecast = {'issued_time': obs_time,
+                    'rows': [(local_time_from_epoch(ts + 3600 * h), 25.0, 26.0, 40.0, 10.0, 90, 113,
+                              1010.0, 5.0, 10000, 10, 10.0, 0.0, 0.0) for h in range(1, 73)]}
+        generation = weather_fetcher.next_generation(cursor)
+        for lid in location_ids:
+            data = {'temp': round(random.uniform(15, 40), 1), 'hum': 40.0, 'wind_s': 10.0, 'wind_d': 90.0,
+                    'code': 113, 'pres': 1010.0, 'uv': 5.0, 'vis': 10000.0, 'cloud': 10.0, 'dew': 10.0,
+                    'solar': 400.0, 'day': 1, 'obs_time': obs_time, 'forecast': forecast}
+            weather_fetcher.store_observation(cursor, lid, data, generation)
+            weather_fetcher.store_forecast(cursor, lid, forecast)
+        conn.commit()
+
+    def run(self):
+        # Same busy timeout as the real fetcher (sqlite3 default, 5s)
+        conn = sqlite3.connect(self.db_path)
+        ts = int(time.time())
+        while not self.stop.wait(self.interval):
+            ts += 300
+            t0 = time.perf_counter()
+            try:
+                self.cycle(conn, ts)
+                self.cycles.append((time.perf_counter() - t0) * 1000)
+                if self.snapshot_dir:
+                    snapshot.publish(self.db_path, self.snapshot_dir)
+            except sqlite3.OperationalError as e:
+                conn.rollback()
+                self.errors += 1
+                if is_busy(str(e)):
+                    self.busy += 1
+        conn.close()
+
+
+def start_gunicorn(workdir, port, workers, threads):
+    log = open(os.path.join(workdir, 'gunicorn.log'), 'w')
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-w', str(workers), '--threads', str(threads),
+         '-b', f'127.0.0.1:{port}', '--chdir', workdir, '--pythonpath', BASE_DIR, 'app:app'],
+        stdout=log, stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"gunicorn exited early, see {log.name}")
+        try:
+            if requests.get(f"{base_url}/api/weather/freshness", timeout=2).status_code == 200:
+                return proc, base_url
+        except requests.RequestException:
+            time.sleep(0.3)
+    proc.terminate()
+    raise RuntimeError(f"gunicorn did not come up in 30s, see {log.name}")
+
+
+def pick_pages(n, mix):
+    weights = {}
+    for part in mix.split(','):
+        page, share = part.split('=')
+        weights[page.strip()] = float(share)
+    pages = []
+    for page, share in weights.items():
+        pages += [page] * round(n * share / sum(weights.values()))
+    return (pages + ['dashboard'] * n)[:n]
+
+
+def report(recorder, fetcher, duration, args):
+    total = sum(len(v) for v in recorder.latency.values())
+    errors = sum(recorder.errors.values())
+    busy = sum(recorder.busy.values())
+    print(f"\n=== Load test: {args.sessions} sessions, {duration:.0f}s, "
+          f"gunicorn {args.workers}w x {args.threads}t, fetcher every {args.fetch_interval}s ===")
+    print(f"{'ENDPOINT':<22} {'REQS':>7} {'REQ/s':>7} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'MAX ms':>8} {'ERR':>5} {'BUSY':>5}")
+    summary = {'endpoints': {}}
+    for name in sorted(recorder.latency):
+        values = sorted(recorder.latency[name])
+        row = {'requests': len(values), 'rps': round(len(values) / duration, 2),
+               'p50_ms': round(percentile(values, 50), 2), 'p90_ms': round(percentile(values, 90), 2),
+               'p99_ms': round(percentile(values, 99), 2), 'max_ms': round(values[-1], 2),
+               'errors': recorder.errors[name], 'busy': recorder.busy[name]}
+        summary['endpoints'][name] = row
+        print(f"{name:<22} {row['requests']:>7} {row['rps']:>7.1f} {row['p50_ms']:>8.1f} {row['p90_ms']:>8.1f} "
+              f"{row['p99_ms']:>8.1f} {row['max_ms']:>8.1f} {row['errors']:>5} {row['busy']:>5}")
+    print(f"{'TOTAL':<22} {total:>7} {total / duration:>7.1f} {'':>35} {errors:>5} {busy:>5}")
+    summary.update(requests=total, rps=round(total / duration, 2), errors=errors, busy=busy)
+
+    if fetcher is not None:
+        cycles = sorted(fetcher.cycles)
+        print(f"\nFetcher: {len(cycles)} cycles, write p50 {percentile(cycles, 50):.1f} ms, "
+              f"max {cycles[-1] if cycles else 0:.1f} ms, {fetcher.errors} failed ({fetcher.busy} SQLITE_BUSY)")
+        summary['fetcher'] = {'cycles': len(cycles), 'p50_ms': round(percentile(cycles, 50), 2),
+                              'max_ms': round(cycles[-1], 2) if cycles else 0.0,
+                              'errors': fetcher.errors, 'busy': fetcher.busy}
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay wallboard polling against a local gunicorn")
+    parser.add_argument('--sessions', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=60, help="seconds of load")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help="page shares, e.g. dashboard=0.6,education=0.4")
+    parser.add_argument('--health-reload', type=float, default=300, help="health.html reload interval (s)")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--fetch-interval', type=float, default=300, help="simulated fetcher cadence (s), 0 disables")
+    parser.add_argument('--snapshots', action='store_true', help="fetcher publishes read snapshots (see snapshot.py)")
+    parser.add_argument('--db', help="copy this database instead of generating one")
+    parser.add_argument('--locations', type=int, default=50, help="generated locations")
+    parser.add_argument('--years', type=float, default=0.1, help="generated history")
+    parser.add_argument('--json', help="also write the summary to this file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='load_test_')
+    db_path = os.path.join(workdir, 'weather.db')
+    if args.db:
+        shutil.copy(args.db, db_path)
+    else:
+        from generate_data import generate
+        generate(db_path, args.locations, args.years)
+    shutil.copy(os.path.join(BASE_DIR, 'schema.sql'), workdir)
+
+    proc, base_url = start_gunicorn(workdir, args.port, args.workers, args.threads)
+    print(f"gunicorn up at {base_url} (log: {os.path.join(workdir, 'gunicorn.log')})")
+
+    stop = threading.Event()
+    recorder = Recorder()
+    sessions = [Session(page, base_url, recorder, stop, args.health_reload)
+                for page in pick_pages(args.sessions, args.mix)]
+    snapshot_dir = os.path.join(workdir, snapshot.SNAPSHOT_DIR) if args.snapshots else None
+    if snapshot_dir:
+        snapshot.publish(db_path, snapshot_dir)
+    fetcher = FetcherWriter(db_path, args.fetch_interval, stop, snapshot_dir) if args.fetch_interval > 0 else None
+
+    t0 = time.monotonic()
+    try:
+        for s in sessions:
+            s.start()
+        if fetcher:
+            fetcher.start()
+        stop.wait(args.duration)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        for s in sessions:
+            s.join(timeout=35)
+        if fetcher:
+            fetcher.join(timeout=60)
+        duration = time.monotonic() - t0
+        proc.terminate()
+        try:
+            proc.wait(timeout=35)  # gunicorn's graceful timeout is 30s
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+    summary = report(recorder, fetcher, duration, args)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
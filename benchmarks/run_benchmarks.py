@@ -0,0 +1,211 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import platform
+import statistics
+from datetime import datetime
+
+# Scale benchmark suite: every /api/* endpoint, the fetcher write path and the ETL
+# upserts, run against a database from generate_data.py. Medians are compared with
+# the stored baselines; a case slower than baseline * (1 + tolerance) is a regression
+# and makes the script exit non-zero.
+# Usage: python benchmarks/run_benchmarks.py [--locations 20] [--years 0.25] [--save]
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import numpy as np
+from generate_data import generate
+
+BASELINE_FILE = os.path.join(BENCH_DIR, 'baselines.json')
+
+DASHBOARD_FIELDS = 'latitude,longitude,temperature,humidity,windspeed,winddirection,pressure,uv_index,visibility,cloud_cover'
+# (name, url, cold): cold cases empty the section cache before every call, so they time
+# building the payload; the *_warm cases time the cached path
+API_CASES = [
+    ('api_weather_full', '/api/weather', False),
+    ('api_weather_dashboard', f'/api/weather?fields={DASHBOARD_FIELDS}&window=3h', False),
+    ('api_weather_delta', f'/api/weather?fields={DASHBOARD_FIELDS}&window=3h&history_cities=1,2,3,4&since={{generation}}', False),
+    ('api_weather_48h', '/api/weather?fields=temperature&window=48h', False),
+    ('api_weather_forecast', '/api/weather/forecast', False),
+    ('api_weather_freshness', '/api/weather/freshness', False),
+    ('api_health', '/api/health', True),
+    ('api_education', '/api/education', True),
+    ('api_economy', '/api/economy', True),
+    ('api_bundle', '/api/bundle', True),
+    ('api_bundle_warm', '/api/bundle', False),
+    ('api_metrics', '/api/metrics', False),
+]
+
+
+def timed(fn, repeats, warmup=2, setup=None):
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeats):
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - t0) * 1000)
+    timings.sort()
+    return {'median_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3)}
+
+
+def bench_api(client, section_cache, generation, repeats):
+    results = {}
+    for name, url, cold in API_CASES:
+        url = url.format(generation=generation)
+
+        def call():
+            resp = client.get(url)
+            # Streamed bodies (/api/bundle) are only produced when read
+            body = resp.get_data()
+            assert resp.status_code == 200, f"{url}: {resp.status_code} {body[:200]}"
+        results[name] = timed(call, repeats, setup=section_cache.clear if cold else None)
+    return results
+
+
+def bench_fetcher_write(conn, repeats):
+    """One cycle's writes for every location: store_observation + store_forecast + commit."""
+    import weather_fetcher
+    from weather_providers import local_time_from_epoch
+
+    cursor = conn.cursor()
+    cursor.execute("SELECT location_id FROM locations")
+    location_ids = [r[0] for r in cursor.fetchall()]
+    cursor.execute("SELECT MAX(ts_epoch) FROM weather_obs")
+    state = {'ts': cursor.fetchone()[0] or int(time.time())}
+    template = {'temp': 25.0, 'hum': 40.0, 'wind_s': 10.0, 'wind_d': 90.0, 'code': 113, 'pres': 1010.0,
+                'uv': 5.0, 'vis': 10000.0, 'cloud': 10.0, 'dew': 10.0, 'solar': 400.0, 'day': 1}
+
+    def cycle():
+        # Every cycle is a new upstream observation, so each one really inserts
+        state['ts'] += 300
+        obs_time = local_time_from_epoch(state['ts'])
+        forecast = {'issued_time': obs_time,
+                    'rows': [(local_time_from_epoch(state['ts'] + 3600 * h), 25.0, 26.0, 40.0, 10.0, 90, 113,
+                              1010.0, 5.0, 10000, 10, 10.0, 0.0, 0.0) for h in range(1, 73)]}
+        generation = weather_fetcher.next_generation(cursor)
+        for lid in location_ids:
+            data = dict(template, obs_time=obs_time, forecast=forecast)
+            weather_fetcher.store_observation(cursor, lid, data, generation)
+            weather_fetcher.store_forecast(cursor, lid, forecast)
+        conn.commit()
+
+    return {'fetcher_write_cycle': timed(cycle, repeats, warmup=1)}
+
+
+def bench_etl_upserts(conn, repeats):
+    """The statements the ETL scripts run: indicator INSERT OR REPLACE and report INSERT OR IGNORE."""
+    cursor = conn.cursor()
+    rng = np.random.default_rng(7)
+    history = json.dumps([{'year': str(y), 'value': float(v)} for y, v in zip(range(1990, 2026), rng.random(36))])
+    counter = {'n': 0}
+
+    def indicators():
+        for table in ('health_indicators', 'education_indicators', 'economic_indicators'):
+            cursor.executemany(f"""
+                INSERT OR REPLACE INTO {table} (indicator_key, current_value, year_updated, history_json, updated_at)
+                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+            """, [(f"etl_bench_{i:02d}", float(i), '2025', history) for i in range(30)])
+        conn.commit()
+
+    def reports():
+        counter['n'] += 1
+        today = datetime.now().strftime('%Y-%m-%d')
+        for i in range(50):
+            # ETLs insert row by row and rely on UNIQUE(url) to skip known reports: half are repeats
+            url = f"https://reliefweb.int/report/yemen/etl-bench-{counter['n'] // 2}-{i}"
+            cursor.execute("""
+                INSERT OR IGNORE INTO situation_reports (sector, title, source, date_published, url)
+                VALUES (?, ?, ?, ?, ?)
+            """, ('health', f"ETL bench report {i}", 'ReliefWeb (Bench)', today, url))
+        conn.commit()
+
+    return {'etl_indicator_upserts': timed(indicators, repeats),
+            'etl_report_inserts': timed(reports, repeats)}
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    print(f"{'CASE':<26} {'MEDIAN ms':>10} {'P95 ms':>10} {'BASELINE':>10} {'DELTA':>8}")
+    for name, r in results.items():
+        base = (baseline or {}).get(name)
+        if base:
+            delta = (r['median_ms'] - base['median_ms']) / base['median_ms'] * 100 if base['median_ms'] else 0.0
+            flag = ''
+            if r['median_ms'] > base['median_ms'] * (1 + tolerance):
+                flag = '  REGRESSION'
+                regressions.append(name)
+            print(f"{name:<26} {r['median_ms']:>10.2f} {r['p95_ms']:>10.2f} {base['median_ms']:>10.2f} {delta:>7.1f}%{flag}")
+        else:
+            print(f"{name:<26} {r['median_ms']:>10.2f} {r['p95_ms']:>10.2f} {'-':>10} {'-':>8}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the weather.db scale benchmarks")
+    parser.add_argument('--locations', type=int, default=20)
+    parser.add_argument('--years', type=float, default=0.25)
+    parser.add_argument('--repeats', type=int, default=15)
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown before flagging (0.25 = 25%%)")
+    parser.add_argument('--save', action='store_true', help="store these results as the new baselines")
+    parser.add_argument('--keep', action='store_true', help="keep the scratch directory")
+    args = parser.parse_args()
+
+    config = {'locations': args.locations, 'years': args.years}
+    workdir = tempfile.mkdtemp(prefix='bench_suite_')
+    t0 = time.perf_counter()
+    summary = generate(os.path.join(workdir, 'weather.db'), args.locations, args.years)
+    print(f"Scratch DB: {summary['observations']:,} observations in {time.perf_counter() - t0:.1f}s ({workdir})")
+
+    # app.py and init_db.py use ./weather.db and ./schema.sql
+    shutil.copy(os.path.join(BASE_DIR, 'schema.sql'), workdir)
+    os.chdir(workdir)
+    import app
+    from db_config import get_db_connection
+
+    conn = get_db_connection()
+    generation = conn.execute("SELECT value FROM sync_state WHERE key = 'generation'").fetchone()[0]
+    results = bench_api(app.app.test_client(), app.SECTION_CACHE, generation - 1, args.repeats)
+    results.update(bench_fetcher_write(conn, args.repeats))
+    results.update(bench_etl_upserts(conn, args.repeats))
+    conn.close()
+
+    stored = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE) as f:
+            stored = json.load(f)
+    baseline = stored.get('results') if stored.get('config') == config else None
+    if stored and baseline is None:
+        print(f"[WARN] Baselines were recorded with {stored.get('config')}, not {config}; not comparing.")
+
+    print(f"\n=== Benchmarks: {args.locations} locations, {args.years} years, {args.repeats} repeats ===")
+    regressions = compare(results, baseline, args.tolerance)
+
+    if args.save:
+        with open(BASELINE_FILE, 'w') as f:
+            json.dump({'config': config, 'machine': platform.platform(), 'python': platform.python_version(),
+                       'recorded_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'results': results},
+                      f, indent=2, sort_keys=True)
+        print(f"\nBaselines saved to {BASELINE_FILE}")
+
+    if not args.keep:
+        os.chdir(BASE_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if regressions and not args.save:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,318 @@
+import os
+import sys
+import json
+import gzip
+import argparse
+import numpy as np
+import requests
+
+# --- BOUNDARY BUILD ---
+# The dashboard used to download the full-resolution geoBoundaries ADM1 GeoJSON on every
+# page load and run its point-in-polygon test on those polygons for every wind particle.
+# This script turns it into a few small TopoJSON files, one per zoom level:
+#   1. quantize every coordinate onto a QUANTIZATION x QUANTIZATION integer grid
+#   2. cut rings into arcs at junctions, so a border shared by two governorates is one arc
+#   3. simplify each arc with Douglas-Peucker at about half a screen pixel of that zoom
+#      (shared borders are simplified once, so neighbours never gap or overlap)
+#   4. delta-encode the arcs (TopoJSON 'transform' + relative integer offsets)
+# Output goes to boundaries/adm1-z<zoom>.topo.json (plus a .gz copy) and is served by
+# /api/boundaries. Each level also gets adm1-z<zoom>.mask.json, a run-length-encoded
+# raster of governorate ids (/api/boundaries/mask) for the wind particles' boundary test.
+#
+#   python build_boundaries.py                       # fetch GEO_URL
+#   python build_boundaries.py --source yemen.geojson
+
+GEO_URL = 'https://media.githubusercontent.com/media/wmgeolab/geoBoundaries/main/releaseData/gbOpen/YEM/ADM1/geoBoundaries-YEM-ADM1.geojson'
+BOUNDARY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'boundaries')
+ZOOM_LEVELS = (5, 7, 9, 11)
+QUANTIZATION = 100000       # ~10 m grid over Yemen's extent
+PIXEL_FRACTION = 0.5         # simplification tolerance, in screen pixels at the level's zoom
+MASK_CELL_PX = 1             # mask cell size, in screen pixels at the level's zoom
+MASK_MAX_WIDTH = 2048        # cells; finer levels get coarser cells past this
+
+
+def boundary_file(zoom, kind='topo'):
+    """kind 'topo' (simplified TopoJSON) or 'mask' (RLE governorate raster)."""
+    return f"adm1-z{zoom}.{kind}.json"
+
+
+def load_source(source):
+    if source.startswith(('http://', 'https://')):
+        response = requests.get(source, timeout=60)
+        response.raise_for_status()
+        return response.json()
+    with open(source, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def polygons_of(geometry):
+    if geometry['type'] == 'Polygon':
+        return [geometry['coordinates']]
+    if geometry['type'] == 'MultiPolygon':
+        return geometry['coordinates']
+    raise ValueError(f"Unsupported geometry type {geometry['type']}")
+
+
+# --- QUANTIZE ---
+
+def quantize(features, n=QUANTIZATION):
+    """-> (transform, [[[ring of (x, y) ints] per polygon] per feature])."""
+    xs, ys = [], []
+    for feature in features:
+        for polygon in polygons_of(feature['geometry']):
+            for ring in polygon:
+                xs.extend(p[0] for p in ring)
+                ys.extend(p[1] for p in ring)
+    x0, y0 = min(xs), min(ys)
+    kx = (max(xs) - x0) / (n - 1) or 1
+    ky = (max(ys) - y0) / (n - 1) or 1
+
+    shapes = []
+    for feature in features:
+        polygons = []
+        for polygon in polygons_of(feature['geometry']):
+            rings = []
+            for ring in polygon:
+                q = []
+                for x, y, *_ in ring:
+                    p = (round((x - x0) / kx), round((y - y0) / ky))
+                    if not q or q[-1] != p:
+                        q.append(p)
+                if q[0] != q[-1]:
+                    q.append(q[0])
+                if len(q) >= 4:
+                    rings.append(q)
+            if rings:
+                polygons.append(rings)
+        shapes.append(polygons)
+    return {'scale': [kx, ky], 'translate': [x0, y0]}, shapes
+
+
+# --- TOPOLOGY ---
+
+def find_junctions(rings):
+    """Points where rings meet or part: a point seen with two different neighbour pairs."""
+    neighbours = {}
+    junctions = set()
+    for ring in rings:
+        m = len(ring) - 1  # closed: last point repeats the first
+        for i in range(m):
+            pair = frozenset((ring[i - 1] if i else ring[m - 1], ring[i + 1]))
+            seen = neighbours.setdefault(ring[i], pair)
+            if seen != pair:
+                junctions.add(ring[i])
+    return junctions
+
+
+def cut_ring(ring, junctions):
+    """Splits a closed ring at its junctions into arcs sharing their end points."""
+    points = ring[:-1]
+    cuts = [i for i, p in enumerate(points) if p in junctions]
+    if not cuts:
+        # Free-standing ring: start at its smallest point so a shared copy cuts identically
+        start = points.index(min(points))
+        rotated = points[start:] + points[:start]
+        return [rotated + [rotated[0]]]
+    rotated = points[cuts[0]:] + points[:cuts[0]]
+    offsets = [i - cuts[0] for i in cuts] + [len(points)]
+    rotated.append(rotated[0])
+    return [rotated[a:b + 1] for a, b in zip(offsets, offsets[1:])]
+
+
+def build_topology(shapes):
+    """-> (arcs, shapes as [[[arc index (~index when reversed)] per ring] per polygon])."""
+    junctions = find_junctions([ring for polygons in shapes for rings in polygons for ring in rings])
+    arcs, index = [], {}
+    topo_shapes = []
+    for polygons in shapes:
+        topo_polygons = []
+        for rings in polygons:
+            topo_rings = []
+            for ring in rings:
+                refs = []
+                for arc in cut_ring(ring, junctions):
+                    key = tuple(arc)
+                    if key in index:
+                        refs.append(index[key])
+                    elif key[::-1] in index:
+                        refs.append(~index[key[::-1]])
+                    else:
+                        index[key] = len(arcs)
+                        refs.append(len(arcs))
+                        arcs.append(arc)
+                topo_rings.append(refs)
+            topo_polygons.append(topo_rings)
+        topo_shapes.append(topo_polygons)
+    return arcs, topo_shapes
+
+
+# --- SIMPLIFY / ENCODE ---
+
+def douglas_peucker(points, tolerance):
+    """Iterative Douglas-Peucker; end points are always kept."""
+    if len(points) < 3:
+        return list(points)
+    if points[0] == points[-1]:
+        # Closed arc: split at the point farthest from the start and keep it
+        far = max(range(len(points)), key=lambda i: (points[i][0] - points[0][0]) ** 2 + (points[i][1] - points[0][1]) ** 2)
+        return douglas_peucker(points[:far + 1], tolerance)[:-1] + douglas_peucker(points[far:], tolerance)
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    tol2 = tolerance * tolerance
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        (ax, ay), (bx, by) = points[first], points[last]
+        dx, dy = bx - ax, by - ay
+        norm = dx * dx + dy * dy
+        worst, worst_d = None, tol2
+        for i in range(first + 1, last):
+            px, py = points[i]
+            if norm:
+                cross = (px - ax) * dy - (py - ay) * dx
+                d = cross * cross / norm
+            else:
+                d = (px - ax) ** 2 + (py - ay) ** 2
+            if d > worst_d:
+                worst, worst_d = i, d
+        if worst is not None:
+            keep[worst] = True
+            stack.append((first, worst))
+            stack.append((worst, last))
+    return [p for p, k in zip(points, keep) if k]
+
+
+def delta_encode(arc):
+    out = [list(arc[0])]
+    for (x0, y0), (x1, y1) in zip(arc, arc[1:]):
+        out.append([x1 - x0, y1 - y0])
+    return out
+
+
+def tolerance_for(zoom, transform):
+    """Half a pixel at `zoom`, in grid units."""
+    return PIXEL_FRACTION * degrees_per_pixel(zoom) / min(transform['scale'])
+
+
+def degrees_per_pixel(zoom):
+    """256px Web Mercator tiles, measured at the equator."""
+    return 360.0 / (256 * 2 ** zoom)
+
+
+# --- RASTER MASK ---
+
+def rasterize(shapes, transform, bbox, cell):
+    """Governorate index + 1 per cell (0 = outside), rows north to south, even-odd fill per feature."""
+    west, south, east, north = bbox
+    width = max(1, int(np.ceil((east - west) / cell)))
+    height = max(1, int(np.ceil((north - south) / cell)))
+    lons = west + (np.arange(width) + 0.5) * cell
+    lats = north - (np.arange(height) + 0.5) * cell
+    (kx, ky), (x0, y0) = transform['scale'], transform['translate']
+    grid = np.zeros((height, width), dtype=np.uint8)
+
+    for fid, polygons in enumerate(shapes, 1):
+        rings = [np.asarray(ring, dtype=float) for rings in polygons for ring in rings]
+        if not rings:
+            continue
+        pts = np.concatenate([np.column_stack((r[:-1], r[1:])) for r in rings])
+        ax, ay = pts[:, 0] * kx + x0, pts[:, 1] * ky + y0
+        bx, by = pts[:, 2] * kx + x0, pts[:, 3] * ky + y0
+        rows = np.flatnonzero((lats >= min(ay.min(), by.min())) & (lats <= max(ay.max(), by.max())))
+        for r in rows:
+            y = lats[r]
+            crossing = (ay > y) != (by > y)
+            xs = np.sort(ax[crossing] + (y - ay[crossing]) * (bx[crossing] - ax[crossing]) / (by[crossing] - ay[crossing]))
+            # A cell centre is inside when an odd number of edges cross its row to the left
+            inside = np.searchsorted(xs, lons) % 2 == 1
+            grid[r, inside & (grid[r] == 0)] = fid
+    return grid
+
+
+def run_length(grid):
+    """Row-major [value, count, value, count, ...] (runs continue across rows)."""
+    flat = grid.ravel()
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(flat)) + 1))
+    counts = np.diff(np.append(starts, flat.size))
+    return np.column_stack((flat[starts], counts)).ravel().tolist()
+
+
+def geometry_for(polygons):
+    if len(polygons) == 1:
+        return {'type': 'Polygon', 'arcs': polygons[0]}
+    return {'type': 'MultiPolygon', 'arcs': polygons}
+
+
+def write_json(path, obj):
+    """Writes `path` and a pre-compressed .gz copy (Flask does not compress responses). Returns the size."""
+    body = json.dumps(obj, separators=(',', ':')).encode('utf-8')
+    for target, content in ((path, body), (path + '.gz', gzip.compress(body, 9, mtime=0))):
+        with open(target + '.tmp', 'wb') as f:
+            f.write(content)
+        os.replace(target + '.tmp', target)
+    return len(body)
+
+
+def build(source=GEO_URL, out_dir=BOUNDARY_DIR, levels=ZOOM_LEVELS):
+    data = load_source(source)
+    features = [f for f in data['features'] if f.get('geometry')]
+    transform, shapes = quantize(features)
+    arcs, topo_shapes = build_topology(shapes)
+    vertices = sum(len(a) for a in arcs)
+    print(f"{len(features)} features, {len(arcs)} arcs, {vertices} vertices after quantization")
+
+    os.makedirs(out_dir, exist_ok=True)
+    lon0, lat0 = transform['translate']
+    bbox = [lon0, lat0, lon0 + transform['scale'][0] * (QUANTIZATION - 1),
+            lat0 + transform['scale'][1] * (QUANTIZATION - 1)]
+    written = []
+    for zoom in sorted(levels):
+        tolerance = tolerance_for(zoom, transform)
+        simplified = [douglas_peucker(arc, tolerance) for arc in arcs]
+        topology = {
+            'type': 'Topology',
+            'zoom': zoom,
+            'levels': sorted(levels),
+            'bbox': bbox,
+            'transform': transform,
+            'objects': {'adm1': {'type': 'GeometryCollection', 'geometries': [
+                dict(geometry_for(polygons), properties={
+                    k: f['properties'].get(k) for k in ('shapeName', 'shapeISO', 'shapeID')
+                }) for f, polygons in zip(features, topo_shapes)
+            ]}},
+            'arcs': [delta_encode(arc) for arc in simplified]
+        }
+        body = write_json(os.path.join(out_dir, boundary_file(zoom)), topology)
+        kept = sum(len(a) for a in simplified)
+        print(f"  z{zoom}: {kept} vertices ({kept / vertices:.1%}), {body / 1024:.0f} KB")
+
+        cell = max(MASK_CELL_PX * degrees_per_pixel(zoom), (bbox[2] - bbox[0]) / MASK_MAX_WIDTH)
+        grid = rasterize(shapes, transform, bbox, cell)
+        mask = {
+            'zoom': zoom,
+            'levels': sorted(levels),
+            # Cell (0, 0) is the north-west corner; ids index `names` + 1, 0 is outside
+            'bbox': [bbox[0], bbox[3] - grid.shape[0] * cell, bbox[0] + grid.shape[1] * cell, bbox[3]],
+            'cell': cell,
+            'width': grid.shape[1],
+            'height': grid.shape[0],
+            'names': [f['properties'].get('shapeName') for f in features],
+            'runs': run_length(grid)
+        }
+        body = write_json(os.path.join(out_dir, boundary_file(zoom, 'mask')), mask)
+        print(f"  z{zoom} mask: {grid.shape[1]}x{grid.shape[0]} cells, {len(mask['runs']) // 2} runs, {body / 1024:.0f} KB")
+        written.append(zoom)
+    return written
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build simplified, quantized ADM1 boundaries for the dashboard")
+    parser.add_argument('--source', default=GEO_URL, help="GeoJSON path or URL (default: geoBoundaries YEM ADM1)")
+    parser.add_argument('--out', default=BOUNDARY_DIR)
+    args = parser.parse_args()
+    try:
+        build(args.source, args.out)
+    except (requests.RequestException, OSError, ValueError, KeyError) as e:
+        print(f"Boundary Build Error: {e}")
+        sys.exit(1)
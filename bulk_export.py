@@ -0,0 +1,137 @@
+import io
+import csv
+import json
+import zlib
+from datetime import datetime
+
+# --- BULK EXPORT ---
+# Generators behind /api/export/*: rows are read in keyset chunks of EXPORT_CHUNK (each
+# chunk one bounded SELECT on the read connection) and encoded as NDJSON or CSV as they
+# go, optionally through a streaming gzip compressor. Memory stays at one chunk whatever
+# the export size. On a snapshot connection (immutable, no locks) the export sees one
+# consistent state; on the live database every chunk is its own short autocommit read,
+# so the fetcher's write transactions are never held up for the length of a download.
+
+EXPORT_CHUNK = 5000
+FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+WEATHER_EXPORT_COLUMNS = ['location_id', 'city_name', 'ts_epoch', 'observation_time', 'temperature', 'feels_like',
+                          'humidity', 'windspeed', 'winddirection', 'weathercode', 'is_day', 'pressure', 'uv_index',
+                          'dew_point', 'visibility', 'cloud_cover', 'solar_rad', 'generation']
+# sector -> table
+INDICATOR_TABLES = {
+    'health': 'health_indicators',
+    'economy': 'economic_indicators',
+    'education': 'education_indicators',
+}
+INDICATOR_EXPORT_COLUMNS = ['sector', 'indicator_key', 'current_value', 'year_updated', 'history', 'updated_at']
+
+
+def parse_time(value, name):
+    """Epoch seconds, or local 'YYYY-MM-DD', 'YYYY-MM-DDTHH:MM' or 'YYYY-MM-DDTHH:MM:SS' -> epoch int."""
+    if value is None or value == '':
+        return None
+    if value.lstrip('-').isdigit():
+        return int(value)
+    for fmt in ('%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M', '%Y-%m-%d'):
+        try:
+            return int(datetime.strptime(value.replace(' ', 'T'), fmt).timestamp())
+        except ValueError:
+            pass
+    raise ValueError(f"Invalid {name} '{value}' (use epoch seconds or YYYY-MM-DD[THH:MM[:SS]])")
+
+
+def weather_history_chunks(cursor, locations, since=None, until=None, chunk=EXPORT_CHUNK):
+    """Yields lists of WEATHER_EXPORT_COLUMNS tuples: per location, ts_epoch keyset pages
+    over the (location_id, ts_epoch) primary key. locations: [(location_id, city_name)]."""
+    since = -1 if since is None else since - 1
+    until = 2 ** 62 if until is None else until
+    for location_id, city_name in locations:
+        last = since
+        while True:
+            cursor.execute("""
+                SELECT ts_epoch, strftime('%Y-%m-%dT%H:%M:%S', ts_epoch, 'unixepoch', 'localtime'),
+                       temperature, feels_like, humidity, windspeed, winddirection, weathercode, is_day,
+                       pressure, uv_index, dew_point, visibility, cloud_cover, solar_rad, generation
+                FROM weather_obs
+                WHERE location_id = ? AND ts_epoch > ? AND ts_epoch <= ?
+                ORDER BY ts_epoch
+                LIMIT ?
+            """, (location_id, last, until, chunk))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            yield [(location_id, city_name) + tuple(r) for r in rows]
+            if len(rows) < chunk:
+                break
+            last = rows[-1][0]
+
+
+def indicator_chunks(cursor, sectors, keys=None, chunk=EXPORT_CHUNK):
+    """Yields lists of INDICATOR_EXPORT_COLUMNS tuples (history parsed from history_json).
+    Pages on rowid: older databases' health_indicators has no indicator_id column."""
+    for sector in sectors:
+        table = INDICATOR_TABLES[sector]
+        where, params = "", []
+        if keys:
+            where = f" AND indicator_key IN ({','.join('?' * len(keys))})"
+            params = list(keys)
+        last = 0
+        while True:
+            cursor.execute(f"""
+                SELECT rowid, indicator_key, current_value, year_updated, history_json, updated_at
+                FROM {table}
+                WHERE rowid > ?{where}
+                ORDER BY rowid
+                LIMIT ?
+            """, [last] + params + [chunk])
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            yield [(sector, r[1], r[2], r[3], json.loads(r[4]) if r[4] else [], r[5]) for r in rows]
+            if len(rows) < chunk:
+                break
+            last = rows[-1][0]
+
+
+def encode(chunks, columns, fmt):
+    """Text blocks of NDJSON lines, or CSV with a header row, one block per chunk."""
+    if fmt == 'csv':
+        buf = io.StringIO()
+        writer = csv.writer(buf, lineterminator='\n')
+        writer.writerow(columns)
+        yield buf.getvalue()
+        for rows in chunks:
+            buf.seek(0)
+            buf.truncate()
+            # Nested values (indicator history) as JSON text in their cell
+            writer.writerows([json.dumps(v) if isinstance(v, (list, dict)) else v for v in row] for row in rows)
+            yield buf.getvalue()
+    else:
+        for rows in chunks:
+            yield ''.join(json.dumps(dict(zip(columns, row))) + '\n' for row in rows)
+
+
+def stream(chunks, columns, fmt, compress=False, on_error=None):
+    """Encoded (and optionally gzipped) bytes. An error mid-stream ends it with a marker line
+    (NDJSON {"status": "error"} object, CSV '# error:' line): the status code is already sent."""
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    blocks = encode(chunks, columns, fmt)
+    while True:
+        try:
+            block = next(blocks, None)
+        except Exception as e:
+            if on_error:
+                on_error(e)
+            block = (json.dumps({'status': 'error', 'message': str(e)}) + '\n' if fmt == 'ndjson'
+                     else f"# error: {e}\n")
+            blocks = iter(())
+        if block is None:
+            break
+        data = block.encode('utf-8')
+        if gz:
+            data = gz.compress(data)
+        if data:
+            yield data
+    if gz:
+        yield gz.flush()
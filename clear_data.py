@@ -1,5 +1,7 @@
 
 import sqlite3
+import snapshot
+import state_file
 
 DB_FILE = 'weather.db'
 
@@ -11,12 +13,16 @@ def clear_weather_data():
         print("Clearing current_weather table...")
         cursor.execute("DELETE FROM current_weather")
         
-        print("Clearing weather_history table...")
-        cursor.execute("DELETE FROM weather_history")
+        print("Clearing weather history (weather_obs table)...")
+        cursor.execute("DELETE FROM weather_obs")
+        # Tell the API's in-memory history caches to rewarm
+        cursor.execute("UPDATE sync_state SET value = value + 1 WHERE key IN ('generation', 'history_epoch')")
         
         conn.commit()
+        state_file.write_state(cursor)
         print("Weather data cleared. The system will now only contain new, real data when the fetcher runs.")
         conn.close()
+        snapshot.publish(DB_FILE)
     except Exception as e:
         print(f"Error: {e}")
 
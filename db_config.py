@@ -2,10 +2,24 @@
 # REPLACE 'your_password' with your actual MySQL root password
 import os
 import sqlite3
+from db_profiler import ProfiledConnection
+from snapshot import current_snapshot
 
 DB_FILE = 'weather.db'
 
 def get_db_connection():
-    conn = sqlite3.connect(DB_FILE)
+    conn = sqlite3.connect(DB_FILE, factory=ProfiledConnection)
     conn.row_factory = sqlite3.Row  # Access columns by name
     return conn
+
+def get_read_connection(path=None):
+    # API reads: the latest published snapshot (or `path`, one the caller already resolved),
+    # opened immutable (no locks) and memory-mapped. Falls back to the live database until a
+    # writer has published one.
+    path = path or current_snapshot()
+    if path is None:
+        return get_db_connection()
+    conn = sqlite3.connect(f"file:{path}?mode=ro&immutable=1", uri=True, factory=ProfiledConnection)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA mmap_size = 268435456")
+    return conn
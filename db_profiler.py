@@ -0,0 +1,160 @@
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import threading
+
+# --- SQL INSTRUMENTATION ---
+# Thin sqlite3 connection/cursor wrappers that time every statement.
+# Stats are kept per process, keyed by the normalized statement text.
+
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))
+
+_STATS = {}
+_EXPLAINED = set()
+_LOCK = threading.Lock()
+
+_RE_STRING = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_SPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """Collapses whitespace and replaces literals with '?' so equal statements group together."""
+    sql = _RE_STRING.sub('?', sql)
+    sql = _RE_NUMBER.sub('?', sql)
+    return _RE_SPACE.sub(' ', sql).strip()
+
+
+def _record(sql, elapsed, rows=None):
+    key = normalize_sql(sql)
+    ms = elapsed * 1000
+    with _LOCK:
+        s = _STATS.get(key)
+        if s is None:
+            s = _STATS[key] = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+        s['count'] += 1
+        s['total_ms'] += ms
+        if ms > s['max_ms']:
+            s['max_ms'] = ms
+    return key, ms
+
+
+def _explain(conn, sql, params):
+    """Returns EXPLAIN QUERY PLAN lines for a statement (empty if it cannot be explained)."""
+    head = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ''
+    if head not in ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT', 'REPLACE'):
+        return []
+    try:
+        cur = sqlite3.Connection.cursor(conn)
+        sqlite3.Cursor.execute(cur, "EXPLAIN QUERY PLAN " + sql, params)
+        return [row[-1] for row in cur.fetchall()]
+    except sqlite3.Error:
+        return []
+
+
+def _check_slow(conn, sql, params, key, ms):
+    if ms < SLOW_QUERY_MS:
+        return
+    print(f"[SLOW SQL] {ms:.1f}ms :: {key[:200]}")
+    # Query plans only change with the schema, so explain each statement once
+    with _LOCK:
+        if key in _EXPLAINED:
+            return
+        _EXPLAINED.add(key)
+    for line in _explain(conn, sql, params):
+        print(f"    PLAN: {line}")
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    def execute(self, sql, params=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            key, ms = _record(sql, time.perf_counter() - start)
+            _check_slow(self.connection, sql, params, key, ms)
+
+    def executemany(self, sql, seq_of_params):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_params)
+        finally:
+            _record(sql, time.perf_counter() - start)
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """Use as sqlite3.connect(path, factory=ProfiledConnection)."""
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def commit(self):
+        # Commit time approximates how long the write lock is held at the end of a transaction
+        start = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            _record('COMMIT', time.perf_counter() - start)
+
+
+def get_stats(sort='total_ms', limit=None):
+    """Returns a list of per-statement stats, heaviest first."""
+    with _LOCK:
+        rows = [dict(sql=k, **v) for k, v in _STATS.items()]
+    for r in rows:
+        r['avg_ms'] = round(r['total_ms'] / r['count'], 3) if r['count'] else 0.0
+        r['total_ms'] = round(r['total_ms'], 3)
+        r['max_ms'] = round(r['max_ms'], 3)
+    rows.sort(key=lambda r: r.get(sort, 0), reverse=True)
+    return rows[:limit] if limit else rows
+
+
+def reset_stats():
+    with _LOCK:
+        _STATS.clear()
+        _EXPLAINED.clear()
+
+
+def format_report(rows):
+    lines = [f"{'COUNT':>7} {'TOTAL ms':>10} {'AVG ms':>8} {'MAX ms':>8}  STATEMENT"]
+    for r in rows:
+        lines.append(f"{r['count']:>7} {r['total_ms']:>10.1f} {r['avg_ms']:>8.2f} {r['max_ms']:>8.2f}  {r['sql'][:110]}")
+    return "\n".join(lines)
+
+
+def print_report(limit=25):
+    rows = get_stats(limit=limit)
+    if rows:
+        print("\n--- SQL PROFILE ---")
+        print(format_report(rows))
+
+
+def fetch_remote_report(url):
+    import requests
+    resp = requests.get(url, timeout=5)
+    resp.raise_for_status()
+    return resp.json().get('sql', [])
+
+
+if __name__ == '__main__':
+    # Usage: python db_profiler.py [metrics_url]
+    # Prints the SQL profile collected by a running dashboard backend.
+    url = sys.argv[1] if len(sys.argv) > 1 else 'http://127.0.0.1:5000/api/metrics'
+    try:
+        rows = fetch_remote_report(url)
+    except Exception as e:
+        print(f"[ERROR] Could not read metrics from {url}: {e}")
+        sys.exit(1)
+    if not rows:
+        print("No SQL statements recorded yet.")
+    else:
+        print(format_report(rows))
@@ -0,0 +1,205 @@
+import sys
+import time
+import sqlite3
+import argparse
+from datetime import datetime
+import numpy as np
+import snapshot
+
+# --- DERIVED METEOROLOGY ---
+# Vectorized formulas for the variables some providers leave out (wttr.in has no dew
+# point, solar radiation or day flag). The fetcher runs derive_batch() over each cycle's
+# results before storing them; `python derived_met.py` backfills weather_obs in chunks.
+# Provider values always win: only missing ones are filled in.
+
+MAGNUS_A = 17.625
+MAGNUS_B = 243.04          # °C
+SOLAR_CONSTANT_GHI = 1098  # W/m², Haurwitz clear-sky model
+DAY_ELEVATION = -0.833     # degrees: sun's upper limb on the horizon, with refraction
+J2000 = 946728000          # 2000-01-01 12:00 UTC
+
+
+def dew_point(temp_c, rh):
+    """Magnus formula, °C."""
+    t = np.asarray(temp_c, dtype=float)
+    rh = np.clip(np.asarray(rh, dtype=float), 1.0, 100.0)
+    gamma = np.log(rh / 100.0) + MAGNUS_A * t / (MAGNUS_B + t)
+    return MAGNUS_B * gamma / (MAGNUS_A - gamma)
+
+
+def heat_index(temp_c, rh):
+    """NWS heat index (Rothfusz regression with its low/high humidity adjustments), °C."""
+    t = np.asarray(temp_c, dtype=float) * 9 / 5 + 32
+    rh = np.asarray(rh, dtype=float)
+    simple = 0.5 * (t + 61.0 + (t - 68.0) * 1.2 + rh * 0.094)
+    full = (-42.379 + 2.04901523 * t + 10.14333127 * rh - 0.22475541 * t * rh
+            - 6.83783e-3 * t * t - 5.481717e-2 * rh * rh + 1.22874e-3 * t * t * rh
+            + 8.5282e-4 * t * rh * rh - 1.99e-6 * t * t * rh * rh)
+    with np.errstate(invalid='ignore'):
+        dry = (rh < 13) & (t >= 80) & (t <= 112)
+        full = np.where(dry, full - (13 - rh) / 4 * np.sqrt(np.clip((17 - np.abs(t - 95)) / 17, 0, None)), full)
+        humid = (rh > 85) & (t >= 80) & (t <= 87)
+        full = np.where(humid, full + (rh - 85) / 10 * (87 - t) / 5, full)
+        hi = np.where((simple + t) / 2 >= 80, full, simple)
+    return (hi - 32) * 5 / 9
+
+
+def wind_chill(temp_c, wind_kmh):
+    """Environment Canada wind chill index, °C (defined for T <= 10 °C and wind > 4.8 km/h)."""
+    t = np.asarray(temp_c, dtype=float)
+    v = np.power(np.clip(np.asarray(wind_kmh, dtype=float), 0, None), 0.16)
+    return 13.12 + 0.6215 * t - 11.37 * v + 0.3965 * t * v
+
+
+def apparent_temperature(temp_c, rh, wind_kmh):
+    """Heat index when hot, wind chill when cold and windy, else the air temperature."""
+    t = np.asarray(temp_c, dtype=float)
+    wind = np.asarray(wind_kmh, dtype=float)
+    with np.errstate(invalid='ignore'):
+        return np.where(t >= 26.7, heat_index(t, rh),
+                        np.where((t <= 10) & (wind > 4.8), wind_chill(t, wind), t))
+
+
+def solar_elevation(lat, lon, ts_epoch):
+    """Sun elevation in degrees (low-precision solar position, good to ~0.01° this century)."""
+    d = (np.asarray(ts_epoch, dtype=float) - J2000) / 86400.0
+    g = np.radians(357.529 + 0.98560028 * d)
+    q = 280.459 + 0.98564736 * d
+    ecl_lon = np.radians(q + 1.915 * np.sin(g) + 0.020 * np.sin(2 * g))
+    obliquity = np.radians(23.439 - 3.6e-7 * d)
+    ra = np.arctan2(np.cos(obliquity) * np.sin(ecl_lon), np.cos(ecl_lon))
+    dec = np.arcsin(np.sin(obliquity) * np.sin(ecl_lon))
+    gmst = np.radians((280.46061837 + 360.98564736629 * d) % 360)
+    hour_angle = gmst + np.radians(np.asarray(lon, dtype=float)) - ra
+    phi = np.radians(np.asarray(lat, dtype=float))
+    sin_el = np.sin(phi) * np.sin(dec) + np.cos(phi) * np.cos(dec) * np.cos(hour_angle)
+    return np.degrees(np.arcsin(np.clip(sin_el, -1, 1)))
+
+
+def solar_radiation(elevation, cloud_cover):
+    """Global horizontal irradiance, W/m²: Haurwitz clear sky scaled by Kasten-Czeplak cloud cover."""
+    sin_el = np.sin(np.radians(np.asarray(elevation, dtype=float)))
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        clear = np.where(sin_el > 0, SOLAR_CONSTANT_GHI * sin_el * np.exp(-0.057 / sin_el), 0.0)
+    cloud = np.nan_to_num(np.asarray(cloud_cover, dtype=float), nan=0.0) / 100.0
+    return clear * (1 - 0.75 * np.power(np.clip(cloud, 0, 1), 3.4))
+
+
+def derive(temp, rh, wind, cloud, lat, lon, ts_epoch):
+    """All derived columns for parallel arrays: dict of dew, feels, solar, day arrays."""
+    elevation = solar_elevation(lat, lon, ts_epoch)
+    return {
+        'dew': dew_point(temp, rh),
+        'feels': apparent_temperature(temp, rh, wind),
+        'solar': solar_radiation(elevation, cloud),
+        'day': (elevation > DAY_ELEVATION).astype(np.int8)
+    }
+
+
+def derive_batch(locations, results):
+    """Fills missing dew/feels/solar/day in a fetch cycle's results (dict by location_id) in place."""
+    batch = [(loc, results[loc['location_id']]) for loc in locations if loc['location_id'] in results]
+    if not batch:
+        return
+    col = lambda key: np.array([d.get(key) for _, d in batch], dtype=float)
+    ts = [datetime.strptime(d['obs_time'], '%Y-%m-%d %H:%M:%S').timestamp() if d.get('obs_time') else time.time()
+          for _, d in batch]
+    derived = derive(col('temp'), col('hum'), col('wind_s'), col('cloud'),
+                     [loc['latitude'] for loc, _ in batch], [loc['longitude'] for loc, _ in batch], ts)
+    for i, (_, data) in enumerate(batch):
+        for key, values in derived.items():
+            if data.get(key) is None and not np.isnan(values[i]):
+                data[key] = int(values[i]) if key == 'day' else round(float(values[i]), 1)
+
+
+# --- HISTORY BACKFILL ---
+
+BACKFILL_CHUNK = 200000
+
+def backfill(db_file='weather.db', chunk=BACKFILL_CHUNK):
+    """Recomputes derived columns over weather_obs in keyset chunks. Returns (rows_seen, rows_updated)."""
+    conn = sqlite3.connect(db_file, timeout=30)
+    cursor = conn.cursor()
+    cursor.execute("SELECT location_id, latitude, longitude FROM locations")
+    locs = cursor.fetchall()
+    if not locs:
+        return 0, 0
+    # location_id -> lat/lon lookup arrays (ids are small dense integers)
+    lat_lut = np.full(max(r[0] for r in locs) + 1, np.nan)
+    lon_lut = lat_lut.copy()
+    for lid, lat, lon in locs:
+        lat_lut[lid], lon_lut[lid] = lat, lon
+
+    seen = updated = 0
+    compute_s = 0.0
+    started = time.perf_counter()
+    last = (-1, -1)
+    while True:
+        cursor.execute("""
+            SELECT location_id, ts_epoch, temperature, humidity, windspeed, cloud_cover,
+                   dew_point, solar_rad, is_day, feels_like
+            FROM weather_obs
+            WHERE (location_id, ts_epoch) > (?, ?)
+            ORDER BY location_id, ts_epoch
+            LIMIT ?
+        """, (last[0], last[1], chunk))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        t0 = time.perf_counter()
+        a = np.array(rows, dtype=float)
+        lid, ts = a[:, 0].astype(np.int64), a[:, 1]
+        known = lid < len(lat_lut)
+        lat = np.where(known, lat_lut[np.minimum(lid, len(lat_lut) - 1)], np.nan)
+        lon = np.where(known, lon_lut[np.minimum(lid, len(lon_lut) - 1)], np.nan)
+        derived = derive(a[:, 2], a[:, 3], a[:, 4], a[:, 5], lat, lon, ts)
+
+        dew_old, solar_old, day_old, feels_old = a[:, 6], a[:, 7], a[:, 8], a[:, 9]
+        # Before derived values existed, wttr.in rows were stored with dew point and radiation
+        # both 0.0 and no feels-like. Only that combination counts as a placeholder: a lone
+        # 0.0 is a real reading (a 0 °C dew point, radiation at night).
+        placeholder = (dew_old == 0) & (solar_old == 0) & np.isnan(feels_old)
+        dew = np.where(np.isnan(dew_old) | placeholder, np.round(derived['dew'], 1), dew_old)
+        solar = np.where(np.isnan(solar_old) | placeholder, np.round(derived['solar'], 1), solar_old)
+        day = np.where(np.isnan(lat), day_old, derived['day'])
+        feels = np.where(np.isnan(feels_old), np.round(derived['feels'], 1), feels_old)
+
+        def differs(new, old):
+            return ~((new == old) | (np.isnan(new) & np.isnan(old)))
+        changed = np.flatnonzero(differs(dew, dew_old) | differs(solar, solar_old)
+                                 | differs(day, day_old) | differs(feels, feels_old))
+        compute_s += time.perf_counter() - t0
+
+        if len(changed):
+            to_sql = lambda v: None if np.isnan(v) else float(v)
+            cursor.executemany(
+                "UPDATE weather_obs SET dew_point = ?, solar_rad = ?, is_day = ?, feels_like = ? "
+                "WHERE location_id = ? AND ts_epoch = ?",
+                [(to_sql(dew[i]), to_sql(solar[i]), None if np.isnan(day[i]) else int(day[i]), to_sql(feels[i]),
+                  int(lid[i]), int(ts[i])) for i in changed]
+            )
+            conn.commit()
+        seen += len(rows)
+        updated += len(changed)
+        last = (rows[-1][0], rows[-1][1])
+        print(f"  {seen} rows scanned, {updated} updated")
+
+    conn.close()
+    total = time.perf_counter() - started
+    if seen:
+        print(f"Backfill: {seen} rows in {total:.2f}s ({seen / total:,.0f} rows/s overall, "
+              f"{seen / max(compute_s, 1e-9):,.0f} rows/s derivation)")
+    return seen, updated
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Backfill derived weather columns in weather_obs")
+    parser.add_argument('--db', default='weather.db')
+    parser.add_argument('--chunk', type=int, default=BACKFILL_CHUNK)
+    args = parser.parse_args()
+    try:
+        backfill(args.db, args.chunk)
+    except sqlite3.Error as e:
+        print(f"Backfill Error: {e}")
+        sys.exit(1)
+    snapshot.publish(args.db)
@@ -2,6 +2,7 @@ import sqlite3
 import requests
 import json
 import os
+import sys
 import re
 import xml.etree.ElementTree as ET
 from datetime import datetime, timedelta
@@ -10,13 +11,18 @@ from datetime import datetime, timedelta
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DB_FILE = os.path.join(BASE_DIR, 'weather.db')
 
+# Shared SQL instrumentation lives in the project root
+sys.path.insert(0, BASE_DIR)
+from db_profiler import ProfiledConnection, print_report
+import snapshot
+
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
     'Accept': 'application/json, text/xml, application/xml, */*'
 }
 
 def get_db_connection():
-    conn = sqlite3.connect(DB_FILE)
+    conn = sqlite3.connect(DB_FILE, factory=ProfiledConnection)
     conn.row_factory = sqlite3.Row
     return conn
 
@@ -215,6 +221,9 @@ def run_etl():
     seed_2025_baselines(conn)
     
     conn.close()
+    # Publish for the API workers (skipped when nothing changed since the last snapshot)
+    snapshot.publish(DB_FILE, os.path.join(BASE_DIR, snapshot.SNAPSHOT_DIR))
+    print_report(limit=10)
     print("--- Econ Data Refresh Complete ---")
 
 if __name__ == "__main__":
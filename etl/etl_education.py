@@ -4,6 +4,7 @@ import sqlite3
 import time
 from datetime import datetime
 import os
+import sys
 import re
 import xml.etree.ElementTree as ET
 
@@ -11,6 +12,11 @@ import xml.etree.ElementTree as ET
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DB_FILE = os.path.join(BASE_DIR, 'weather.db')
 
+# Shared SQL instrumentation lives in the project root
+sys.path.insert(0, BASE_DIR)
+from db_profiler import ProfiledConnection, print_report
+import snapshot
+
 # Standard browser-like headers
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -19,7 +25,7 @@ HEADERS = {
 }
 
 def get_db_connection():
-    conn = sqlite3.connect(DB_FILE)
+    conn = sqlite3.connect(DB_FILE, factory=ProfiledConnection)
     conn.row_factory = sqlite3.Row
     return conn
 
@@ -139,9 +145,9 @@ def fetch_reliefweb_rss_education(conn):
                     
                     # Store Report
                     cursor.execute("""
-                        INSERT OR IGNORE INTO situation_reports (sector, title, source, date_published, url)
-                        VALUES (?, ?, ?, ?, ?)
-                    """, ('education', title, 'ReliefWeb (Broad Scan)', date_published, link))
+                        INSERT OR IGNORE INTO situation_reports (sector, title, source, date_published, url, body)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    """, ('education', title, 'ReliefWeb (Broad Scan)', date_published, link, re.sub(r'<[^>]+>', ' ', desc or '').strip()))
                     if cursor.rowcount > 0:
                         count += 1
                         
@@ -260,6 +266,9 @@ def run_etl():
         print(f"\n--- Education ETL Skipped (Data is Up-to-Date) ---")
         
     conn.close()
+    # Publish for the API workers (skipped when nothing changed since the last snapshot)
+    snapshot.publish(DB_FILE, os.path.join(BASE_DIR, snapshot.SNAPSHOT_DIR))
+    print_report(limit=10)
 
 if __name__ == "__main__":
     run_etl()
@@ -4,12 +4,18 @@ import sqlite3
 import time
 from datetime import datetime
 import os
+import sys
 import re
 
 # Adjust path to find database in parent directory
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DB_FILE = os.path.join(BASE_DIR, 'weather.db')
 
+# Shared SQL instrumentation lives in the project root
+sys.path.insert(0, BASE_DIR)
+from db_profiler import ProfiledConnection, print_report
+import snapshot
+
 # Standard browser-like headers to avoid being blocked by strict APIs (like ReliefWeb)
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -18,7 +24,7 @@ HEADERS = {
 }
 
 def get_db_connection():
-    conn = sqlite3.connect(DB_FILE)
+    conn = sqlite3.connect(DB_FILE, factory=ProfiledConnection)
     conn.row_factory = sqlite3.Row
     return conn
 
@@ -198,9 +204,9 @@ def fetch_reliefweb_rss_data(conn):
 
                     # 1. Store Report
                     cursor.execute("""
-                        INSERT OR IGNORE INTO situation_reports (sector, title, source, date_published, url)
-                        VALUES (?, ?, ?, ?, ?)
-                    """, ('health', title, 'ReliefWeb (RSS)', date_published, link))
+                        INSERT OR IGNORE INTO situation_reports (sector, title, source, date_published, url, body)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    """, ('health', title, 'ReliefWeb (RSS)', date_published, link, re.sub(r'<[^>]+>', ' ', desc or '').strip()))
                     if cursor.rowcount > 0:
                         count += 1
                         
@@ -263,11 +269,13 @@ def fetch_hdx_summary(conn):
                         org = pkg.get('organization', {}).get('title', 'Humanitarian Data Exchange')
                         last_mod = pkg.get('metadata_modified', '')[:10]
                         pkg_url = f"https://data.humdata.org/dataset/{pkg.get('name')}"
+                        # Notes can carry HTML: store plain text, like the RSS bodies
+                        notes = re.sub(r'<[^>]+>', ' ', pkg.get('notes') or '').strip()
                         
                         cursor.execute("""
-                            INSERT OR IGNORE INTO situation_reports (sector, title, source, date_published, url)
-                            VALUES (?, ?, ?, ?, ?)
-                        """, ('health', title, org, last_mod, pkg_url))
+                            INSERT OR IGNORE INTO situation_reports (sector, title, source, date_published, url, body)
+                            VALUES (?, ?, ?, ?, ?, ?)
+                        """, ('health', title, org, last_mod, pkg_url, notes))
                 
                 conn.commit()
                 print(f"  [OK] HDX data freshness synchronized.")
@@ -346,6 +354,9 @@ def run_etl():
         print(f"\n--- Health ETL Skipped (Data is Up-to-Date) ---")
     
     conn.close()
+    # Publish for the API workers (skipped when nothing changed since the last snapshot)
+    snapshot.publish(DB_FILE, os.path.join(BASE_DIR, snapshot.SNAPSHOT_DIR))
+    print_report(limit=10)
 
 if __name__ == "__main__":
     run_etl()
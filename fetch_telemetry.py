@@ -0,0 +1,144 @@
+import time
+from datetime import datetime, timedelta
+
+# --- FETCHER CYCLE TELEMETRY ---
+# One fetch_runs row per fetch cycle plus one fetch_run_cities row per city attempt. A cycle
+# is one scheduler wake-up (the locations due at that moment, poll_scheduler.py), not a sweep
+# over every location, so the cycle-duration histogram measures wake-ups. Runs older than
+# RUNS_KEPT_DAYS are deleted so the tables stay small, whatever the wake-up rate.
+
+RUNS_KEPT_DAYS = 7
+PRUNE_EVERY = timedelta(hours=1)  # runs are deleted in batches once this much is past the window
+CYCLE_BUCKETS_S = [5, 15, 30, 60, 120, 300, 600]
+
+
+class CycleTelemetry:
+    def __init__(self):
+        self.started_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self._t0 = time.perf_counter()
+        self.cities = {}
+        self.error = None
+        self.alerts = 0  # alert events raised by the cycle
+
+    def city(self, location_id):
+        """Returns the mutable stats dict for one city attempt in this cycle."""
+        stats = self.cities.get(location_id)
+        if stats is None:
+            stats = self.cities[location_id] = {
+                'http_status': None, 'request_ms': None, 'parse_ms': None,
+                'write_ms': None, 'error': None
+            }
+        return stats
+
+    def finish(self, conn):
+        """Persists the cycle and prunes old runs. Commits on the given connection."""
+        duration_ms = (time.perf_counter() - self._t0) * 1000
+        failed = sum(1 for s in self.cities.values() if s['error'])
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO fetch_runs (started_at, duration_ms, attempted, succeeded, failed, error)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (self.started_at, round(duration_ms, 1), len(self.cities),
+              len(self.cities) - failed, failed, self.error))
+        run_id = cursor.lastrowid
+        cursor.executemany("""
+            INSERT OR REPLACE INTO fetch_run_cities
+                (run_id, location_id, http_status, request_ms, parse_ms, write_ms, error)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, [(run_id, loc_id, s['http_status'], _round(s['request_ms']), _round(s['parse_ms']),
+               _round(s['write_ms']), s['error']) for loc_id, s in self.cities.items()])
+
+        prune_runs(cursor)
+        conn.commit()
+        return duration_ms
+
+
+def prune_runs(cursor, now=None):
+    """Deletes runs started more than RUNS_KEPT_DAYS ago (idx_fetch_runs_started keeps the checks cheap)."""
+    now = now or datetime.now()
+    cutoff = (now - timedelta(days=RUNS_KEPT_DAYS)).strftime('%Y-%m-%d %H:%M:%S')
+    cursor.execute("SELECT MIN(started_at) FROM fetch_runs")
+    oldest = cursor.fetchone()[0]
+    if not oldest or oldest >= (now - timedelta(days=RUNS_KEPT_DAYS) - PRUNE_EVERY).strftime('%Y-%m-%d %H:%M:%S'):
+        return
+    cursor.execute("DELETE FROM fetch_run_cities WHERE run_id IN (SELECT run_id FROM fetch_runs WHERE started_at < ?)",
+                   (cutoff,))
+    cursor.execute("DELETE FROM fetch_runs WHERE started_at < ?", (cutoff,))
+
+
+def _round(v):
+    return round(v, 1) if v is not None else None
+
+
+def staleness_seconds(observation_time, now=None):
+    if not observation_time:
+        return None
+    now = now or datetime.now()
+    try:
+        obs = datetime.strptime(observation_time.replace('T', ' ')[:19], '%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        return None
+    return int((now - obs).total_seconds())
+
+
+def get_freshness(cursor):
+    """Per-location staleness and the outcome of the latest fetch attempt."""
+    cursor.execute("""
+        SELECT l.location_id, l.city_name, cw.observation_time, cw.fetched_at,
+               fr.http_status, fr.request_ms, fr.error
+        FROM locations l
+        LEFT JOIN current_weather cw ON cw.location_id = l.location_id
+        LEFT JOIN fetch_run_cities fr ON fr.location_id = l.location_id
+            AND fr.run_id = (SELECT MAX(run_id) FROM fetch_run_cities WHERE location_id = l.location_id)
+        ORDER BY l.location_id
+    """)
+    now = datetime.now()
+    rows = []
+    for r in cursor.fetchall():
+        row = dict(r)
+        row['staleness_s'] = staleness_seconds(row['observation_time'], now)
+        rows.append(row)
+    return rows
+
+
+def get_fetch_metrics(cursor):
+    """Cycle (wake-up) duration histogram, last run summary and per-city failures over the kept window."""
+    cursor.execute("""
+        SELECT run_id, started_at, duration_ms, attempted, succeeded, failed, error
+        FROM fetch_runs ORDER BY run_id DESC LIMIT 1
+    """)
+    last = cursor.fetchone()
+
+    cursor.execute("SELECT duration_ms FROM fetch_runs")
+    histogram = {f"le_{b}s": 0 for b in CYCLE_BUCKETS_S}
+    histogram['le_inf'] = 0
+    count, total = 0, 0.0
+    for (ms,) in cursor.fetchall():
+        if ms is None:
+            continue
+        count += 1
+        total += ms
+        for b in CYCLE_BUCKETS_S:
+            if ms <= b * 1000:
+                histogram[f"le_{b}s"] += 1
+        histogram['le_inf'] += 1
+
+    cursor.execute("""
+        SELECT location_id, COUNT(*) AS attempts,
+               SUM(CASE WHEN error IS NOT NULL THEN 1 ELSE 0 END) AS failures,
+               AVG(request_ms) AS avg_request_ms, MAX(request_ms) AS max_request_ms
+        FROM fetch_run_cities GROUP BY location_id
+    """)
+    per_city = {r['location_id']: {
+        'attempts': r['attempts'],
+        'failures': r['failures'],
+        'avg_request_ms': _round(r['avg_request_ms']),
+        'max_request_ms': _round(r['max_request_ms'])
+    } for r in cursor.fetchall()}
+
+    return {
+        'last_run': dict(last) if last else None,
+        'cycle_duration': {'count': count, 'sum_ms': round(total, 1), 'buckets': histogram},
+        'cities': per_city,
+        'staleness_s': {r['location_id']: r['staleness_s'] for r in get_freshness(cursor)}
+    }
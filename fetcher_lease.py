@@ -0,0 +1,232 @@
+import os
+import math
+import time
+import socket
+import bisect
+import hashlib
+import threading
+from datetime import datetime
+from db_config import get_db_connection
+
+# --- FETCHER LEADER ELECTION ---
+# start.sh runs weather_fetcher.py next to gunicorn in every dyno/container.
+# Each instance must hold a lease before it polls, so scaling web processes does
+# not multiply upstream calls and duplicate writes.
+#   FETCHER_LEASE=db    lease rows in weather.db with heartbeat + expiry (default, works across hosts)
+#   FETCHER_LEASE=file  exclusive flock on FETCHER_LOCK_FILE (single host; released when the process dies)
+#   FETCHER_LEASE=none  always active (one fetcher only)
+# With FETCHER_SHARDS=N (db mode) the locations are split over N shard leases by a
+# consistent-hash ring, and live instances share the shards evenly.
+
+FETCHER_LEASE = os.environ.get('FETCHER_LEASE', 'db')
+FETCHER_SHARDS = int(os.environ.get('FETCHER_SHARDS', 1))
+LEASE_TTL = float(os.environ.get('FETCHER_LEASE_TTL', 90))   # seconds without heartbeat before failover
+FETCHER_LOCK_FILE = os.environ.get('FETCHER_LOCK_FILE', 'weather_fetcher.lock')
+
+# Takes the lease when it is free, expired or already ours; a no-op otherwise
+ACQUIRE_LEASE = """
+    INSERT INTO fetcher_leases (name, holder, acquired_at, heartbeat_at, expires_at)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(name) DO UPDATE SET
+        holder = excluded.holder,
+        acquired_at = CASE WHEN fetcher_leases.holder = excluded.holder
+                           THEN fetcher_leases.acquired_at ELSE excluded.acquired_at END,
+        heartbeat_at = excluded.heartbeat_at,
+        expires_at = excluded.expires_at
+    WHERE fetcher_leases.holder = excluded.holder OR fetcher_leases.expires_at < excluded.heartbeat_at
+"""
+
+
+def default_holder():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class HashRing:
+    """Consistent hashing of location_ids onto shards; changing N moves only ~1/N of them."""
+
+    def __init__(self, n_shards, vnodes=64):
+        self.n_shards = n_shards
+        points = sorted((self._hash(f"shard-{s}-{v}"), s) for s in range(n_shards) for v in range(vnodes))
+        self._keys = [p[0] for p in points]
+        self._shards = [p[1] for p in points]
+
+    @staticmethod
+    def _hash(key):
+        return int.from_bytes(hashlib.md5(str(key).encode()).digest()[:8], 'big')
+
+    def shard(self, location_id):
+        if self.n_shards <= 1:
+            return 0
+        i = bisect.bisect(self._keys, self._hash(location_id)) % len(self._keys)
+        return self._shards[i]
+
+
+class DbLease:
+    """Shard leases stored in the fetcher_leases table. tick() renews and rebalances."""
+
+    def __init__(self, n_shards=1, ttl=LEASE_TTL, holder=None, clock=time.time):
+        self.n_shards = max(1, n_shards)
+        self.ttl = ttl
+        self.holder = holder or default_holder()
+        self.clock = clock
+        self.owned = set()
+
+    def _name(self, shard):
+        return 'fetcher' if self.n_shards == 1 else f"fetcher:{shard}/{self.n_shards}"
+
+    def _try(self, cursor, shard, now):
+        cursor.execute(ACQUIRE_LEASE, (self._name(shard), self.holder, now, now, now + self.ttl))
+        return cursor.rowcount > 0
+
+    def tick(self, conn):
+        """Heartbeats held shards and claims a fair share of free ones. Returns the owned shard set."""
+        now = self.clock()
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            # Membership row: lets the others see this instance before it holds any shard
+            cursor.execute(ACQUIRE_LEASE, (f"member:{self.holder}", self.holder, now, now, now + self.ttl))
+            cursor.execute("DELETE FROM fetcher_leases WHERE name LIKE 'member:%' AND expires_at < ?", (now - self.ttl,))
+            # Renew first: a lease we could not renew in time was taken over
+            self.owned = {s for s in self.owned if self._try(cursor, s, now)}
+
+            cursor.execute("SELECT COUNT(*) FROM fetcher_leases WHERE name LIKE 'member:%' AND expires_at >= ?", (now,))
+            fair = math.ceil(self.n_shards / max(1, cursor.fetchone()[0]))
+
+            # Hand back extras so a newly started instance can pick them up
+            for shard in sorted(self.owned, reverse=True)[:max(0, len(self.owned) - fair)]:
+                cursor.execute("DELETE FROM fetcher_leases WHERE name = ? AND holder = ?", (self._name(shard), self.holder))
+                self.owned.discard(shard)
+            for shard in range(self.n_shards):
+                if len(self.owned) >= fair:
+                    break
+                if shard not in self.owned and self._try(cursor, shard, now):
+                    self.owned.add(shard)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return set(self.owned)
+
+    def release(self, conn):
+        conn.execute("DELETE FROM fetcher_leases WHERE holder = ?", (self.holder,))
+        conn.commit()
+        self.owned = set()
+
+
+class FileLease:
+    """Single-host leader election: whoever holds the flock is the fetcher."""
+
+    def __init__(self, path=FETCHER_LOCK_FILE):
+        self.path = path
+        self.n_shards = 1
+        self.ttl = LEASE_TTL
+        self.holder = default_holder()
+        self._fh = None
+
+    def tick(self, conn=None):
+        if self._fh is None:
+            import fcntl  # POSIX only
+            fh = open(self.path, 'a+')
+            try:
+                fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                fh.close()
+                return set()
+            fh.seek(0)
+            fh.truncate()
+            fh.write(self.holder)
+            fh.flush()
+            self._fh = fh
+        return {0}
+
+    def release(self, conn=None):
+        if self._fh is not None:
+            self._fh.close()  # closing drops the flock
+            self._fh = None
+
+
+class NoLease:
+    n_shards = 1
+    ttl = LEASE_TTL
+    holder = default_holder()
+
+    def tick(self, conn=None):
+        return {0}
+
+    def release(self, conn=None):
+        pass
+
+
+def make_lease(mode=FETCHER_LEASE, n_shards=FETCHER_SHARDS):
+    if mode == 'db':
+        return DbLease(n_shards)
+    if mode == 'file':
+        return FileLease()
+    if mode == 'none':
+        return NoLease()
+    raise ValueError(f"Unknown FETCHER_LEASE '{mode}' (choose from db, file, none)")
+
+
+class LeaseKeeper(threading.Thread):
+    """Heartbeats the lease from its own connection, so a long fetch cycle never lets it expire."""
+
+    def __init__(self, lease):
+        super().__init__(daemon=True)
+        self.lease = lease
+        self.ring = HashRing(lease.n_shards)
+        self._owned = set()
+        self._lock = threading.Lock()
+        self._halt = threading.Event()
+
+    def beat(self):
+        conn = get_db_connection() if isinstance(self.lease, DbLease) else None
+        try:
+            owned = self.lease.tick(conn)
+        except Exception as e:
+            # Could not reach the lease table: stop polling rather than risk a second active fetcher
+            print(f"Lease Error: {e}")
+            owned = set()
+        finally:
+            if conn is not None:
+                conn.close()
+        with self._lock:
+            if owned != self._owned:
+                state = f"active for shard(s) {sorted(owned)} of {self.lease.n_shards}" if owned else "standby"
+                print(f"[{datetime.now().strftime('%H:%M:%S')}] Fetcher {self.lease.holder}: {state}")
+            self._owned = owned
+        return owned
+
+    def run(self):
+        while not self._halt.wait(self.lease.ttl / 3):
+            self.beat()
+
+    def owns(self, location_id):
+        with self._lock:
+            return self.ring.shard(location_id) in self._owned
+
+    @property
+    def active(self):
+        with self._lock:
+            return bool(self._owned)
+
+    def stop(self):
+        self._halt.set()
+        conn = get_db_connection() if isinstance(self.lease, DbLease) else None
+        try:
+            self.lease.release(conn)
+        finally:
+            if conn is not None:
+                conn.close()
+
+
+def get_leases(cursor):
+    """Current lease rows with seconds until expiry (negative = expired), for /api/metrics."""
+    cursor.execute("SELECT name, holder, acquired_at, heartbeat_at, expires_at FROM fetcher_leases ORDER BY name")
+    now = time.time()
+    return [{
+        'name': r['name'],
+        'holder': r['holder'],
+        'held_s': round(now - r['acquired_at'], 1),
+        'expires_in_s': round(r['expires_at'] - now, 1)
+    } for r in cursor.fetchall()]
@@ -0,0 +1,189 @@
+import os
+import time
+import bisect
+import threading
+from array import array
+from itertools import repeat
+from datetime import datetime
+import numpy as np
+
+# --- RECENT HISTORY CACHE ---
+# Per-location bounded buffers of the last HISTORY_CACHE_HOURS of weather_obs, kept in
+# the API process: timestamps and generations as int64 arrays, values as float32 arrays
+# (about 20 bytes per reading). Warmed from SQLite on first use, then topped up with
+# the rows whose generation is newer than the last one seen (idx_obs_generation), so
+# every fetcher cycle is picked up by the next request without re-reading the window.
+
+HISTORY_CACHE_HOURS = float(os.environ.get('HISTORY_CACHE_HOURS', 6))
+# Kept beyond HISTORY_CACHE_HOURS, so a window of exactly that length (the /api/weather
+# default) still fits however far the clock moved since the buffers were last trimmed
+MARGIN_S = 2 * 300
+READINGS_PER_HOUR = 12           # 5 minute cadence
+SLACK = 2                        # room for faster polling (fallback provider, retries)
+
+
+class CityBuffer:
+    __slots__ = ('ts', 'gen', 'temperature', 'complete_from')
+
+    def __init__(self, complete_from):
+        self.ts = array('q')
+        self.gen = array('q')
+        self.temperature = array('f')
+        # Readings at or after this epoch are all present
+        self.complete_from = complete_from
+
+    def append(self, ts, gen, temperature, capacity, horizon):
+        if self.ts and ts <= self.ts[-1]:
+            i = bisect.bisect_left(self.ts, ts)
+            if i < len(self.ts) and self.ts[i] == ts:
+                return  # same reading (the PK forbids duplicates anyway)
+            # Late reading: rare, insert in place to keep the arrays sorted
+            self.ts.insert(i, ts)
+            self.gen.insert(i, gen)
+            self.temperature.insert(i, float('nan') if temperature is None else temperature)
+        else:
+            self.ts.append(ts)
+            self.gen.append(gen)
+            self.temperature.append(float('nan') if temperature is None else temperature)
+        # Bound the buffer: drop what fell out of the window, then anything over capacity
+        drop = bisect.bisect_left(self.ts, horizon)
+        if len(self.ts) - drop > capacity:
+            drop = len(self.ts) - capacity
+            self.complete_from = max(self.complete_from, self.ts[drop - 1] + 1)
+        if drop:
+            del self.ts[:drop]
+            del self.gen[:drop]
+            del self.temperature[:drop]
+
+
+class HistoryCache:
+    def __init__(self, hours=HISTORY_CACHE_HOURS, clock=time.time):
+        self.hours = hours
+        self.capacity = int((hours + MARGIN_S / 3600) * READINGS_PER_HOUR * SLACK)
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.cities = {}
+        self.names = {}
+        self.generation = None
+        self.epoch = None
+        # observation_time strings by epoch (cities share poll slots); pruned with the window
+        self.labels = {}
+
+    @property
+    def enabled(self):
+        return self.hours > 0
+
+    def _horizon(self):
+        return int(self.clock() - self.hours * 3600 - MARGIN_S)
+
+    def _epoch(self, cursor):
+        cursor.execute("SELECT value FROM sync_state WHERE key = 'history_epoch'")
+        row = cursor.fetchone()
+        return row[0] if row else 0
+
+    def _warm(self, cursor, generation, epoch):
+        horizon = self._horizon()
+        self.cities = {}
+        cursor.execute("SELECT location_id, city_name FROM locations")
+        self.names = {r[0]: r[1] for r in cursor.fetchall()}
+        cursor.execute("""
+            SELECT wo.location_id, wo.ts_epoch, COALESCE(wo.generation, 0), wo.temperature
+            FROM locations l
+            CROSS JOIN weather_obs wo ON wo.location_id = l.location_id
+            WHERE wo.ts_epoch >= ? AND COALESCE(wo.generation, 0) <= ?
+            ORDER BY wo.location_id, wo.ts_epoch
+        """, (horizon, generation))
+        for lid, ts, gen, temp in cursor.fetchall():
+            self._buffer(lid, horizon).append(ts, gen, temp, self.capacity, horizon)
+        self.generation = generation
+        self.epoch = epoch
+
+    def _buffer(self, location_id, complete_from):
+        buf = self.cities.get(location_id)
+        if buf is None:
+            buf = self.cities[location_id] = CityBuffer(complete_from)
+        return buf
+
+    def history(self, cursor, generation, since_ts, filters=(), since_generation=None):
+        """History rows of the snapshot at `generation` (refresh, coverage check and query under
+        one lock hold, so another request cannot move the buffers in between), or None when the
+        cache cannot answer and the caller should query SQL."""
+        if not self.enabled or since_ts < self._horizon():
+            return None
+        with self.lock:
+            if not self._refresh(cursor, generation) or not self._covers(since_ts):
+                return None
+            return self._query(since_ts, filters, since_generation, generation)
+
+    def _refresh(self, cursor, generation):
+        """Brings the cache up to `generation` using the caller's (read) cursor. False when the
+        snapshot belongs to another history epoch than the buffers."""
+        if generation == self.generation:
+            return True
+        epoch = self._epoch(cursor)
+        if self.generation is None or epoch > self.epoch:
+            # First use, or history deleted since the buffers were filled
+            self._warm(cursor, generation, epoch)
+            return True
+        if epoch < self.epoch:
+            return False  # a snapshot from before the last delete
+        if generation < self.generation:
+            # An older snapshot (workers swap at different moments): the buffers hold all of
+            # its readings, _query caps at its generation. Never rewarm them backwards.
+            return True
+        horizon = self._horizon()
+        cursor.execute("""
+            SELECT location_id, ts_epoch, generation, temperature FROM weather_obs
+            WHERE generation > ? AND generation <= ? AND ts_epoch >= ?
+            ORDER BY generation
+        """, (self.generation, generation, horizon))
+        for lid, ts, gen, temp in cursor.fetchall():
+            if lid not in self.names:
+                cursor.execute("SELECT location_id, city_name FROM locations")
+                self.names = {r[0]: r[1] for r in cursor.fetchall()}
+            self._buffer(lid, horizon).append(ts, gen, temp, self.capacity, horizon)
+        self.generation = generation
+        if len(self.labels) > self.capacity * 4:
+            self.labels = {t: v for t, v in self.labels.items() if t >= horizon}
+        return True
+
+    def _covers(self, since_ts):
+        """True when every city's buffer holds all readings after since_ts."""
+        return all(buf.complete_from <= since_ts + 1 for buf in self.cities.values())
+
+    def _query(self, since_ts, filters, since_generation, until_generation):
+        """Rows like the SQL history block (city_name, temperature, observation_time), oldest first.
+
+        filters: (column, values) pairs from app.parse_cities, column 'location_id' or 'city_name'.
+        """
+        lo = -1 if since_generation is None else since_generation
+        hi = until_generation
+        rows = []
+        labels = self.labels
+        for lid, buf in self.cities.items():
+            name = self.names.get(lid)
+            if name is None or not all((lid if col == 'location_id' else name) in vals for col, vals in filters):
+                continue
+            ts, gen = buf.ts, buf.gen
+            start = bisect.bisect_right(ts, since_ts)
+            if start == len(ts):
+                continue
+            # float32 -> the decimal that was stored, for the whole slice at once
+            temps = np.frombuffer(buf.temperature, dtype=np.float32)[start:].astype(float).round(4).tolist()
+            if lo < 0 and hi >= self.generation:
+                # Every buffered reading qualifies: no per-reading generation test
+                rows.extend(zip(ts[start:], repeat(name), temps))
+                continue
+            rows.extend((ts[i], name, temps[i - start]) for i in range(start, len(ts)) if lo < gen[i] <= hi)
+        out = []
+        for t, name, v in sorted(rows):
+            label = labels.get(t)
+            if label is None:
+                label = labels[t] = datetime.fromtimestamp(t).strftime('%Y-%m-%dT%H:%M:%S')
+            out.append({'city_name': name, 'temperature': None if v != v else v, 'observation_time': label})
+        return out
+
+    def memory_bytes(self):
+        with self.lock:
+            return sum(b.ts.itemsize * len(b.ts) + b.gen.itemsize * len(b.gen)
+                       + b.temperature.itemsize * len(b.temperature) for b in self.cities.values())
@@ -3,17 +3,110 @@ import os
 
 DB_FILE = 'weather.db'
 
+def ensure_column(cursor, table, column, col_type):
+    # CREATE TABLE IF NOT EXISTS never adds columns to an existing table
+    cursor.execute(f"PRAGMA table_info({table})")
+    cols = [row[1] for row in cursor.fetchall()]
+    if cols and column not in cols:
+        print(f"Adding {column} to {table}...")
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {col_type}")
+
+def object_type(cursor, name):
+    cursor.execute("SELECT type FROM sqlite_master WHERE name = ?", (name,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def migrate(cursor):
+    # Upgrades databases created by older versions of schema.sql (no-op on fresh ones)
+    ensure_column(cursor, 'current_weather', 'fetched_at', 'TEXT')
+    ensure_column(cursor, 'current_weather', 'generation', 'INTEGER')
+    ensure_column(cursor, 'current_weather', 'feels_like', 'REAL')
+    ensure_column(cursor, 'weather_obs', 'feels_like', 'REAL')
+    ensure_column(cursor, 'situation_reports', 'body', 'TEXT')
+
+    # weather_history used to be a rowid table; it is now a view over weather_obs.
+    # Move the old table aside here, schema.sql creates the new layout, migrate_data copies.
+    if object_type(cursor, 'weather_history') == 'table':
+        ensure_column(cursor, 'weather_history', 'fetched_at', 'TEXT')
+        ensure_column(cursor, 'weather_history', 'generation', 'INTEGER')
+        print("Moving weather_history aside for the weather_obs migration...")
+        cursor.execute("ALTER TABLE weather_history RENAME TO weather_history_legacy")
+
+def migrate_data(cursor):
+    # Runs after schema.sql, once the new tables exist
+    if object_type(cursor, 'weather_history_legacy') == 'table':
+        cursor.execute("""
+            INSERT OR IGNORE INTO weather_obs (
+                location_id, ts_epoch, temperature, humidity, windspeed, winddirection, weathercode, is_day,
+                pressure, uv_index, dew_point, visibility, cloud_cover, solar_rad, fetched_epoch, generation
+            )
+            SELECT location_id, CAST(strftime('%s', observation_time, 'utc') AS INTEGER),
+                   temperature, humidity, windspeed, winddirection, weathercode, is_day,
+                   pressure, uv_index, dew_point, visibility, cloud_cover, solar_rad,
+                   -- fetched_at is local time, created_at is SQLite's CURRENT_TIMESTAMP (UTC)
+                   CAST(COALESCE(strftime('%s', fetched_at, 'utc'), strftime('%s', created_at)) AS INTEGER),
+                   generation
+            FROM weather_history_legacy
+            WHERE observation_time IS NOT NULL
+        """)
+        print(f"Migrated {cursor.rowcount} history rows to weather_obs.")
+        cursor.execute("DROP TABLE weather_history_legacy")
+
+    # Reports written before reports_fts existed are not indexed yet
+    cursor.execute("SELECT (SELECT COUNT(*) FROM situation_reports) != (SELECT COUNT(*) FROM reports_fts_docsize)")
+    if cursor.fetchone()[0]:
+        print("Rebuilding the situation_reports full-text index...")
+        cursor.execute("INSERT INTO reports_fts (reports_fts) VALUES ('rebuild')")
+
+    # Rows that predate the R*Tree triggers (schema.sql seeds locations before creating them)
+    for table, id_col in (('locations', 'location_id'), ('points', 'point_id')):
+        cursor.execute(f"""
+            INSERT OR IGNORE INTO {table}_rtree ({id_col}, min_lat, max_lat, min_lon, max_lon)
+            SELECT t.{id_col}, t.latitude, t.latitude, t.longitude, t.longitude
+            FROM {table} t
+            WHERE t.latitude IS NOT NULL AND t.longitude IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM {table}_rtree r WHERE r.{id_col} = t.{id_col})
+        """)
+
+def schema_statements(script):
+    # executescript() commits any open transaction first, so the schema is run statement by
+    # statement inside the caller's; complete_statement() keeps trigger bodies in one piece
+    statement = ''
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            yield statement
+            statement = ''
+    if statement.strip():
+        yield statement
+
 def init_db():
     # Always run script to ensure tables exist (even if DB file existed)
-    conn = sqlite3.connect(DB_FILE)
+    # Every gunicorn worker (and the fetcher) runs this on start; wait for each other instead of failing
+    conn = sqlite3.connect(DB_FILE, timeout=30, isolation_level=None)
     cursor = conn.cursor()
-    
+
     with open('schema.sql', 'r') as f:
         script = f.read()
-        cursor.executescript(script)
-        
-    conn.commit()
-    conn.close()
+
+    # Persistent: readers (snapshot copies, live-database fallbacks) no longer block writers
+    cursor.execute("PRAGMA journal_mode=WAL")
+
+    # One transaction: one fsync instead of one per statement, a short single lock hold, and
+    # the column/table checks in migrate() only run once this process holds the write lock,
+    # so two processes starting together cannot both ALTER the same table
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        migrate(cursor)
+        for statement in schema_statements(script):
+            cursor.execute(statement)
+        migrate_data(cursor)
+        cursor.execute("COMMIT")
+    except Exception:
+        cursor.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
     print("Initialized new SQLite database.")
 
 if __name__ == '__main__':
@@ -0,0 +1,112 @@
+import heapq
+import random
+import time
+
+# --- ADAPTIVE POLL SCHEDULER ---
+# Priority queue of per-location due times. Each location keeps a nominal "slot"
+# that advances by a fixed interval, so the cadence does not drift with cycle time.
+# Jitter is applied on top of the slot, failures back off exponentially and
+# locations whose upstream observation did not change are polled less often.
+
+POLL_INTERVAL = 300        # nominal cadence (seconds)
+JITTER = 15                # +/- seconds added to each due time
+RETRY_BASE = 60            # first retry after a failure
+MAX_BACKOFF = 3600         # cap for failing locations
+MAX_STRETCH = 3.0          # unchanged upstream may stretch the interval up to 3x
+
+
+class PollScheduler:
+    def __init__(self, interval=POLL_INTERVAL, jitter=JITTER, retry_base=RETRY_BASE,
+                 max_backoff=MAX_BACKOFF, max_stretch=MAX_STRETCH, clock=time.time):
+        self.interval = interval
+        self.jitter = jitter
+        self.retry_base = retry_base
+        self.max_backoff = max_backoff
+        self.max_stretch = max_stretch
+        self.clock = clock
+        self._heap = []
+        self.state = {}
+
+    def sync_locations(self, location_ids):
+        """Adds new locations (staggered over one interval) and forgets removed ones."""
+        now = self.clock()
+        new_ids = [lid for lid in location_ids if lid not in self.state]
+        wanted = set(location_ids)
+        for lid in list(self.state):
+            if lid not in wanted:
+                del self.state[lid]
+        for i, lid in enumerate(new_ids):
+            # Spread first polls so a large location list does not burst upstream
+            slot = now + (i * self.interval / len(new_ids) if len(new_ids) > 1 else 0)
+            self.state[lid] = {'slot': slot, 'failures': 0, 'unchanged': 0, 'upstream_obs': None, 'queued': True}
+            heapq.heappush(self._heap, (slot, lid))
+
+    def pop_due(self):
+        now = self.clock()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, lid = heapq.heappop(self._heap)
+            if lid in self.state and lid not in due:
+                self.state[lid]['queued'] = False
+                due.append(lid)
+        return due
+
+    def requeue_unscheduled(self):
+        """Treats popped locations that never got a result (e.g. the cycle crashed) as failures."""
+        for lid, st in self.state.items():
+            if not st['queued']:
+                self.record_failure(lid)
+
+    def seconds_until_next(self):
+        # Drop entries for removed locations so they do not cause early wake-ups
+        while self._heap and self._heap[0][1] not in self.state:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return self.interval
+        return max(0.0, self._heap[0][0] - self.clock())
+
+    def is_unchanged(self, location_id, upstream_obs):
+        """True when the provider reports the same observation as the last successful poll."""
+        st = self.state.get(location_id)
+        return bool(st and upstream_obs and st['upstream_obs'] == upstream_obs)
+
+    def record_success(self, location_id, upstream_obs=None):
+        st = self.state.get(location_id)
+        if st is None:
+            return
+        if upstream_obs and st['upstream_obs'] == upstream_obs:
+            st['unchanged'] += 1
+        else:
+            st['unchanged'] = 0
+        st['upstream_obs'] = upstream_obs or st['upstream_obs']
+        st['failures'] = 0
+
+        stretch = min(self.max_stretch, 1.5 ** st['unchanged'])
+        self._advance(location_id, self.interval * stretch)
+
+    def record_failure(self, location_id):
+        st = self.state.get(location_id)
+        if st is None:
+            return
+        st['failures'] += 1
+        delay = min(self.max_backoff, self.retry_base * 2 ** (st['failures'] - 1))
+        # Failures restart the cadence from now; the slot realigns on the next success
+        st['slot'] = self.clock()
+        self._push(location_id, st['slot'] + delay)
+
+    def _advance(self, location_id, step):
+        st = self.state[location_id]
+        now = self.clock()
+        slot = st['slot'] + step
+        if slot <= now:
+            # We fell behind (long outage, slow cycle): skip missed slots instead of bursting
+            missed = int((now - slot) // step) + 1
+            slot += missed * step
+        st['slot'] = slot
+        self._push(location_id, slot)
+
+    def _push(self, location_id, due):
+        self.state[location_id]['queued'] = True
+        if self.jitter:
+            due += random.uniform(-self.jitter, self.jitter)
+        heapq.heappush(self._heap, (due, location_id))
@@ -24,32 +24,72 @@ CREATE TABLE IF NOT EXISTS current_weather (
     visibility INTEGER,
     cloud_cover INTEGER,
     solar_rad REAL,
+    feels_like REAL,
     inserted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    -- observation_time is the provider's own stamp; fetched_at is when we polled it
+    fetched_at TEXT,
+    generation INTEGER,
     FOREIGN KEY (location_id) REFERENCES locations(location_id) ON DELETE CASCADE,
     UNIQUE(location_id)
 );
-CREATE TABLE IF NOT EXISTS weather_history (
-    history_id INTEGER PRIMARY KEY AUTOINCREMENT,
+-- Observation History: clustered on (location_id, ts_epoch) with integer epoch seconds.
+-- One B-tree holds both key and row, so range scans per location need no extra lookup.
+CREATE TABLE IF NOT EXISTS weather_obs (
     location_id INTEGER NOT NULL,
-    observation_time TEXT NOT NULL,
+    ts_epoch INTEGER NOT NULL,
     temperature REAL,
-    humidity REAL,
+    humidity INTEGER,
     windspeed REAL,
     winddirection INTEGER,
     weathercode INTEGER,
-    is_day BOOLEAN,
+    is_day INTEGER,
     pressure REAL,
     uv_index REAL,
     dew_point REAL,
     visibility INTEGER,
     cloud_cover INTEGER,
     solar_rad REAL,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (location_id) REFERENCES locations(location_id) ON DELETE CASCADE,
-    UNIQUE(location_id, observation_time)
-);
-CREATE INDEX IF NOT EXISTS idx_history_time ON weather_history (observation_time);
-CREATE INDEX IF NOT EXISTS idx_history_location_time ON weather_history (location_id, observation_time);
+    feels_like REAL,
+    fetched_epoch INTEGER,
+    generation INTEGER,
+    PRIMARY KEY (location_id, ts_epoch)
+) WITHOUT ROWID;
+-- Legacy column names (observation_time/fetched_at as local 'YYYY-MM-DD HH:MM:SS' text)
+CREATE VIEW IF NOT EXISTS weather_history AS
+SELECT location_id,
+    datetime(ts_epoch, 'unixepoch', 'localtime') AS observation_time,
+    temperature,
+    humidity,
+    windspeed,
+    winddirection,
+    weathercode,
+    is_day,
+    pressure,
+    uv_index,
+    dew_point,
+    visibility,
+    cloud_cover,
+    solar_rad,
+    datetime(fetched_epoch, 'unixepoch', 'localtime') AS fetched_at,
+    generation,
+    ts_epoch
+FROM weather_obs;
+CREATE TRIGGER IF NOT EXISTS weather_history_insert INSTEAD OF
+INSERT ON weather_history BEGIN
+INSERT
+    OR IGNORE INTO weather_obs (
+        location_id, ts_epoch, temperature, humidity, windspeed, winddirection, weathercode, is_day,
+        pressure, uv_index, dew_point, visibility, cloud_cover, solar_rad, fetched_epoch, generation
+    )
+VALUES (
+        NEW.location_id,
+        CAST(strftime('%s', NEW.observation_time, 'utc') AS INTEGER),
+        NEW.temperature, NEW.humidity, NEW.windspeed, NEW.winddirection, NEW.weathercode, NEW.is_day,
+        NEW.pressure, NEW.uv_index, NEW.dew_point, NEW.visibility, NEW.cloud_cover, NEW.solar_rad,
+        CAST(strftime('%s', COALESCE(NEW.fetched_at, NEW.observation_time), 'utc') AS INTEGER),
+        NEW.generation
+    );
+END;
 -- Initial Locations
 INSERT
     OR IGNORE INTO locations (city_name, country, latitude, longitude)
@@ -117,9 +157,39 @@ CREATE TABLE IF NOT EXISTS situation_reports (
     source TEXT,
     date_published TEXT,
     url TEXT,
+    body TEXT,
+    -- feed description / summary text, indexed by reports_fts
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     UNIQUE(url)
 );
+-- Dashboards list reports per sector newest first; ETL cleanups delete by date
+CREATE INDEX IF NOT EXISTS idx_reports_sector_date ON situation_reports (sector, date_published);
+CREATE INDEX IF NOT EXISTS idx_reports_date ON situation_reports (date_published);
+-- Full-text search over reports (external content: the text lives only in situation_reports)
+CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts USING fts5(
+    title,
+    body,
+    content = 'situation_reports',
+    content_rowid = 'report_id',
+    tokenize = 'porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS reports_fts_insert
+AFTER INSERT ON situation_reports BEGIN
+    INSERT INTO reports_fts (rowid, title, body)
+    VALUES (new.report_id, new.title, new.body);
+END;
+CREATE TRIGGER IF NOT EXISTS reports_fts_delete
+AFTER DELETE ON situation_reports BEGIN
+    INSERT INTO reports_fts (reports_fts, rowid, title, body)
+    VALUES ('delete', old.report_id, old.title, old.body);
+END;
+CREATE TRIGGER IF NOT EXISTS reports_fts_update
+AFTER UPDATE OF title, body ON situation_reports BEGIN
+    INSERT INTO reports_fts (reports_fts, rowid, title, body)
+    VALUES ('delete', old.report_id, old.title, old.body);
+    INSERT INTO reports_fts (rowid, title, body)
+    VALUES (new.report_id, new.title, new.body);
+END;
 -- Seed Education Indicators
 INSERT
     OR IGNORE INTO education_indicators (
@@ -176,4 +246,207 @@ VALUES (
         13.5,
         '2023',
         '[{"year": "2021", "value": 13.2}, {"year": "2022", "value": 13.4}, {"year": "2023", "value": 13.5}]'
-    );
\ No newline at end of file
+    );
+
+-- Fetcher Telemetry (one row per sync cycle, one row per city attempt)
+CREATE TABLE IF NOT EXISTS fetch_runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at TEXT NOT NULL,
+    duration_ms REAL,
+    attempted INTEGER,
+    succeeded INTEGER,
+    failed INTEGER,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_fetch_runs_started ON fetch_runs (started_at);
+CREATE TABLE IF NOT EXISTS fetch_run_cities (
+    location_id INTEGER NOT NULL,
+    run_id INTEGER NOT NULL,
+    http_status INTEGER,
+    request_ms REAL,
+    parse_ms REAL,
+    write_ms REAL,
+    error TEXT,
+    PRIMARY KEY (location_id, run_id)
+) WITHOUT ROWID;
+-- Hourly Forecast (replaced per location whenever the provider issues a new one)
+CREATE TABLE IF NOT EXISTS forecast (
+    location_id INTEGER NOT NULL,
+    valid_time TEXT NOT NULL,
+    issued_time TEXT NOT NULL,
+    temperature REAL,
+    feels_like REAL,
+    humidity REAL,
+    windspeed REAL,
+    winddirection INTEGER,
+    weathercode INTEGER,
+    pressure REAL,
+    uv_index REAL,
+    visibility INTEGER,
+    cloud_cover INTEGER,
+    dew_point REAL,
+    precip_prob REAL,
+    precip_mm REAL,
+    PRIMARY KEY (location_id, valid_time)
+) WITHOUT ROWID;
+-- Sync State (monotonic generation stamped on every weather write, used for delta polling)
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT
+    OR IGNORE INTO sync_state (key, value)
+VALUES ('generation', 0);
+-- Bumped when history rows are deleted (clear_data.py), so in-memory history caches rewarm
+INSERT
+    OR IGNORE INTO sync_state (key, value)
+VALUES ('history_epoch', 0);
+CREATE INDEX IF NOT EXISTS idx_obs_generation ON weather_obs (generation);
+CREATE INDEX IF NOT EXISTS idx_current_generation ON current_weather (generation);
+-- Fetcher Leases (leader election between weather_fetcher instances, see fetcher_lease.py)
+CREATE TABLE IF NOT EXISTS fetcher_leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    acquired_at REAL NOT NULL,
+    heartbeat_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+-- Anomaly Detection (running statistics per location / variable / local solar hour, see anomaly_detector.py)
+CREATE TABLE IF NOT EXISTS anomaly_stats (
+    location_id INTEGER NOT NULL,
+    variable TEXT NOT NULL,
+    hour INTEGER NOT NULL,
+    n INTEGER NOT NULL,
+    mean REAL NOT NULL,
+    m2 REAL NOT NULL,
+    updated_epoch INTEGER,
+    PRIMARY KEY (location_id, hour, variable)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS weather_anomalies (
+    anomaly_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    location_id INTEGER NOT NULL,
+    variable TEXT NOT NULL,
+    ts_epoch INTEGER NOT NULL,
+    value REAL,
+    mean REAL,
+    stddev REAL,
+    zscore REAL,
+    generation INTEGER,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(location_id, variable, ts_epoch)
+);
+CREATE INDEX IF NOT EXISTS idx_anomalies_ts ON weather_anomalies (ts_epoch);
+-- Alerting (rules evaluated on each fetch cycle's new readings, see alert_engine.py)
+CREATE TABLE IF NOT EXISTS alert_rules (
+    rule_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    variable TEXT NOT NULL,
+    -- current_weather column: temperature, feels_like, windspeed, uv_index, visibility, ...
+    op TEXT NOT NULL DEFAULT '>=',
+    -- '>=' or '<='
+    threshold REAL NOT NULL,
+    clear_threshold REAL,
+    -- hysteresis: a firing alert resolves only once the value is back past this
+    duration_s INTEGER NOT NULL DEFAULT 0,
+    -- the breach must hold this long before firing
+    location_id INTEGER,
+    -- NULL = every governorate
+    severity TEXT NOT NULL DEFAULT 'warning',
+    enabled INTEGER NOT NULL DEFAULT 1,
+    UNIQUE(name)
+);
+CREATE TABLE IF NOT EXISTS alert_state (
+    location_id INTEGER NOT NULL,
+    rule_id INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    -- 'pending' or 'firing' (no row = normal)
+    since_epoch INTEGER NOT NULL,
+    last_value REAL,
+    last_epoch INTEGER,
+    PRIMARY KEY (location_id, rule_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS alerts (
+    alert_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    rule_id INTEGER NOT NULL,
+    location_id INTEGER NOT NULL,
+    event TEXT NOT NULL,
+    -- 'firing' or 'resolved'
+    severity TEXT,
+    value REAL,
+    threshold REAL,
+    ts_epoch INTEGER NOT NULL,
+    generation INTEGER,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_alerts_ts ON alerts (ts_epoch);
+-- Seed Alert Rules
+INSERT
+    OR IGNORE INTO alert_rules (name, variable, op, threshold, clear_threshold, duration_s, severity)
+VALUES ('extreme_heat', 'temperature', '>=', 45, 43, 900, 'warning'),
+    ('heat_stress', 'feels_like', '>=', 41, 39, 1800, 'warning'),
+    ('extreme_heat_stress', 'feels_like', '>=', 54, 51, 900, 'critical'),
+    ('high_wind', 'windspeed', '>=', 62, 50, 600, 'warning'),
+    ('extreme_uv', 'uv_index', '>=', 11, 9, 0, 'advisory'),
+    ('low_visibility', 'visibility', '<=', 1000, 2000, 600, 'warning');
+-- Map Points (schools, health facilities, ...) with R*Tree indexes for bbox / nearest queries (see spatial.py)
+CREATE TABLE IF NOT EXISTS points (
+    point_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL,
+    -- 'school', 'health_facilities' (HeRAMS counts per governorate), ...
+    name TEXT NOT NULL,
+    status TEXT,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    location_id INTEGER,
+    props_json TEXT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(type, name)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS points_rtree USING rtree(point_id, min_lat, max_lat, min_lon, max_lon);
+CREATE TRIGGER IF NOT EXISTS points_rtree_insert
+AFTER INSERT ON points BEGIN
+    INSERT INTO points_rtree VALUES (new.point_id, new.latitude, new.latitude, new.longitude, new.longitude);
+END;
+CREATE TRIGGER IF NOT EXISTS points_rtree_update
+AFTER UPDATE OF latitude, longitude ON points BEGIN
+    UPDATE points_rtree SET min_lat = new.latitude, max_lat = new.latitude,
+        min_lon = new.longitude, max_lon = new.longitude
+    WHERE point_id = new.point_id;
+END;
+CREATE TRIGGER IF NOT EXISTS points_rtree_delete
+AFTER DELETE ON points BEGIN
+    DELETE FROM points_rtree WHERE point_id = old.point_id;
+END;
+CREATE VIRTUAL TABLE IF NOT EXISTS locations_rtree USING rtree(location_id, min_lat, max_lat, min_lon, max_lon);
+CREATE TRIGGER IF NOT EXISTS locations_rtree_insert
+AFTER INSERT ON locations BEGIN
+    INSERT INTO locations_rtree VALUES (new.location_id, new.latitude, new.latitude, new.longitude, new.longitude);
+END;
+CREATE TRIGGER IF NOT EXISTS locations_rtree_update
+AFTER UPDATE OF latitude, longitude ON locations BEGIN
+    UPDATE locations_rtree SET min_lat = new.latitude, max_lat = new.latitude,
+        min_lon = new.longitude, max_lon = new.longitude
+    WHERE location_id = new.location_id;
+END;
+CREATE TRIGGER IF NOT EXISTS locations_rtree_delete
+AFTER DELETE ON locations BEGIN
+    DELETE FROM locations_rtree WHERE location_id = old.location_id;
+END;
+-- Seed Points (formerly hard-coded in app.py)
+INSERT
+    OR IGNORE INTO points (type, name, status, latitude, longitude)
+VALUES ('school', 'Sana''a School A', 'Unstable', 15.3694, 44.1910),
+    ('school', 'Aden Central', 'Open', 12.7855, 45.0188),
+    ('school', 'Dhamar High', 'Closed', 14.5485, 44.4038),
+    ('school', 'Taiz Pri-Ed', 'Active-Shelling', 13.5780, 44.0040),
+    ('school', 'Hudaydah Port Sch', 'Flooded', 14.7978, 42.9550),
+    ('school', 'Marib Camp Sch', 'Overcrowded', 15.4290, 45.3330);
+-- HeRAMS 2024 facility counts per governorate, placed at the governorate's weather location
+INSERT
+    OR IGNORE INTO points (type, name, status, latitude, longitude, props_json)
+VALUES ('health_facilities', 'Sana''a', NULL, 15.3694, 44.1910, '{"governorate": "Sana''a", "total": 180, "active": 100, "partial": 60, "closed": 20}'),
+    ('health_facilities', 'Aden', NULL, 12.7794, 45.0367, '{"governorate": "Aden", "total": 110, "active": 65, "partial": 35, "closed": 10}'),
+    ('health_facilities', 'Taiz', NULL, 13.5795, 44.0209, '{"governorate": "Taiz", "total": 150, "active": 75, "partial": 50, "closed": 25}'),
+    ('health_facilities', 'Al Hudaydah', NULL, 14.7978, 42.9545, '{"governorate": "Al Hudaydah", "total": 140, "active": 70, "partial": 50, "closed": 20}'),
+    ('health_facilities', 'Ibb', NULL, 13.9667, 44.1833, '{"governorate": "Ibb", "total": 130, "active": 72, "partial": 48, "closed": 10}'),
+    ('health_facilities', 'Marib', NULL, 15.4591, 45.3253, '{"governorate": "Marib", "total": 90, "active": 50, "partial": 30, "closed": 10}');
@@ -0,0 +1,44 @@
+import os
+import time
+import threading
+
+# --- SECTION PAYLOAD CACHE ---
+# Per-worker payloads of the sector endpoints (/api/health, /api/economy, /api/education,
+# the weather block of /api/bundle), shared by the single endpoints and the bundle.
+# An entry is reused while the data it was built from is unchanged (same snapshot file,
+# or same sync generation for weather) and it is younger than its TTL; the TTL also
+# keeps the simulated series in the economy and education payloads moving.
+
+SECTION_TTL = float(os.environ.get('SECTION_CACHE_TTL', 60))
+
+
+class SectionCache:
+    def __init__(self, ttl=SECTION_TTL, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name, version, build):
+        """Cached payload of `name` for `version`, else build() (called outside the lock)."""
+        now = self.clock()
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry and entry[0] == version and now - entry[1] < self.ttl:
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+        payload = build()
+        with self.lock:
+            self.entries[name] = (version, now, payload)
+        return payload
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {'sections': sorted(self.entries), 'hits': self.hits, 'misses': self.misses, 'ttl_s': self.ttl}
@@ -0,0 +1,181 @@
+import os
+import time
+import sqlite3
+import threading
+from datetime import datetime
+
+# --- READ SNAPSHOTS ---
+# Writers (fetcher, ETLs) publish an online-backup copy of weather.db into SNAPSHOT_DIR
+# and atomically repoint the `current.db` symlink at it. weather.db runs in WAL mode
+# (init_db), so the copy's read transaction never blocks the writers. API workers open whatever the
+# link points to with immutable=1: no locks, no journal reads, never a half-written cycle.
+# A published file is never modified again, so it can also be rsynced to read replicas.
+# Delete SNAPSHOT_DIR (or set SNAPSHOTS=0 for the writers) to read the live database again.
+
+SNAPSHOTS = os.environ.get('SNAPSHOTS', '1') != '0'
+SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR', 'snapshots')
+# Published files kept, the current one included: older ones are unlinked (open readers keep
+# their inode). The previous file covers readers that resolved the link just before a swap.
+SNAPSHOT_KEEP = int(os.environ.get('SNAPSHOT_KEEP', 2))
+# The fetcher wakes up every few seconds (staggered locations): it copies at most once per
+# poll interval, sooner only for writes that cannot wait (new alerts)
+SNAPSHOT_MIN_INTERVAL = float(os.environ.get('SNAPSHOT_MIN_INTERVAL', 300))
+CURRENT_LINK = 'current.db'
+
+
+def current_snapshot(snapshot_dir=SNAPSHOT_DIR):
+    """Path of the published snapshot, or None when nothing has been published."""
+    link = os.path.join(snapshot_dir, CURRENT_LINK)
+    if not os.path.islink(link):
+        return None
+    path = os.path.realpath(link)
+    return path if os.path.exists(path) else None
+
+
+def schema_changed(db_file='weather.db', snapshot_dir=SNAPSHOT_DIR):
+    """True when the live database has had DDL (e.g. an init_db upgrade) since the current snapshot."""
+    current = current_snapshot(snapshot_dir)
+    if current is None:
+        return False
+    # Compare the schema text itself: the backup API bumps the copy's schema_version
+    schemas = []
+    for uri in (f"file:{db_file}?mode=ro", f"file:{current}?mode=ro&immutable=1"):
+        conn = sqlite3.connect(uri, uri=True, timeout=30)
+        try:
+            schemas.append(conn.execute("SELECT type, name, sql FROM sqlite_master ORDER BY type, name").fetchall())
+        finally:
+            conn.close()
+    return schemas[0] != schemas[1]
+
+
+def _source_mtime(db_file):
+    # In WAL mode commits only touch the -wal file
+    return max(os.path.getmtime(p) for p in (db_file, db_file + '-wal') if os.path.exists(p))
+
+
+def publish(db_file='weather.db', snapshot_dir=SNAPSHOT_DIR, force=False):
+    """Copies db_file into a new snapshot and swaps the link. Returns the new path, or None if skipped."""
+    if not SNAPSHOTS or not os.path.exists(db_file):
+        return None
+    os.makedirs(snapshot_dir, exist_ok=True)
+
+    # Another process (ETL, other worker) may already have published this state
+    current = current_snapshot(snapshot_dir)
+    if not force and current and os.path.getmtime(current) >= _source_mtime(db_file):
+        return None
+
+    started = time.time()
+    name = f"weather-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{os.getpid()}.db"
+    final = os.path.join(snapshot_dir, name)
+    tmp = final + '.tmp'
+
+    src = sqlite3.connect(db_file, timeout=30)
+    dst = sqlite3.connect(tmp)
+    try:
+        # Online backup: a consistent copy as of one read transaction, writers keep going
+        src.backup(dst)
+        # Readers open it immutable, so it must not depend on a -wal file
+        dst.execute("PRAGMA journal_mode=DELETE")
+        dst.commit()
+    finally:
+        dst.close()
+        src.close()
+
+    with open(tmp, 'rb') as f:
+        os.fsync(f.fileno())
+    # Stamp with the copy start, so writes that landed during the copy still count as newer
+    os.utime(tmp, (started, started))
+    os.replace(tmp, final)
+
+    link_tmp = os.path.join(snapshot_dir, f".{CURRENT_LINK}.{os.getpid()}")
+    if os.path.lexists(link_tmp):
+        os.remove(link_tmp)
+    os.symlink(name, link_tmp)
+    os.replace(link_tmp, os.path.join(snapshot_dir, CURRENT_LINK))  # rename(2) is atomic
+    _fsync_dir(snapshot_dir)
+
+    prune(snapshot_dir)
+    return final
+
+
+def prune(snapshot_dir=SNAPSHOT_DIR, keep=SNAPSHOT_KEEP):
+    current = current_snapshot(snapshot_dir)
+    files = sorted((os.path.join(snapshot_dir, f) for f in os.listdir(snapshot_dir)
+                    if f.startswith('weather-') and f.endswith('.db')), key=os.path.getmtime)
+    for path in files[:-keep] if keep else files:
+        if path != current:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    # Leftovers of publishers that died mid-copy
+    for f in os.listdir(snapshot_dir):
+        path = os.path.join(snapshot_dir, f)
+        if f.endswith('.db.tmp') and time.time() - os.path.getmtime(path) > 3600:
+            os.remove(path)
+
+
+def _fsync_dir(path):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class SnapshotPublisher(threading.Thread):
+    """Publishes for the fetcher from its own thread, so the copy never stalls the poll loop.
+    request() once a cycle has committed: requests are held until min_interval has passed
+    since the last copy and then published as one; request(urgent=True) publishes now."""
+
+    def __init__(self, db_file='weather.db', snapshot_dir=SNAPSHOT_DIR, min_interval=SNAPSHOT_MIN_INTERVAL,
+                 clock=time.monotonic):
+        super().__init__(daemon=True)
+        self.db_file = db_file
+        self.snapshot_dir = snapshot_dir
+        self.min_interval = min_interval
+        self.clock = clock
+        self._cond = threading.Condition()
+        self._pending = False
+        self._urgent = False
+        self.last_publish = None
+        self.last_path = None
+        self.last_duration = None
+
+    def request(self, urgent=False):
+        with self._cond:
+            self._pending = True
+            self._urgent = self._urgent or urgent
+            self._cond.notify()
+
+    def _wait_due(self):
+        with self._cond:
+            while True:
+                timeout = None
+                if self._pending:
+                    if self._urgent or self.last_publish is None:
+                        break
+                    timeout = self.last_publish + self.min_interval - self.clock()
+                    if timeout <= 0:
+                        break
+                self._cond.wait(timeout)
+            self._pending = self._urgent = False
+
+    def run(self):
+        while True:
+            self._wait_due()
+            started = time.perf_counter()
+            self.last_publish = self.clock()
+            try:
+                path = publish(self.db_file, self.snapshot_dir)
+            except (sqlite3.Error, OSError) as e:
+                print(f"Snapshot Error: {e}")
+                continue
+            if path:
+                self.last_path = path
+                self.last_duration = time.perf_counter() - started
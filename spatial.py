@@ -0,0 +1,96 @@
+import json
+import math
+
+# --- SPATIAL QUERIES ---
+# points (schools, health facilities, ...) and locations each have an R*Tree index
+# (points_rtree / locations_rtree, kept in sync by triggers in schema.sql). Bounding-box
+# queries are one R*Tree range search; k-nearest widens a box around the query point
+# until it provably contains the k closest entries.
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEG_LAT = 111.32
+
+# type -> (table, id column, R*Tree); 'location' searches the weather locations
+SOURCES = {
+    'location': ('locations', 'location_id', 'locations_rtree'),
+    'point': ('points', 'point_id', 'points_rtree'),
+}
+
+
+def parse_bbox(value):
+    """'minLon,minLat,maxLon,maxLat' (Leaflet's toBBoxString order) -> tuple of floats."""
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(v) for v in value.split(','))
+    except (AttributeError, ValueError):
+        raise ValueError(f"Invalid bbox '{value}' (use minLon,minLat,maxLon,maxLat)")
+    if min_lon > max_lon or min_lat > max_lat:
+        raise ValueError("bbox min must not exceed max")
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def point_feature(row):
+    props = json.loads(row['props_json']) if row['props_json'] else {}
+    props.update(id=row['point_id'], type=row['type'], name=row['name'], status=row['status'])
+    return {
+        'type': 'Feature',
+        'geometry': {'type': 'Point', 'coordinates': [row['longitude'], row['latitude']]},
+        'properties': props
+    }
+
+
+def points_in_bbox(cursor, bbox, point_type=None, limit=5000):
+    """Rows of `points` inside the box (R*Tree search, then an exact check on the REAL columns)."""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    where, params = "", [min_lat, max_lat, min_lon, max_lon, min_lat, max_lat, min_lon, max_lon]
+    if point_type:
+        types = point_type.split(',')
+        where = f" AND p.type IN ({','.join('?' * len(types))})"
+        params += types
+    cursor.execute(f"""
+        SELECT p.point_id, p.type, p.name, p.status, p.latitude, p.longitude, p.location_id, p.props_json
+        FROM points_rtree r
+        -- CROSS JOIN keeps the R*Tree as the outer loop (else the type index drives a full scan)
+        CROSS JOIN points p ON p.point_id = r.point_id
+        WHERE r.max_lat >= ? AND r.min_lat <= ? AND r.max_lon >= ? AND r.min_lon <= ?
+          AND p.latitude BETWEEN ? AND ? AND p.longitude BETWEEN ? AND ?{where}
+        LIMIT ?
+    """, params + [limit])
+    return cursor.fetchall()
+
+
+def nearest(cursor, lat, lon, k=5, source='location', point_type=None, max_km=2000):
+    """k closest entries as (distance_km, row), nearest first."""
+    table, id_col, rtree = SOURCES[source]
+    cols = ("t.location_id, t.city_name, t.country, t.latitude, t.longitude" if source == 'location'
+            else "t.point_id, t.type, t.name, t.status, t.latitude, t.longitude, t.location_id, t.props_json")
+    where, extra = "", []
+    if source == 'point' and point_type:
+        types = point_type.split(',')
+        where = f" AND t.type IN ({','.join('?' * len(types))})"
+        extra = types
+
+    radius_km = 25.0
+    while True:
+        dlat = radius_km / KM_PER_DEG_LAT
+        # Widest longitude span of the circle is at the box edge nearest the pole
+        dlon = dlat / max(math.cos(math.radians(min(abs(lat) + dlat, 89.0))), 0.01)
+        cursor.execute(f"""
+            SELECT {cols}
+            FROM {rtree} r
+            CROSS JOIN {table} t ON t.{id_col} = r.{id_col}
+            WHERE r.max_lat >= ? AND r.min_lat <= ? AND r.max_lon >= ? AND r.min_lon <= ?{where}
+        """, [lat - dlat, lat + dlat, lon - dlon, lon + dlon] + extra)
+        found = sorted(((haversine_km(lat, lon, row['latitude'], row['longitude']), row)
+                        for row in cursor.fetchall()), key=lambda item: item[0])
+        # Anything closer than radius_km is inside the box, so the first k are final
+        within = [item for item in found if item[0] <= radius_km]
+        if len(within) >= k or radius_km >= max_km:
+            return [item for item in found if item[0] <= max_km][:k]
+        radius_km = min(radius_km * 4, max_km)
@@ -2,7 +2,11 @@
 # Initialize DB if not exists
 python init_db.py
 
-# Run the fetcher in the background
+# Simplified ADM1 boundaries for the dashboard map (fetched and built once; /api/boundaries)
+[ -d boundaries ] || python build_boundaries.py
+
+# Run the fetcher in the background. Safe in every dyno/container: instances elect a
+# leader through fetcher_leases (FETCHER_LEASE=db|file|none, FETCHER_SHARDS=N to split locations)
 python weather_fetcher.py &
 
 # Run the web server
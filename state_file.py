@@ -0,0 +1,183 @@
+import os
+import mmap
+import threading
+import math
+import struct
+
+# --- SHARED CURRENT-STATE FILE ---
+# The fetcher writes current conditions for every location into one fixed-layout binary
+# file; each gunicorn worker mmaps it read-only, so the page cache holds one copy for all
+# workers and /api/weather can serve the current block without SQL.
+#
+#   header   magic, layout version, flags, seq, generation, count, record size, strings size
+#   records  count x RECORD (sorted by city_name, like the SQL path)
+#   strings  UTF-8 string table referenced by (offset, length) pairs in the records
+#
+# Seqlock: the writer makes seq odd, rewrites the body in place, then makes it even again.
+# Readers copy the body and retry if seq was odd or changed meanwhile. When the size
+# changes (locations added/removed) a new file is renamed into place and the old one is
+# flagged RETIRED so mapped readers re-open the path.
+
+STATE_FILE = os.environ.get('STATE_FILE', 'current_state.bin')
+
+MAGIC = b'YWS1'
+LAYOUT_VERSION = 2
+FLAG_RETIRED = 1
+HEADER = struct.Struct('<4sHHQQIII')
+SEQ_OFFSET = 8
+
+# Numeric /api/weather fields, stored as float64 (NaN = NULL); INT_FIELDS are INTEGER columns
+NUMERIC_FIELDS = ['latitude', 'longitude', 'temperature', 'humidity', 'windspeed', 'winddirection', 'pressure',
+                  'uv_index', 'dew_point', 'visibility', 'cloud_cover', 'solar_rad', 'feels_like']
+INT_FIELDS = {'winddirection', 'visibility', 'cloud_cover'}
+STRING_FIELDS = ['city_name', 'country', 'observation_time']
+RECORD = struct.Struct('<iq' + 'd' * len(NUMERIC_FIELDS) + 'IH' * len(STRING_FIELDS))
+
+STATE_QUERY = f"""
+    SELECT l.location_id, COALESCE(cw.generation, 0) AS generation,
+           {', '.join(('l.' if f in ('latitude', 'longitude') else 'cw.') + f for f in NUMERIC_FIELDS)},
+           l.city_name, l.country, cw.observation_time
+    FROM locations l
+    LEFT JOIN current_weather cw ON l.location_id = cw.location_id
+    ORDER BY l.city_name ASC
+"""
+
+
+def build_state(cursor):
+    """Returns (generation, count, records, strings) for the current contents of current_weather."""
+    cursor.execute("SELECT value FROM sync_state WHERE key = 'generation'")
+    row = cursor.fetchone()
+    generation = row[0] if row else 0
+
+    cursor.execute(STATE_QUERY)
+    rows = cursor.fetchall()
+    strings = bytearray()
+    records = bytearray()
+    n_num = len(NUMERIC_FIELDS)
+    for r in rows:
+        refs = []
+        for value in r[2 + n_num:]:
+            data = (value or '').encode('utf-8') if value is not None else b''
+            # A NULL string is stored with the 0xFFFF length marker
+            refs += [len(strings), len(data) if value is not None else 0xFFFF]
+            strings += data
+        nums = [float('nan') if v is None else float(v) for v in r[2:2 + n_num]]
+        records += RECORD.pack(r[0], r[1] or 0, *nums, *refs)
+    return generation, len(rows), bytes(records), bytes(strings)
+
+
+def write_state(cursor, path=STATE_FILE):
+    """Publishes current conditions to the state file (in place under the seqlock when the size fits)."""
+    if not path:
+        return
+    generation, count, records, strings = build_state(cursor)
+    body = records + strings
+    size = HEADER.size + len(body)
+
+    if os.path.exists(path) and os.path.getsize(path) == size:
+        with open(path, 'r+b') as f, mmap.mmap(f.fileno(), size) as m:
+            _, _, _, seq, _, _, _, _ = HEADER.unpack_from(m, 0)
+            seq += 1 if seq % 2 == 0 else 0
+            struct.pack_into('<Q', m, SEQ_OFFSET, seq)          # odd: write in progress
+            m[HEADER.size:] = body
+            HEADER.pack_into(m, 0, MAGIC, LAYOUT_VERSION, 0, seq + 1, generation, count, RECORD.size, len(strings))
+        return
+
+    seq = 0
+    if os.path.exists(path):
+        try:
+            with open(path, 'rb') as f:
+                seq = HEADER.unpack(f.read(HEADER.size))[3]
+        except (OSError, struct.error):
+            seq = 0
+    seq += 2 - seq % 2
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, LAYOUT_VERSION, 0, seq, generation, count, RECORD.size, len(strings)))
+        f.write(body)
+    old = open(path, 'r+b') if os.path.exists(path) else None
+    try:
+        os.replace(tmp, path)
+        if old is not None:
+            # Tell readers still mapping the old inode to re-open the path
+            old.seek(4 + 2)
+            old.write(struct.pack('<H', FLAG_RETIRED))
+    finally:
+        if old is not None:
+            old.close()
+
+
+class StateReader:
+    """Per-process reader. rows() returns (generation, list of row dicts), decoded once per version.
+    Shared by the worker's threads: the lock keeps one thread from re-opening (closing) the map
+    while another is reading it."""
+
+    def __init__(self, path=STATE_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self._map = None
+        self._seq = None
+        self._cached = None
+
+    def _open(self):
+        self._release()
+        with open(self.path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _release(self):
+        if self._map is not None:
+            self._map.close()
+        self._map = None
+        self._seq = None
+        self._cached = None
+
+    def close(self):
+        with self.lock:
+            self._release()
+
+    def available(self):
+        return bool(self.path) and (self._map is not None or os.path.exists(self.path))
+
+    def rows(self):
+        if not self.available():
+            return None
+        with self.lock:
+            return self._read()
+
+    def _read(self):
+        for _ in range(100):
+            if self._map is None:
+                self._open()
+            magic, version, flags, seq, generation, count, rec_size, str_size = HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC or version != LAYOUT_VERSION or rec_size != RECORD.size:
+                return None
+            if flags & FLAG_RETIRED:
+                self._open()
+                continue
+            if seq == self._seq:
+                return self._cached
+            if seq % 2:
+                continue  # writer is mid-update
+            body = self._map[HEADER.size:HEADER.size + count * rec_size + str_size]
+            if struct.unpack_from('<Q', self._map, SEQ_OFFSET)[0] != seq:
+                continue  # changed while copying
+            self._cached = (generation, decode(body, count, rec_size))
+            self._seq = seq
+            return self._cached
+        return None
+
+
+def decode(body, count, rec_size):
+    strings = body[count * rec_size:]
+    n_num = len(NUMERIC_FIELDS)
+    rows = []
+    for rec in RECORD.iter_unpack(body[:count * rec_size]):
+        row = {'location_id': rec[0], 'generation': rec[1]}
+        for field, v in zip(NUMERIC_FIELDS, rec[2:2 + n_num]):
+            row[field] = None if math.isnan(v) else (int(v) if field in INT_FIELDS else v)
+        refs = rec[2 + n_num:]
+        for i, field in enumerate(STRING_FIELDS):
+            off, length = refs[2 * i], refs[2 * i + 1]
+            row[field] = None if length == 0xFFFF else strings[off:off + length].decode('utf-8')
+        rows.append(row)
+    return rows
@@ -1,20 +1,18 @@
-
 import requests
-from weather_fetcher import fetch_weather_batch
+from weather_providers import OpenMeteoProvider
 
 locations = [
-    {'latitude': 15.3694, 'longitude': 44.1910, 'city_name': 'Sana\'a'},
-    {'latitude': 12.7794, 'longitude': 45.0367, 'city_name': 'Aden'}
+    {'location_id': 1, 'latitude': 15.3694, 'longitude': 44.1910, 'city_name': 'Sana\'a'},
+    {'location_id': 2, 'latitude': 12.7794, 'longitude': 45.0367, 'city_name': 'Aden'}
 ]
 
-print("Testing Open-Meteo API...")
-results = fetch_weather_batch(locations)
+print("Testing Open-Meteo API (single multi-location request)...")
+results = OpenMeteoProvider().fetch_batch(locations)
 print("Results type:", type(results))
-if isinstance(results, list):
+if isinstance(results, dict):
     print("Count:", len(results))
-    for i, res in enumerate(results):
-        print(f"Location {i}:", res.get('current'))
-        # Check if it looks simulated (randomized function in weather_fetcher uses base 15 +/-)
-        # Real data should be specific.
+    for loc in locations:
+        print(f"Location {loc['city_name']}:", results.get(loc['location_id']))
+        # Real data should be specific (observation time comes from the provider).
 else:
     print("Result:", results)
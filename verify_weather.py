@@ -1,7 +1,7 @@
 import sqlite3
-import requests
 import json
 from datetime import datetime
+from weather_providers import OpenMeteoProvider
 
 def check_weather_data():
     db_path = 'weather.db'
@@ -25,32 +25,28 @@ def check_weather_data():
             print("No weather data found in current_weather table.")
             return
 
-        for city, temp, obs_time, lat, lon in rows:
+        # Fetch LIVE data from Open-Meteo for all coordinates in a single request
+        live = OpenMeteoProvider().fetch_batch([
+            {'location_id': i, 'latitude': lat, 'longitude': lon}
+            for i, (_, _, _, lat, lon) in enumerate(rows)
+        ])
+
+        for i, (city, temp, obs_time, lat, lon) in enumerate(rows):
             print(f"City: {city}")
             print(f"  DB Temperature: {temp}°C")
             print(f"  Last Observation: {obs_time}")
             
-            # Now fetch LIVE data from Open-Meteo for the same coordinates to compare
-            live_api_url = "https://api.open-meteo.com/v1/forecast"
-            params = {
-                "latitude": lat,
-                "longitude": lon,
-                "current": "temperature_2m",
-                "timezone": "auto"
-            }
-            try:
-                res = requests.get(live_api_url, params=params, timeout=10)
-                res.raise_for_status()
-                live_data = res.json()
-                live_temp = live_data['current']['temperature_2m']
+            live_data = live.get(i)
+            if live_data is None:
+                print("  Live Sync Error: no Open-Meteo result for this location")
+            else:
+                live_temp = live_data['temp']
                 print(f"  Live Open-Meteo: {live_temp}°C")
                 diff = abs(temp - live_temp)
                 if diff < 2:
                     print(f"  Status: VERIFIED (Diff: {diff:.2f}°C)")
                 else:
                     print(f"  Status: VARIANCE (Diff: {diff:.2f}°C) - Data might be cached or from a different hour.")
-            except Exception as e:
-                print(f"  Live Sync Error: {e}")
             print("-" * 30)
             
         conn.close()
@@ -1,64 +1,206 @@
+import os
+import sys
 import time
-import requests
+import atexit
+import signal
 import sqlite3
-import urllib.parse
 from datetime import datetime
 from db_config import get_db_connection
+from db_profiler import print_report
+from fetch_telemetry import CycleTelemetry
+from fetcher_lease import LeaseKeeper, make_lease
+from poll_scheduler import PollScheduler
+from snapshot import SnapshotPublisher
+from state_file import write_state
+from weather_providers import fetch_wttr, get_provider, FORECAST_COLS
+from derived_met import derive_batch
+import anomaly_detector
+from alert_engine import AlertEngine, dispatch
 
 # Configuration
 POLL_INTERVAL = 300  # 5 minutes
+# Primary source and the one used for cities the primary could not deliver ('' disables fallback)
+WEATHER_PROVIDER = os.environ.get('WEATHER_PROVIDER', 'wttr')
+WEATHER_FALLBACK_PROVIDER = os.environ.get('WEATHER_FALLBACK_PROVIDER', 'open-meteo')
 
-def fetch_wttr(city_name):
+OBS_COLS = "location_id, observation_time, temperature, humidity, windspeed, winddirection, weathercode, pressure, uv_index, visibility, cloud_cover, dew_point, solar_rad, is_day, feels_like"
+OBS_VALS = "?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?"
+
+# Identical readings (same provider observation_time) only refresh fetched_at and keep
+# their generation, so delta polls do not resend them
+UPSERT_CURRENT = f"""
+    INSERT INTO current_weather ({OBS_COLS}, fetched_at, generation) VALUES ({OBS_VALS}, ?, ?)
+    ON CONFLICT(location_id) DO UPDATE SET
+        generation = CASE WHEN current_weather.observation_time = excluded.observation_time
+                          THEN current_weather.generation ELSE excluded.generation END,
+        {', '.join(f"{c.strip()} = excluded.{c.strip()}" for c in OBS_COLS.split(',')[1:])},
+        fetched_at = excluded.fetched_at
+"""
+# History goes straight to the clustered weather_obs table (epoch seconds)
+HISTORY_COLS = "location_id, ts_epoch, temperature, humidity, windspeed, winddirection, weathercode, pressure, uv_index, visibility, cloud_cover, dew_point, solar_rad, is_day, feels_like, fetched_epoch, generation"
+INSERT_HISTORY = f"""
+    INSERT INTO weather_obs ({HISTORY_COLS}) VALUES ({OBS_VALS}, ?, ?)
+    ON CONFLICT(location_id, ts_epoch) DO NOTHING
+"""
+
+def to_epoch(local_time):
+    """'YYYY-MM-DD HH:MM:SS' server-local -> unix seconds."""
+    return int(datetime.strptime(local_time, '%Y-%m-%d %H:%M:%S').timestamp())
+
+def next_generation(cursor):
+    """Bumps and returns the sync generation (inside the caller's write transaction)."""
+    cursor.execute("UPDATE sync_state SET value = value + 1 WHERE key = 'generation' RETURNING value")
+    row = cursor.fetchone()
+    if row is None:
+        cursor.execute("INSERT INTO sync_state (key, value) VALUES ('generation', 1)")
+        return 1
+    return row[0]
+
+def store_observation(cursor, location_id, city_data, generation=None):
+    """Upserts current_weather and appends to weather_obs. Returns the new row's ts_epoch, or None for a repeat."""
+    fetched_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    # Fall back to the poll time only when the provider gave no usable stamp
+    obs_time = city_data.get('obs_time') or fetched_at
+
+    params = (
+        location_id, obs_time,
+        city_data['temp'], city_data['hum'],
+        city_data['wind_s'], city_data['wind_d'],
+        city_data['code'], city_data['pres'],
+        city_data['uv'], city_data['vis'],
+        city_data['cloud'], city_data['dew'],
+        city_data['solar'], city_data['day'],
+        city_data.get('feels'), fetched_at, generation
+    )
+
+    # UPSERT Current
+    cursor.execute(UPSERT_CURRENT, params)
+
+    # Insert History (the (location_id, ts_epoch) key drops repeated upstream readings)
+    ts_epoch = to_epoch(obs_time)
+    cursor.execute(INSERT_HISTORY, (location_id, ts_epoch) + params[2:-2] + (to_epoch(fetched_at), generation))
+    return ts_epoch if cursor.rowcount > 0 else None
+
+def store_forecast(cursor, location_id, forecast):
+    """Replaces a location's forecast with a newer issue. Returns False when nothing changed."""
+    if not forecast or not forecast.get('rows') or not forecast.get('issued_time'):
+        return False
+    cursor.execute("SELECT MAX(issued_time) FROM forecast WHERE location_id = ?", (location_id,))
+    current_issue = cursor.fetchone()[0]
+    if current_issue and current_issue >= forecast['issued_time']:
+        return False
+
+    # Delete + bulk insert inside a savepoint so readers never see a mix of two issues
+    cursor.execute("SAVEPOINT forecast_swap")
+    try:
+        cursor.execute("DELETE FROM forecast WHERE location_id = ?", (location_id,))
+        cols = ', '.join(['location_id', 'issued_time'] + FORECAST_COLS)
+        marks = ', '.join(['?'] * (len(FORECAST_COLS) + 2))
+        cursor.executemany(
+            f"INSERT OR REPLACE INTO forecast ({cols}) VALUES ({marks})",
+            [(location_id, forecast['issued_time']) + tuple(row) for row in forecast['rows']]
+        )
+    except Exception:
+        cursor.execute("ROLLBACK TO forecast_swap")
+        cursor.execute("RELEASE forecast_swap")
+        raise
+    cursor.execute("RELEASE forecast_swap")
+    return True
+
+def run_cycle(conn, telemetry, location_ids=None, scheduler=None, alerts=None):
+    """Fetches and stores the given locations (all when None). Returns the number of rows written."""
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT * FROM locations")
+    locations = [dict(row) for row in cursor.fetchall()]
+    if location_ids is not None:
+        wanted = set(location_ids)
+        locations = [loc for loc in locations if loc['location_id'] in wanted]
+
+    if not locations:
+        return 0
+
+    primary = get_provider(WEATHER_PROVIDER)
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] Syncing {len(locations)} locations via {primary.name.upper()}...")
+    results = primary.fetch_batch(locations, telemetry)
+
+    missing = [loc for loc in locations if loc['location_id'] not in results]
+    fallback = get_provider(WEATHER_FALLBACK_PROVIDER) if WEATHER_FALLBACK_PROVIDER != WEATHER_PROVIDER else None
+    if missing and fallback:
+        print(f" > {len(missing)} locations missing from {primary.name}, trying {fallback.name}...")
+        results.update(fallback.fetch_batch(missing, telemetry))
+    # Dew point, radiation, day flag and feels-like for whatever the provider left out
+    derive_batch(locations, results)
+
+    # One generation per cycle, taken lazily so cycles that write nothing do not bump it
+    generation = None
+    written = 0
+    new_obs = []
+    for loc in locations:
+        stats = telemetry.city(loc['location_id'])
+        city_data = results.get(loc['location_id'])
+        if not city_data:
+            if scheduler:
+                scheduler.record_failure(loc['location_id'])
+        elif scheduler and scheduler.is_unchanged(loc['location_id'], city_data['upstream_obs']):
+            # Same upstream reading as last poll: nothing new to write
+            scheduler.record_success(loc['location_id'], city_data['upstream_obs'])
+            print(f" > {loc['city_name']}: unchanged upstream observation, skipped")
+        else:
+            t0 = time.perf_counter()
+            if generation is None:
+                generation = next_generation(cursor)
+            # All of a city's writes land together or not at all: a failure part-way must not
+            # leave its observation committed with half-updated anomaly statistics
+            cursor.execute("SAVEPOINT city")
+            try:
+                ts_epoch = store_observation(cursor, loc['location_id'], city_data, generation)
+                if ts_epoch is not None:
+                    # New reading: score it against (and fold it into) its hour's statistics
+                    anomaly_detector.observe(cursor, loc, city_data, ts_epoch, generation)
+                store_forecast(cursor, loc['location_id'], city_data.get('forecast'))
+            except sqlite3.Error as e:
+                cursor.execute("ROLLBACK TO city")
+                cursor.execute("RELEASE city")
+                stats['error'] = f"DB: {e}"
+                print(f" > {loc['city_name']}: write failed ({e})")
+                if scheduler:
+                    scheduler.record_failure(loc['location_id'])
+            else:
+                cursor.execute("RELEASE city")
+                if ts_epoch is not None:
+                    new_obs.append((loc, city_data, ts_epoch))
+                written += 1
+                print(f" > {loc['city_name']}: {city_data['temp']}°C")
+                if scheduler:
+                    scheduler.record_success(loc['location_id'], city_data['upstream_obs'])
+            stats['write_ms'] = (time.perf_counter() - t0) * 1000
+
+    anomaly_detector.prune(cursor)
+    # Alert rules only see this cycle's new readings
+    events = []
+    if alerts is not None and new_obs:
+        cursor.execute("SAVEPOINT alert_eval")
+        try:
+            events = alerts.evaluate(cursor, new_obs, generation)
+        except sqlite3.Error as e:
+            cursor.execute("ROLLBACK TO alert_eval")
+            print(f"Alert Error: {e}")
+        cursor.execute("RELEASE alert_eval")
+    conn.commit()
+    telemetry.alerts = len(events)
+    dispatch(events)
+    # API workers serve the current block from this file (cheap: one row per location)
     try:
-        # Sanitize city name for URL (wttr.in handles space as + or %20)
-        # wttr.in usually prefers + for spaces
-        safe_name = city_name.replace("'", "").replace(" ", "+")
-        if city_name == "Sa'dah": safe_name = "Sa'dah" # Special handling if needed, but quote usually works
-        
-        # Best approach: Quote everything
-        # Actually wttr.in/Sana'a works. wttr.in/Sana%27a works.
-        encoded_name = urllib.parse.quote(city_name)
-        
-        url = f"https://wttr.in/{encoded_name}?format=j1"
-        
-        # User-Agent to avoid blocking
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-        
-        response = requests.get(url, headers=headers, timeout=15)
-        
-        if response.status_code != 200:
-            print(f"Failed to fetch {city_name}: {response.status_code}")
-            return None
-            
-        data = response.json()
-        if 'current_condition' not in data:
-            return None
-            
-        current = data['current_condition'][0]
-        
-        # Parse fields
-        return {
-            'temp': float(current['temp_C']),
-            'hum': float(current['humidity']),
-            'wind_s': float(current['windspeedKmph']),
-            'wind_d': float(current['winddirDegree']),
-            'code': int(current['weatherCode']), 
-            'pres': float(current['pressure']),
-            'uv': float(current['uvIndex']),
-            'vis': float(current['visibility']) * 1000, # km to m
-            'cloud': float(current['cloudcover']),
-            # wttr.in misses these sometimes, use defaults
-            'dew': 0.0, 
-            'solar': 0.0,
-            'day': 1 # Assume day if not provided, or logic later
-        }
-    except Exception as e:
-        print(f"Error fetching {city_name}: {e}")
-        return None
+        write_state(cursor)
+    except (sqlite3.Error, OSError) as e:
+        print(f"State File Error: {e}")
+    print("Sync Completed successfully.")
+    return written
 
 def main():
-    print("!!! SCIENTIFIC MET-BOT ACTIVE (WTTR.IN REALTIME SOURCE) !!!")
-    
+    print(f"!!! SCIENTIFIC MET-BOT ACTIVE ({WEATHER_PROVIDER.upper()} REALTIME SOURCE) !!!")
+
     # Ensure DB is initialized
     try:
         import init_db
@@ -66,53 +208,67 @@ def main():
     except:
         pass
 
+    scheduler = PollScheduler(interval=POLL_INTERVAL)
+    alerts = AlertEngine()
+    last_report = time.time()
+
+    # Only the lease holder(s) poll; other instances stay on standby and take over on expiry
+    keeper = LeaseKeeper(make_lease())
+    keeper.beat()
+    keeper.start()
+    atexit.register(keeper.stop)
+    # atexit does not run on SIGTERM (what the platform sends on restart), which would leave
+    # the standby waiting out FETCHER_LEASE_TTL. Exit normally instead: the loop unwinds (any
+    # open write transaction is closed first) and keeper.stop releases the lease right away.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    # API workers read published snapshots: copied in the background, at most once per poll
+    # interval (the current block is served from the state file, written every cycle)
+    publisher = SnapshotPublisher(min_interval=POLL_INTERVAL)
+    publisher.start()
+
     while True:
+        telemetry = None
+        conn = None
         try:
             conn = get_db_connection()
             cursor = conn.cursor()
-            
-            cursor.execute("SELECT * FROM locations")
-            locations = [dict(row) for row in cursor.fetchall()]
-            
-            if locations:
-                print(f"[{datetime.now().strftime('%H:%M:%S')}] Syncing {len(locations)} locations via WTTR.IN...")
-                
-                for loc in locations:
-                    city_data = fetch_wttr(loc['city_name'])
-                    if city_data:
-                        obs_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                        
-                        cols = "location_id, observation_time, temperature, humidity, windspeed, winddirection, weathercode, pressure, uv_index, visibility, cloud_cover, dew_point, solar_rad, is_day"
-                        vals = "?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?"
-                        
-                        params = (
-                            loc['location_id'], obs_time, 
-                            city_data['temp'], city_data['hum'], 
-                            city_data['wind_s'], city_data['wind_d'], 
-                            city_data['code'], city_data['pres'], 
-                            city_data['uv'], city_data['vis'], 
-                            city_data['cloud'], city_data['dew'],
-                            city_data['solar'], city_data['day']
-                        )
-                        
-                        # UPSERT Current
-                        cursor.execute(f"INSERT OR REPLACE INTO current_weather ({cols}) VALUES ({vals})", params)
-                        
-                        # Insert History
-                        cursor.execute(f"INSERT OR IGNORE INTO weather_history ({cols}) VALUES ({vals})", params)
-                        
-                        print(f" > {loc['city_name']}: {city_data['temp']}°C")
-                    
-                    time.sleep(1) # Rate limit protection
-                
-                conn.commit()
-                print("Sync Completed successfully.")
-            
-            conn.close()
+            cursor.execute("SELECT location_id FROM locations")
+            # Locations of shards this instance does not hold are dropped from the schedule
+            scheduler.sync_locations([row[0] for row in cursor.fetchall() if keeper.owns(row[0])])
+
+            due = scheduler.pop_due()
+            if due:
+                telemetry = CycleTelemetry()
+                run_cycle(conn, telemetry, due, scheduler, alerts)
         except Exception as e:
             print(f"Main Loop Error: {e}")
-            
-        time.sleep(POLL_INTERVAL)
+            scheduler.requeue_unscheduled()
+            telemetry = telemetry or CycleTelemetry()
+            telemetry.error = f"{type(e).__name__}: {e}"
+
+        # Telemetry is written even when the cycle failed part-way
+        try:
+            if telemetry is not None:
+                if conn is None:
+                    conn = get_db_connection()
+                conn.rollback()
+                duration_ms = telemetry.finish(conn)
+                failed = sum(1 for s in telemetry.cities.values() if s['error'])
+                print(f"Cycle took {duration_ms / 1000:.1f}s ({failed} failed)")
+                # New alerts should be visible to the API right away
+                publisher.request(urgent=bool(telemetry.alerts))
+            # Locations are staggered, so only print the SQL profile once per poll interval
+            if time.time() - last_report >= POLL_INTERVAL:
+                print_report(limit=5)
+                last_report = time.time()
+        except Exception as e:
+            print(f"Telemetry Error: {e}")
+        finally:
+            if conn is not None:
+                conn.close()
+
+        # Sleep until the next location is due (re-check the location list and lease at least every 30s)
+        time.sleep(min(30.0, scheduler.seconds_until_next()))
 
 if __name__ == "__main__":
     main()
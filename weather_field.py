@@ -0,0 +1,138 @@
+import gzip
+import math
+import threading
+import numpy as np
+
+# --- INTERPOLATED WEATHER FIELD ---
+# Current observations spread onto a regular lat/lon grid over Yemen by inverse-distance
+# weighting: wind as u/v components (so directions average correctly) plus temperature.
+# Computed with NumPy once per sync generation and grid, cached per worker, and sent as
+# one binary block of little-endian int16 (value / FIELD_SCALE, FIELD_NODATA where no
+# station reaches), ordered layer, row north to south, column west to east.
+
+FIELD_BBOX = (41.5, 11.5, 54.75, 19.25)   # minLon, minLat, maxLon, maxLat (incl. Socotra)
+FIELD_RES = 0.25                         # degrees between grid nodes (~27 km, plenty for the particles)
+MIN_FIELD_RES = 0.02
+MAX_FIELD_NODES = 250000
+IDW_POWER = 2
+IDW_NEIGHBOURS = 12                      # nearest stations per node once there are more
+CHUNK_NODES = 16384                      # bounds the node x station distance matrix
+FIELD_LAYERS = ('u', 'v', 'temperature')
+FIELD_SCALE = 0.01                       # units per int16 step: km/h and °C to within ±327
+FIELD_NODATA = -32768
+CACHE_ENTRIES = 8
+
+
+def wind_components(speed, direction):
+    """Meteorological (direction the wind blows from, degrees) -> u east / v north, same units as speed."""
+    rad = np.radians(np.asarray(direction, dtype=float))
+    speed = np.asarray(speed, dtype=float)
+    return -speed * np.sin(rad), -speed * np.cos(rad)
+
+
+def grid_shape(bbox, res):
+    min_lon, min_lat, max_lon, max_lat = bbox
+    width = int(round((max_lon - min_lon) / res)) + 1
+    height = int(round((max_lat - min_lat) / res)) + 1
+    if width * height > MAX_FIELD_NODES:
+        raise ValueError(f"Field grid of {width}x{height} nodes is too large (max {MAX_FIELD_NODES})")
+    return width, height
+
+
+def idw(station_lat, station_lon, values, node_lat, node_lon, power=IDW_POWER, k=IDW_NEIGHBOURS):
+    """Inverse-distance weighting of each row of `values` (layers x stations) onto the nodes.
+    Neighbours are chosen once for all layers; a station missing a value (NaN) gets no
+    weight in that layer, and nodes with no valued neighbour are NaN."""
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    out = np.full((len(values), len(node_lat)), np.nan)
+    if not values.shape[1]:
+        return out
+    valid = ~np.isnan(values)
+    values = np.where(valid, values, 0.0)
+    # Equirectangular distances: plenty at Yemen's size, and weights only need ratios
+    coslat = math.cos(math.radians(float(np.mean(node_lat))))
+    for start in range(0, len(node_lat), CHUNK_NODES):
+        stop = start + CHUNK_NODES
+        dx = (node_lon[start:stop, None] - station_lon[None, :]) * coslat
+        dy = node_lat[start:stop, None] - station_lat[None, :]
+        d2 = dx * dx + dy * dy
+        idx = None
+        if values.shape[1] > k:
+            idx = np.argpartition(d2, k - 1, axis=1)[:, :k]
+            d2 = np.take_along_axis(d2, idx, axis=1)
+        # A node on top of a station takes its value exactly
+        w = 1.0 / np.maximum(d2, 1e-12) ** (power / 2)
+        for i in range(len(values)):
+            vals, ok = (values[i], valid[i]) if idx is None else (values[i][idx], valid[i][idx])
+            wi = w * ok
+            total = wi.sum(axis=1)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                out[i, start:stop] = np.where(total > 0, (wi * vals).sum(axis=1) / total, np.nan)
+    return out
+
+
+def interpolate(rows, bbox=FIELD_BBOX, res=FIELD_RES):
+    """rows: dicts with latitude, longitude, temperature, windspeed, winddirection.
+    Returns (width, height, float32 array of shape (len(FIELD_LAYERS), height, width))."""
+    width, height = grid_shape(bbox, res)
+    min_lon, min_lat, max_lon, max_lat = bbox
+    rows = [r for r in rows if r.get('latitude') is not None and r.get('longitude') is not None]
+    col = lambda key: np.array([np.nan if r.get(key) is None else r[key] for r in rows], dtype=float)
+    lat, lon = col('latitude'), col('longitude')
+    u, v = wind_components(col('windspeed'), col('winddirection'))
+
+    node_lon, node_lat = np.meshgrid(min_lon + np.arange(width) * res, max_lat - np.arange(height) * res)
+    node_lon, node_lat = node_lon.ravel(), node_lat.ravel()
+    field = idw(lat, lon, np.vstack((u, v, col('temperature'))), node_lat, node_lon).astype(np.float32)
+    return width, height, field.reshape(len(FIELD_LAYERS), height, width)
+
+
+def quantize(field):
+    """float field -> int16 steps of FIELD_SCALE, NaN as FIELD_NODATA."""
+    steps = np.round(np.nan_to_num(field, nan=0.0) / FIELD_SCALE)
+    return np.where(np.isnan(field), FIELD_NODATA, np.clip(steps, -32767, 32767)).astype('<i2')
+
+
+def summary(layer):
+    finite = layer[np.isfinite(layer)]
+    if not finite.size:
+        return None
+    return [round(float(finite.min()), 2), round(float(finite.max()), 2)]
+
+
+class FieldCache:
+    """Per-worker payloads keyed by (generation, bbox, res); a new generation computes once.
+    A payload is the grid description plus the encoded block, raw and gzipped."""
+
+    def __init__(self, entries=CACHE_ENTRIES):
+        self.entries = entries
+        self.lock = threading.Lock()
+        self.payloads = {}
+
+    def get(self, generation, bbox, res, load_rows):
+        key = (generation, tuple(bbox), res)
+        with self.lock:
+            payload = self.payloads.get(key)
+            if payload is not None:
+                return payload
+            rows = load_rows()
+            width, height, field = interpolate(rows, bbox, res)
+            payload = {
+                'generation': generation,
+                'bbox': list(bbox),
+                'res': res,
+                'width': width,
+                'height': height,
+                'layers': list(FIELD_LAYERS),
+                'units': {'u': 'km/h', 'v': 'km/h', 'temperature': 'C'},
+                'range': {name: summary(field[i]) for i, name in enumerate(FIELD_LAYERS)},
+                'stations': len(rows),
+                'scale': FIELD_SCALE,
+                'nodata': FIELD_NODATA
+            }
+            payload['body'] = quantize(field).tobytes()
+            payload['gzip'] = gzip.compress(payload['body'], 6)
+            self.payloads[key] = payload
+            while len(self.payloads) > self.entries:
+                self.payloads.pop(next(iter(self.payloads)))
+            return payload
@@ -0,0 +1,308 @@
+import time
+import requests
+import urllib.parse
+from datetime import datetime, timedelta, timezone
+
+# --- WEATHER PROVIDERS ---
+# Every provider turns a list of location rows into {location_id: city_data}, where
+# city_data uses the short keys store_observation expects (temp, hum, wind_s, ...).
+# Per-city telemetry stats are filled through the optional CycleTelemetry.
+
+# Forecast rows are tuples in this column order (see the forecast table in schema.sql)
+FORECAST_COLS = ['valid_time', 'temperature', 'feels_like', 'humidity', 'windspeed', 'winddirection',
+                 'weathercode', 'pressure', 'uv_index', 'visibility', 'cloud_cover', 'dew_point',
+                 'precip_prob', 'precip_mm']
+
+def wttr_utc_offset(current):
+    """UTC offset of the city, from localObsDateTime (city local) vs observation_time (UTC clock)."""
+    try:
+        local = datetime.strptime(current['localObsDateTime'], '%Y-%m-%d %I:%M %p')
+        utc_clock = datetime.strptime(current['observation_time'], '%I:%M %p')
+    except (KeyError, TypeError, ValueError):
+        return timedelta(hours=3)  # Yemen is UTC+3 with no DST
+    # The offset is the difference between the two wall clocks (handles day wrap)
+    offset = ((local.hour * 60 + local.minute) - (utc_clock.hour * 60 + utc_clock.minute)) % 1440
+    if offset > 14 * 60:
+        offset -= 1440
+    return timedelta(minutes=offset)
+
+def city_local_to_server(local, offset):
+    utc = local - offset
+    return utc.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None).strftime('%Y-%m-%d %H:%M:%S')
+
+def parse_wttr_obs_time(current):
+    """Converts wttr.in's localObsDateTime to server-local time.
+
+    Returns 'YYYY-MM-DD HH:MM:SS' like the rest of the weather tables, or None if unavailable.
+    """
+    local_raw = current.get('localObsDateTime')
+    if not local_raw:
+        return None
+    try:
+        local = datetime.strptime(local_raw, '%Y-%m-%d %I:%M %p')
+    except ValueError:
+        return None
+    return city_local_to_server(local, wttr_utc_offset(current))
+
+def parse_wttr_forecast(data, current):
+    """Turns the j1 'weather' block (3 days x 3-hourly) into forecast rows. No extra request needed."""
+    offset = wttr_utc_offset(current)
+    rows = []
+    for day in data.get('weather', []):
+        for h in day.get('hourly', []):
+            try:
+                hhmm = int(h['time'])
+                local = datetime.strptime(day['date'], '%Y-%m-%d') + timedelta(hours=hhmm // 100, minutes=hhmm % 100)
+                rows.append((
+                    city_local_to_server(local, offset),
+                    float(h['tempC']), float(h['FeelsLikeC']), float(h['humidity']),
+                    float(h['windspeedKmph']), int(h['winddirDegree']), int(h['weatherCode']),
+                    float(h['pressure']), float(h['uvIndex']), int(float(h['visibility']) * 1000),
+                    int(h['cloudcover']), float(h['DewPointC']),
+                    float(h.get('chanceofrain') or 0), float(h.get('precipMM') or 0)
+                ))
+            except (KeyError, TypeError, ValueError):
+                continue
+    return rows
+
+def fetch_wttr(city_name, stats=None):
+    # Optional stats dict is filled with http_status, request_ms, parse_ms and error
+    if stats is None:
+        stats = {}
+    try:
+        # Sanitize city name for URL (wttr.in handles space as + or %20)
+        # wttr.in usually prefers + for spaces
+        safe_name = city_name.replace("'", "").replace(" ", "+")
+        if city_name == "Sa'dah": safe_name = "Sa'dah" # Special handling if needed, but quote usually works
+
+        # Best approach: Quote everything
+        # Actually wttr.in/Sana'a works. wttr.in/Sana%27a works.
+        encoded_name = urllib.parse.quote(city_name)
+
+        url = f"https://wttr.in/{encoded_name}?format=j1"
+
+        # User-Agent to avoid blocking
+        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
+
+        t0 = time.perf_counter()
+        response = requests.get(url, headers=headers, timeout=15)
+        stats['request_ms'] = (time.perf_counter() - t0) * 1000
+        stats['http_status'] = response.status_code
+
+        if response.status_code != 200:
+            print(f"Failed to fetch {city_name}: {response.status_code}")
+            stats['error'] = f"HTTP {response.status_code}"
+            return None
+
+        t0 = time.perf_counter()
+        data = response.json()
+        if 'current_condition' not in data:
+            stats['error'] = "No current_condition in response"
+            return None
+
+        current = data['current_condition'][0]
+
+        # Parse fields
+        parsed = {
+            'temp': float(current['temp_C']),
+            'hum': float(current['humidity']),
+            'wind_s': float(current['windspeedKmph']),
+            'wind_d': float(current['winddirDegree']),
+            'code': int(current['weatherCode']),
+            'pres': float(current['pressure']),
+            'uv': float(current['uvIndex']),
+            'vis': float(current['visibility']) * 1000, # km to m
+            'cloud': float(current['cloudcover']),
+            'feels': float(current['FeelsLikeC']) if current.get('FeelsLikeC') else None,
+            # Not in wttr.in's current block: derived_met.derive_batch fills them in
+            'dew': None,
+            'solar': None,
+            'day': None,
+            # Provider's own observation stamp, used to skip unchanged readings
+            'upstream_obs': current.get('localObsDateTime'),
+            'obs_time': parse_wttr_obs_time(current)
+        }
+        # The same document carries the multi-day forecast; keep it instead of discarding it
+        parsed['forecast'] = {
+            'issued_time': parsed['obs_time'],
+            'rows': parse_wttr_forecast(data, current)
+        }
+        stats['parse_ms'] = (time.perf_counter() - t0) * 1000
+        return parsed
+    except Exception as e:
+        print(f"Error fetching {city_name}: {e}")
+        stats['error'] = f"{type(e).__name__}: {e}"
+        return None
+
+
+def local_time_from_epoch(ts):
+    return datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S')
+
+class WeatherProvider:
+    name = None
+
+    def fetch_batch(self, locations, telemetry=None):
+        raise NotImplementedError
+
+    def _stats(self, telemetry, location_id):
+        return telemetry.city(location_id) if telemetry else {}
+
+class WttrProvider(WeatherProvider):
+    """wttr.in: one request per city name."""
+    name = 'wttr'
+
+    def __init__(self, rate_limit=1.0):
+        self.rate_limit = rate_limit
+
+    def fetch_batch(self, locations, telemetry=None):
+        results = {}
+        for i, loc in enumerate(locations):
+            if i and self.rate_limit:
+                time.sleep(self.rate_limit) # Rate limit protection
+            stats = self._stats(telemetry, loc['location_id'])
+            stats['error'] = None
+            data = fetch_wttr(loc['city_name'], stats)
+            if data:
+                results[loc['location_id']] = data
+        return results
+
+# Open-Meteo reports WMO weather codes; weathercode columns hold wttr.in's WWO codes,
+# so they are translated before storing (unlisted codes are stored as NULL)
+WMO_TO_WWO = {
+    0: 113, 1: 113, 2: 116, 3: 122,
+    45: 248, 48: 260,
+    51: 263, 53: 266, 55: 266, 56: 281, 57: 284,
+    61: 296, 63: 302, 65: 308, 66: 311, 67: 314,
+    71: 326, 73: 332, 75: 338, 77: 326,
+    80: 353, 81: 356, 82: 359, 85: 368, 86: 371,
+    95: 386, 96: 389, 99: 389
+}
+
+def wwo_code(wmo):
+    return None if wmo is None else WMO_TO_WWO.get(int(wmo))
+
+class OpenMeteoProvider(WeatherProvider):
+    """Open-Meteo: many coordinates per request (comma-separated latitude/longitude lists).
+
+    Values are stored like wttr.in's: sea-level pressure (pressure_msl, not the much lower
+    station-level surface_pressure at highland cities) and WWO weather codes.
+    """
+    name = 'open-meteo'
+    URL = "https://api.open-meteo.com/v1/forecast"
+    MAX_COORDS_PER_REQUEST = 200  # keeps the query string well under common URL limits
+    CURRENT_VARS = [
+        'temperature_2m', 'relative_humidity_2m', 'wind_speed_10m', 'wind_direction_10m',
+        'weather_code', 'pressure_msl', 'uv_index', 'visibility', 'cloud_cover',
+        'dew_point_2m', 'shortwave_radiation', 'is_day', 'apparent_temperature'
+    ]
+    HOURLY_VARS = [
+        'temperature_2m', 'apparent_temperature', 'relative_humidity_2m', 'wind_speed_10m',
+        'wind_direction_10m', 'weather_code', 'pressure_msl', 'uv_index', 'visibility',
+        'cloud_cover', 'dew_point_2m', 'precipitation_probability', 'precipitation'
+    ]
+    FORECAST_DAYS = 3
+
+    def fetch_batch(self, locations, telemetry=None):
+        results = {}
+        for start in range(0, len(locations), self.MAX_COORDS_PER_REQUEST):
+            chunk = locations[start:start + self.MAX_COORDS_PER_REQUEST]
+            results.update(self._fetch_chunk(chunk, telemetry))
+        return results
+
+    def _fetch_chunk(self, chunk, telemetry):
+        params = {
+            'latitude': ','.join(f"{loc['latitude']:.4f}" for loc in chunk),
+            'longitude': ','.join(f"{loc['longitude']:.4f}" for loc in chunk),
+            'current': ','.join(self.CURRENT_VARS),
+            # Forecast comes back in the same response, so it costs no extra request
+            'hourly': ','.join(self.HOURLY_VARS),
+            'forecast_days': self.FORECAST_DAYS,
+            'wind_speed_unit': 'kmh',
+            'timeformat': 'unixtime',
+            'timezone': 'GMT'
+        }
+        all_stats = [self._stats(telemetry, loc['location_id']) for loc in chunk]
+        try:
+            t0 = time.perf_counter()
+            response = requests.get(self.URL, params=params, timeout=30)
+            request_ms = (time.perf_counter() - t0) * 1000
+            for stats in all_stats:
+                stats.update(request_ms=request_ms, http_status=response.status_code, error=None)
+            if response.status_code != 200:
+                print(f"Open-Meteo batch failed: {response.status_code}")
+                for stats in all_stats:
+                    stats['error'] = f"HTTP {response.status_code}"
+                return {}
+
+            t0 = time.perf_counter()
+            payload = response.json()
+            # A single coordinate returns an object, several return a list in request order
+            if isinstance(payload, dict):
+                payload = [payload]
+            results = {}
+            for loc, item, stats in zip(chunk, payload, all_stats):
+                try:
+                    parsed = self._parse(item['current'])
+                    parsed['forecast'] = {
+                        'issued_time': parsed['obs_time'],
+                        'rows': self._parse_hourly(item.get('hourly') or {})
+                    }
+                    results[loc['location_id']] = parsed
+                except (KeyError, TypeError, ValueError) as e:
+                    stats['error'] = f"Parse: {e}"
+            parse_ms = (time.perf_counter() - t0) * 1000
+            for stats in all_stats:
+                stats['parse_ms'] = parse_ms
+            return results
+        except Exception as e:
+            print(f"Open-Meteo batch error: {e}")
+            for stats in all_stats:
+                stats['error'] = f"{type(e).__name__}: {e}"
+            return {}
+
+    @staticmethod
+    def _parse(cur):
+        # Optional variables the model may not report at a point: stored as NULL, never as a
+        # made-up 0 (visibility 0 would trip low_visibility), and skipped by derive/alerts
+        opt = lambda key, cast=float: cast(cur[key]) if cur.get(key) is not None else None
+        return {
+            'temp': float(cur['temperature_2m']),
+            'hum': float(cur['relative_humidity_2m']),
+            'wind_s': float(cur['wind_speed_10m']),
+            'wind_d': float(cur['wind_direction_10m']),
+            'code': wwo_code(cur.get('weather_code')),
+            'pres': opt('pressure_msl'),
+            'uv': opt('uv_index'),
+            'vis': opt('visibility'),
+            'cloud': opt('cloud_cover'),
+            'dew': opt('dew_point_2m'),
+            'solar': opt('shortwave_radiation'),
+            'day': opt('is_day', int),
+            'feels': opt('apparent_temperature'),
+            'upstream_obs': str(cur['time']),
+            'obs_time': local_time_from_epoch(int(cur['time']))
+        }
+
+    @classmethod
+    def _parse_hourly(cls, hourly):
+        times = hourly.get('time') or []
+        cols = [hourly.get(v) or [None] * len(times) for v in cls.HOURLY_VARS]
+        code_col = cls.HOURLY_VARS.index('weather_code')
+        cols[code_col] = [wwo_code(code) for code in cols[code_col]]
+        rows = []
+        for i, ts in enumerate(times):
+            rows.append((local_time_from_epoch(int(ts)),) + tuple(col[i] for col in cols))
+        return rows
+
+PROVIDERS = {
+    WttrProvider.name: WttrProvider,
+    OpenMeteoProvider.name: OpenMeteoProvider
+}
+
+def get_provider(name):
+    if not name:
+        return None
+    try:
+        return PROVIDERS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown weather provider '{name}' (choose from {', '.join(PROVIDERS)})")